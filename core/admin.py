@@ -1,17 +1,37 @@
 # core/admin.py - CORRECTED VERSION
+import csv
+
 from django.contrib import admin
 from django.contrib.auth.models import User
-from django.utils.html import format_html
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse, HttpResponseRedirect
+from django.utils.html import format_html, format_html_join
 from .models import (
     Account, Transaction, LoanApplication, UserProfile, 
     ContactMessage, SystemSettings, MoneyTransfer, 
     TransferStatusHistory, PaymentMethod, LoanPayment, 
-    LoanPaymentVerification
+    LoanPaymentVerification, MediaBlob, LoanStatusHistory, DocumentVerification, TransferFeeBand,
+    VelocityAlert
 )
+from .fx import UnknownCurrency, convert_many
+from .loan_workflow import LoanTransitionError, mark_deposit_verified, transition_loan, transition_many
+from .payment_methods import payment_method_catalog
+from .settlement import set_transfer_status
+from .thumbnails import media_name, thumbnail_url
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def document_preview(file_url, link_text, source=None):
+    """Thumbnail linking to the original upload, or a plain link for non-images"""
+    thumb_url = thumbnail_url(source or file_url)
+    if thumb_url:
+        return format_html('<a href="{}" target="_blank"><img src="{}" style="max-width: 200px; max-height: 200px; border: 1px solid #ddd; border-radius: 4px; padding: 5px;" loading="lazy" /></a>', 
+                         file_url, thumb_url)
+    return format_html('<a href="{}" target="_blank" style="color: blue;">{}</a>', file_url, link_text)
+
 # ==================== CRITICAL FIX ====================
 # Block auto-creation of "Admin" user
 from django.db.models.signals import post_save
@@ -34,10 +54,12 @@ def block_auto_admin(sender, instance, created, **kwargs):
 
 @admin.register(LoanApplication)
 class LoanApplicationAdmin(admin.ModelAdmin):
-    list_display = ('application_id', 'user', 'full_name', 'amount', 'status', 'created_at', 'view_images')
-    list_filter = ('status', 'created_at', 'loan_type')
+    list_display = ('application_id', 'user', 'full_name', 'amount', 'status', 'kyc_status', 'kyc_score', 'created_at', 'view_images')
+    list_filter = ('status', 'kyc_status', 'created_at', 'loan_type')
+    ordering = (F('kyc_score').asc(nulls_last=True), '-created_at')
     search_fields = ('application_id', 'user__username', 'full_name', 'email', 'phone')
-    readonly_fields = ('created_at', 'updated_at', 'applied_at', 'display_selfie', 'display_id_document', 'display_address_proof')
+    readonly_fields = ('created_at', 'updated_at', 'applied_at', 'display_selfie', 'display_id_document', 'display_address_proof',
+                       'kyc_status', 'kyc_score', 'display_kyc_results')
     
     fieldsets = (
         ('Application Info', {
@@ -52,6 +74,9 @@ class LoanApplicationAdmin(admin.ModelAdmin):
         ('Security Information', {
             'fields': ('security_question', 'security_answer')
         }),
+        ('Document Checks', {
+            'fields': ('kyc_status', 'kyc_score', 'display_kyc_results')
+        }),
         ('Document Preview', {
             'fields': ('display_selfie', 'display_id_document', 'display_address_proof'),
             'classes': ('collapse',)
@@ -73,64 +98,95 @@ class LoanApplicationAdmin(admin.ModelAdmin):
     
     def display_selfie(self, obj):
         if obj.selfie_url:
-            return format_html('<a href="{}" target="_blank"><img src="{}" style="max-width: 200px; max-height: 200px; border: 1px solid #ddd; border-radius: 4px; padding: 5px;" /></a>', 
-                             obj.selfie_url, obj.selfie_url)
+            return document_preview(obj.selfie_url, '📄 View Selfie')
         return "No selfie uploaded"
     display_selfie.short_description = 'Selfie Photo'
     
     def display_id_document(self, obj):
         if obj.id_document_url:
-            if obj.id_document_url.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp')):
-                return format_html('<a href="{}" target="_blank"><img src="{}" style="max-width: 200px; max-height: 200px; border: 1px solid #ddd; border-radius: 4px; padding: 5px;" /></a>', 
-                                 obj.id_document_url, obj.id_document_url)
-            else:
-                return format_html('<a href="{}" target="_blank" style="color: blue;">📄 View ID Document</a>', obj.id_document_url)
+            return document_preview(obj.id_document_url, '📄 View ID Document')
         return "No ID document uploaded"
     display_id_document.short_description = 'ID Document'
     
     def display_address_proof(self, obj):
         if obj.address_proof_url:
-            if obj.address_proof_url.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp')):
-                return format_html('<a href="{}" target="_blank"><img src="{}" style="max-width: 200px; max-height: 200px; border: 1px solid #ddd; border-radius: 4px; padding: 5px;" /></a>', 
-                                 obj.address_proof_url, obj.address_proof_url)
-            else:
-                return format_html('<a href="{}" target="_blank" style="color: blue;">📄 View Address Proof</a>', obj.address_proof_url)
+            return document_preview(obj.address_proof_url, '📄 View Address Proof')
         return "No address proof uploaded"
     display_address_proof.short_description = 'Address Proof'
     
+    def display_kyc_results(self, obj):
+        names = [media_name(url) for url in (obj.selfie_url, obj.id_document_url, obj.address_proof_url) if url]
+        rows = DocumentVerification.objects.filter(user_id=obj.user_id, name__in=names)
+        if not rows:
+            return "No check results yet"
+        return format_html_join(
+            '', '<p><strong>{}</strong>: {} ({})<br><small>{}</small></p>',
+            ((row.get_document_type_display(), row.get_status_display(), row.score,
+              '; '.join(f"{item['check']}: {item['message']}" for item in row.results)) for row in rows)
+        )
+    display_kyc_results.short_description = 'Check Results'
+    
     actions = ['approve_loans', 'reject_loans', 'mark_as_under_review', 'mark_as_disbursed']
     
+    def _transition(self, request, queryset, new_status, label):
+        changed, skipped = transition_many(queryset, new_status, actor=request.user, notes='Admin bulk action')
+        message = f"{changed} loans {label}"
+        if skipped:
+            message += f" ({skipped} skipped - status does not allow it or changed meanwhile)"
+        self.message_user(request, message)
+    
     def approve_loans(self, request, queryset):
         """Approve selected loans"""
-        updated = queryset.update(status='approved')
-        self.message_user(request, f"{updated} loans approved")
+        self._transition(request, queryset, 'approved', 'approved')
     approve_loans.short_description = "Approve selected loans"
     
     def reject_loans(self, request, queryset):
         """Reject selected loans"""
-        updated = queryset.update(status='rejected')
-        self.message_user(request, f"{updated} loans rejected")
+        self._transition(request, queryset, 'rejected', 'rejected')
     reject_loans.short_description = "Reject selected loans"
     
     def mark_as_under_review(self, request, queryset):
         """Mark selected loans as under review"""
-        updated = queryset.update(status='under_review')
-        self.message_user(request, f"{updated} loans marked as under review")
+        self._transition(request, queryset, 'under_review', 'marked as under review')
     mark_as_under_review.short_description = "Mark as under review"
     
     def mark_as_disbursed(self, request, queryset):
         """Mark selected loans as disbursed"""
-        updated = queryset.update(status='disbursed')
-        self.message_user(request, f"{updated} loans marked as disbursed")
+        self._transition(request, queryset, 'disbursed', 'marked as disbursed')
     mark_as_disbursed.short_description = "Mark as disbursed"
+    
+    def save_model(self, request, obj, form, change):
+        """Status edits on the change form go through the state machine too"""
+        if change and 'status' in form.changed_data:
+            new_status = obj.status
+            obj.status = form.initial.get('status')
+            try:
+                transition_loan(obj, new_status, actor=request.user, notes='Changed in admin')
+            except LoanTransitionError as e:
+                from django.contrib import messages
+                messages.error(request, f"Status not changed: {e}")
+                obj._status_change_failed = True
+            # transition_loan wrote the status (or lost the race); a full save
+            # would overwrite it with the value this form loaded
+            other_fields = [field for field in form.changed_data if field != 'status']
+            if other_fields:
+                obj.save(update_fields=other_fields)
+            return
+        super().save_model(request, obj, form, change)
+
+    def response_change(self, request, obj):
+        """Back to the form, without the "changed successfully" message, if the status change was refused"""
+        if getattr(obj, '_status_change_failed', False):
+            return HttpResponseRedirect(request.path)
+        return super().response_change(request, obj)
 
 # ==================== LOAN PAYMENT ADMIN ====================
 
 @admin.register(LoanPayment)
 class LoanPaymentAdmin(admin.ModelAdmin):
     list_display = ('loan_link', 'payment_method', 'amount_paid', 'transaction_id', 
-                    'verified', 'payment_date', 'created_at', 'view_payment_proof')
-    list_filter = ('verified', 'created_at', 'payment_date')
+                    'verified', 'duplicate_suspect', 'payment_date', 'created_at', 'view_payment_proof')
+    list_filter = ('verified', 'duplicate_suspect', 'created_at', 'payment_date')
     search_fields = ('loan__application_id', 'transaction_id', 'sender_name', 'sender_phone')
     readonly_fields = ('created_at', 'updated_at', 'display_payment_proof')
     
@@ -145,7 +201,7 @@ class LoanPaymentAdmin(admin.ModelAdmin):
             'fields': ('payment_proof', 'display_payment_proof')
         }),
         ('Verification', {
-            'fields': ('verified', 'verified_by', 'verified_at', 'admin_notes')
+            'fields': ('verified', 'duplicate_suspect', 'verified_by', 'verified_at', 'admin_notes')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at')
@@ -167,12 +223,7 @@ class LoanPaymentAdmin(admin.ModelAdmin):
     
     def display_payment_proof(self, obj):
         if obj.payment_proof:
-            file_url = obj.payment_proof.url
-            if str(obj.payment_proof).lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp')):
-                return format_html('<a href="{}" target="_blank"><img src="{}" style="max-width: 300px; max-height: 300px; border: 1px solid #ddd; border-radius: 4px; padding: 5px;" /></a>', 
-                                 file_url, file_url)
-            else:
-                return format_html('<a href="{}" target="_blank" style="color: blue;">📄 View Payment Proof</a>', file_url)
+            return document_preview(obj.payment_proof.url, '📄 View Payment Proof', source=obj.payment_proof.name)
         return "No payment proof uploaded"
     display_payment_proof.short_description = 'Payment Proof Preview'
     
@@ -181,20 +232,20 @@ class LoanPaymentAdmin(admin.ModelAdmin):
     def verify_payments(self, request, queryset):
         """Verify selected payments"""
         from django.utils import timezone
-        updated = queryset.update(verified=True, verified_by=request.user, verified_at=timezone.now())
-        for payment in queryset:
+        now = timezone.now()
+        # update() skips auto_now; the portfolio snapshot finds changes by updated_at
+        updated = queryset.update(verified=True, verified_by=request.user, verified_at=now, updated_at=now)
+        for payment in queryset.select_related('loan'):
             if payment.loan:
-                payment.loan.deposit_paid = True
-                if payment.loan.status == 'pending_payment':
-                    payment.loan.status = 'under_review'
-                payment.loan.save()
+                mark_deposit_verified(payment.loan, request.user)
         self.message_user(request, f"{updated} payments verified")
     verify_payments.short_description = "Verify selected payments"
     
     def reject_payments(self, request, queryset):
         """Reject selected payments"""
         from django.utils import timezone
-        updated = queryset.update(verified=False, verified_by=request.user, verified_at=timezone.now(), admin_notes='Payment rejected')
+        now = timezone.now()
+        updated = queryset.update(verified=False, verified_by=request.user, verified_at=now, updated_at=now, admin_notes='Payment rejected')
         self.message_user(request, f"{updated} payments rejected")
     reject_payments.short_description = "Reject selected payments"
 
@@ -237,12 +288,14 @@ class PaymentMethodAdmin(admin.ModelAdmin):
     def activate_methods(self, request, queryset):
         """Activate selected payment methods"""
         updated = queryset.update(is_active=True)
+        transaction.on_commit(payment_method_catalog.invalidate)  # update() sends no post_save
         self.message_user(request, f"{updated} payment methods activated")
     activate_methods.short_description = "Activate selected methods"
     
     def deactivate_methods(self, request, queryset):
         """Deactivate selected payment methods"""
         updated = queryset.update(is_active=False)
+        transaction.on_commit(payment_method_catalog.invalidate)  # update() sends no post_save
         self.message_user(request, f"{updated} payment methods deactivated")
     deactivate_methods.short_description = "Deactivate selected methods"
 
@@ -289,10 +342,10 @@ class TransactionAdmin(admin.ModelAdmin):
 
 @admin.register(MoneyTransfer)
 class MoneyTransferAdmin(admin.ModelAdmin):
-    list_display = ('reference_number', 'sender_name', 'recipient_name', 'amount', 'status', 'created_at')
+    list_display = ('reference_number', 'sender_name', 'recipient_name', 'amount', 'currency', 'display_amount_usd', 'status', 'created_at')
     list_filter = ('status', 'transfer_type', 'created_at')
     search_fields = ('reference_number', 'sender_name', 'recipient_name', 'sender_email', 'transaction_id')
-    readonly_fields = ('created_at', 'updated_at', 'reference_number')
+    readonly_fields = ('created_at', 'updated_at', 'reference_number', 'lease_owner', 'lease_expires_at', 'attempts')
     
     fieldsets = (
         ('Transfer Information', {
@@ -313,28 +366,64 @@ class MoneyTransferAdmin(admin.ModelAdmin):
         ('Timestamps', {
             'fields': ('created_at', 'updated_at', 'processed_at', 'processed_by')
         }),
+        ('Settlement', {
+            'fields': ('lease_owner', 'lease_expires_at', 'attempts'),
+            'classes': ('collapse',)
+        }),
     )
     
-    actions = ['mark_as_processing', 'mark_as_completed', 'mark_as_failed']
+    def display_amount_usd(self, obj):
+        try:
+            return f"${obj.amount_usd}"
+        except UnknownCurrency:
+            return "-"
+    display_amount_usd.short_description = 'USD'
+    
+    actions = ['mark_as_processing', 'mark_as_completed', 'mark_as_failed', 'export_usd_csv']
     
     def mark_as_processing(self, request, queryset):
         """Mark selected transfers as processing"""
-        updated = queryset.update(status='processing')
+        updated = set_transfer_status(queryset, 'processing', request.user, 'Marked as processing in admin')
         self.message_user(request, f"{updated} transfers marked as processing")
     mark_as_processing.short_description = "Mark selected as Processing"
     
     def mark_as_completed(self, request, queryset):
         """Mark selected transfers as completed"""
-        from django.utils import timezone
-        updated = queryset.update(status='completed', processed_at=timezone.now())
+        updated = set_transfer_status(queryset, 'completed', request.user, 'Marked as completed in admin')
         self.message_user(request, f"{updated} transfers marked as completed")
     mark_as_completed.short_description = "Mark selected as Completed"
     
     def mark_as_failed(self, request, queryset):
         """Mark selected transfers as failed"""
-        updated = queryset.update(status='failed')
+        updated = set_transfer_status(queryset, 'failed', request.user, 'Marked as failed in admin')
         self.message_user(request, f"{updated} transfers marked as failed")
     mark_as_failed.short_description = "Mark selected as Failed"
+    
+    def export_usd_csv(self, request, queryset):
+        """CSV of the selected transfers with amounts converted to USD"""
+        rows = list(queryset.values_list('reference_number', 'created_at', 'status', 'amount', 'currency', 'transfer_fee'))
+        try:
+            amounts_usd = convert_many([(row[3], row[4]) for row in rows])
+            fees_usd = convert_many([(row[5], row[4]) for row in rows])
+        except UnknownCurrency as e:
+            self.message_user(request, str(e), level='error')
+            return None
+        
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="transfers_usd.csv"'
+        writer = csv.writer(response)
+        writer.writerow(['Reference', 'Created', 'Status', 'Amount', 'Currency', 'Fee', 'Amount (USD)', 'Fee (USD)'])
+        for row, amount_usd, fee_usd in zip(rows, amounts_usd, fees_usd):
+            writer.writerow([*row, amount_usd, fee_usd])
+        return response
+    export_usd_csv.short_description = "Export selected as CSV (USD)"
+
+@admin.register(TransferFeeBand)
+class TransferFeeBandAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'fixed_fee', 'percent_fee', 'minimum_fee', 'maximum_fee', 'is_active')
+    list_filter = ('is_active', 'payment_method', 'transfer_type')
+    search_fields = ('recipient_country', 'transfer_type')
+    readonly_fields = ('created_at', 'updated_at')
 
 @admin.register(TransferStatusHistory)
 class TransferStatusHistoryAdmin(admin.ModelAdmin):
@@ -343,6 +432,13 @@ class TransferStatusHistoryAdmin(admin.ModelAdmin):
     search_fields = ('transfer__reference_number', 'notes')
     readonly_fields = ('created_at',)
 
+@admin.register(LoanStatusHistory)
+class LoanStatusHistoryAdmin(admin.ModelAdmin):
+    list_display = ('loan', 'old_status', 'status', 'changed_by', 'created_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('loan__application_id', 'notes')
+    readonly_fields = ('created_at',)
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'phone', 'created_at')
@@ -374,6 +470,19 @@ class SystemSettingsAdmin(admin.ModelAdmin):
     list_display = ('name', 'value', 'description')
     search_fields = ('name', 'value', 'description')
 
+@admin.register(VelocityAlert)
+class VelocityAlertAdmin(admin.ModelAdmin):
+    list_display = ('rule', 'subject', 'key', 'event_count', 'total_amount', 'window_seconds', 'reviewed', 'created_at')
+    list_filter = ('reviewed', 'subject', 'rule', 'created_at')
+    search_fields = ('rule', 'key')
+    readonly_fields = ('rule', 'subject', 'key', 'event_count', 'total_amount', 'window_seconds', 'object_id', 'created_at')
+    actions = ['mark_reviewed']
+    
+    def mark_reviewed(self, request, queryset):
+        updated = queryset.update(reviewed=True, reviewed_by=request.user)
+        self.message_user(request, f"{updated} alerts marked as reviewed")
+    mark_reviewed.short_description = "Mark selected as reviewed"
+
 @admin.register(LoanPaymentVerification)
 class LoanPaymentVerificationAdmin(admin.ModelAdmin):
     list_display = ('payment', 'status', 'verified_by', 'verified_at', 'created_at')
@@ -381,6 +490,19 @@ class LoanPaymentVerificationAdmin(admin.ModelAdmin):
     search_fields = ('payment__loan__application_id', 'notes')
     readonly_fields = ('created_at',)
 
+@admin.register(DocumentVerification)
+class DocumentVerificationAdmin(admin.ModelAdmin):
+    list_display = ('user', 'document_type', 'status', 'score', 'created_at')
+    list_filter = ('status', 'document_type', 'created_at')
+    search_fields = ('user__username', 'name', 'sha256')
+    readonly_fields = ('created_at', 'updated_at')
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'created_at', 'updated_at')
+    search_fields = ('name', 'sha256')
+    readonly_fields = ('name', 'sha256', 'size', 'created_at', 'updated_at')
+
 # ==================== SAFE USER ADMIN ====================
 
 class SafeUserAdmin(admin.ModelAdmin):
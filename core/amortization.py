@@ -0,0 +1,192 @@
+# core/amortization.py - LOAN AMORTIZATION ENGINE
+"""
+Monthly payments and repayment schedules for fixed-rate amortizing loans.
+
+Two paths:
+- Decimal (exact, rounded to cents) for anything a customer sees - the
+  dashboard figure and the schedule on the loan details page.
+- Vectorized (NumPy when installed, plain floats otherwise) for computing the
+  whole portfolio in one pass for reports.
+
+Annual rates come from SystemSettings ('loan_interest_rate_<loan_type>', then
+'loan_interest_rate'), in percent.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.cache import cache
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+CENT = Decimal('0.01')
+SCHEDULE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Used when no SystemSettings row exists for the loan type
+DEFAULT_ANNUAL_RATES = {
+    'personal': Decimal('12.0'),
+    'business': Decimal('10.0'),
+    'mortgage': Decimal('6.5'),
+    'auto': Decimal('8.0'),
+}
+
+
+def annual_rate_for(loan_type):
+    """Annual interest rate (percent) for a loan type"""
+    from .system_settings import get_value
+
+    value = get_value(f'loan_interest_rate_{loan_type}')
+    if value is None:
+        value = get_value('loan_interest_rate')
+    if value is None:
+        return DEFAULT_ANNUAL_RATES.get(loan_type, DEFAULT_ANNUAL_RATES['personal'])
+    return value
+
+
+# ==================== EXACT (DECIMAL) PATH ====================
+
+def monthly_payment(principal, annual_rate, months):
+    """Level monthly payment, rounded to cents"""
+    principal = Decimal(str(principal))
+    months = int(months)
+    if months <= 0 or principal <= 0:
+        return Decimal('0.00')
+
+    rate = Decimal(str(annual_rate)) / Decimal('1200')
+    if rate == 0:
+        payment = principal / months
+    else:
+        payment = principal * rate / (1 - (1 + rate) ** -months)
+    return payment.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def repayment_schedule(principal, annual_rate, months):
+    """Per-period rows: period, payment, principal, interest, balance.
+
+    Interest is rounded each month and the final payment absorbs the rounding
+    so the balance ends at exactly 0.00.
+    """
+    principal = Decimal(str(principal)).quantize(CENT)
+    months = int(months)
+    payment = monthly_payment(principal, annual_rate, months)
+    rate = Decimal(str(annual_rate)) / Decimal('1200')
+
+    rows = []
+    balance = principal
+    for period in range(1, months + 1):
+        interest = (balance * rate).quantize(CENT, rounding=ROUND_HALF_UP)
+        if period == months:
+            principal_part = balance
+        else:
+            principal_part = min(payment - interest, balance)
+        balance -= principal_part
+        rows.append({
+            'period': period,
+            'payment': principal_part + interest,
+            'principal': principal_part,
+            'interest': interest,
+            'balance': balance,
+        })
+    return rows
+
+
+def loan_schedule(loan):
+    """Cached repayment schedule of a LoanApplication.
+
+    The cache key includes everything the schedule depends on, so edits to
+    the loan or to the rate simply miss the old entry.
+    """
+    rate = annual_rate_for(loan.loan_type)
+    key = f'amortization:{loan.pk}:{loan.amount}:{loan.term_months}:{rate}'
+    schedule = cache.get(key)
+    if schedule is None:
+        schedule = repayment_schedule(loan.amount, rate, loan.term_months)
+        cache.set(key, schedule, SCHEDULE_CACHE_TIMEOUT)
+    return schedule
+
+
+# ==================== VECTORIZED (PORTFOLIO) PATH ====================
+
+def portfolio_payments(principals, annual_rates, months):
+    """Monthly payments for many loans at once (floats, not for display)"""
+    if NUMPY_AVAILABLE:
+        principals = np.asarray(principals, dtype=float)
+        rates = np.asarray(annual_rates, dtype=float) / 1200.0
+        months = np.asarray(months, dtype=float)
+        safe_rates = np.where(rates == 0, 1.0, rates)
+        amortizing = principals * safe_rates / (1 - (1 + safe_rates) ** -months)
+        payments = np.where(rates == 0, principals / np.maximum(months, 1), amortizing)
+        return np.where(months > 0, payments, 0.0)
+
+    payments = []
+    for principal, annual_rate, n in zip(principals, annual_rates, months):
+        principal, rate, n = float(principal), float(annual_rate) / 1200.0, int(n)
+        if n <= 0:
+            payments.append(0.0)
+        elif rate == 0:
+            payments.append(principal / n)
+        else:
+            payments.append(principal * rate / (1 - (1 + rate) ** -n))
+    return payments
+
+
+def portfolio_balances(principals, annual_rates, months, payments_made):
+    """Outstanding balance of many loans after `payments_made` instalments each"""
+    payments = portfolio_payments(principals, annual_rates, months)
+
+    if NUMPY_AVAILABLE:
+        principals = np.asarray(principals, dtype=float)
+        rates = np.asarray(annual_rates, dtype=float) / 1200.0
+        made = np.minimum(np.asarray(payments_made, dtype=float), np.asarray(months, dtype=float))
+        growth = (1 + rates) ** made
+        safe_rates = np.where(rates == 0, 1.0, rates)
+        balances = np.where(
+            rates == 0,
+            principals - payments * made,
+            principals * growth - payments * (growth - 1) / safe_rates,
+        )
+        return np.maximum(balances, 0.0)
+
+    balances = []
+    for principal, annual_rate, n, made, payment in zip(principals, annual_rates, months, payments_made, payments):
+        principal, rate, made = float(principal), float(annual_rate) / 1200.0, min(int(made), int(n))
+        if rate == 0:
+            balance = principal - payment * made
+        else:
+            growth = (1 + rate) ** made
+            balance = principal * growth - payment * (growth - 1) / rate
+        balances.append(max(balance, 0.0))
+    return balances
+
+
+def portfolio_summary(loans, as_of):
+    """Totals for an iterable of (amount, loan_type, term_months, start_date) rows.
+
+    `start_date` is when repayments started (None = not started yet).
+    """
+    rates_by_type = {}
+    principals, rates, months, made = [], [], [], []
+    for amount, loan_type, term_months, start_date in loans:
+        if loan_type not in rates_by_type:
+            rates_by_type[loan_type] = annual_rate_for(loan_type)
+        principals.append(amount)
+        rates.append(rates_by_type[loan_type])
+        months.append(term_months)
+        if start_date:
+            made.append(max((as_of.year - start_date.year) * 12 + as_of.month - start_date.month, 0))
+        else:
+            made.append(0)
+
+    if not principals:
+        return {'loans': 0, 'principal': 0.0, 'monthly_due': 0.0, 'outstanding': 0.0}
+
+    payments = portfolio_payments(principals, rates, months)
+    balances = portfolio_balances(principals, rates, months, made)
+    return {
+        'loans': len(principals),
+        'principal': float(sum(float(p) for p in principals)),
+        'monthly_due': float(sum(payments)),
+        'outstanding': float(sum(balances)),
+    }
@@ -3,4 +3,6 @@ from django.apps import AppConfig
 
 class BankingConfig(AppConfig):  # Or CoreConfig if keeping 'core'
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'core'  # This must match what's in INSTALLED_APPS
\ No newline at end of file
+    name = 'core'  # This must match what's in INSTALLED_APPS
+    def ready(self):
+        from . import checks, signals  # noqa: F401
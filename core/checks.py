@@ -0,0 +1,23 @@
+# core/checks.py - DEPLOYMENT CHECKS
+"""System checks run by `manage.py check --deploy` (registered in apps.py)."""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Velocity counters need a cache every worker shares"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        f"The default cache ({backend}) is per process.",
+        hint="Velocity rules (core/velocity.py) then count per worker, so a limit is effectively "
+             "multiplied by the number of workers. Use Redis or Memcached when running several.",
+        id='core.W001',
+    )]
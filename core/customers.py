@@ -0,0 +1,102 @@
+# core/customers.py - CUSTOMER ONBOARDING
+"""
+Creating a customer = User + UserProfile + checking Account.
+
+create_customer() does it for one sign-up in one transaction with three
+INSERTs and a single password hash. import_customers() does it for a
+migration batch with one bulk_create per table, taking password hashes
+from the old system as they are (no hashing at all).
+"""
+import logging
+from decimal import Decimal
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .ids import new_id
+from .models import Account, Transaction, UserProfile
+
+logger = logging.getLogger(__name__)
+
+
+def split_name(name):
+    parts = name.split()
+    if not parts:
+        return '', ''
+    return parts[0], ' '.join(parts[1:])
+
+
+def create_customer(email, password, name='', phone='', account_type='checking'):
+    """New non-staff customer with profile and empty account; raises IntegrityError if the email is taken"""
+    first_name, last_name = split_name(name)
+    user = User(username=email, email=email, first_name=first_name, last_name=last_name,
+                is_staff=False, is_superuser=False)
+    user.set_password(password)
+    with transaction.atomic():
+        user.save()
+        UserProfile.objects.create(user=user, phone=phone)
+        Account.objects.create(user=user, account_type=account_type, balance=Decimal('0.00'))
+    return user
+
+
+# ==================== BULK IMPORT ====================
+
+def check_password_hash(password_hash):
+    """'' (no password yet - the customer must reset it) or a hash Django can verify"""
+    if not password_hash:
+        return ''
+    identify_hasher(password_hash)  # ValueError for unknown formats
+    return password_hash
+
+
+def import_customers(customers, opening_balance_note='Opening balance (migrated)'):
+    """Create customers from dicts with email, first_name, last_name, phone,
+    password_hash, account_type and balance (already validated).
+
+    One transaction and one bulk_create each for users, profiles, accounts
+    and opening-balance transactions. Returns the created users.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(
+                username=customer['email'],
+                email=customer['email'],
+                first_name=customer['first_name'],
+                last_name=customer['last_name'],
+                password=customer['password_hash'] or make_password(None),
+                is_staff=False,
+                is_superuser=False,
+                date_joined=now,
+            )
+            for customer in customers
+        ])
+        if any(user.pk is None for user in users):
+            # Backend cannot return ids from a bulk insert
+            ids = dict(User.objects.filter(username__in=[user.username for user in users]).values_list('username', 'pk'))
+            for user in users:
+                user.pk = ids[user.username]
+
+        UserProfile.objects.bulk_create([
+            UserProfile(user=user, phone=customer['phone'])
+            for user, customer in zip(users, customers)
+        ])
+        # bulk_create skips Account.save(), so the account number is set here
+        accounts = Account.objects.bulk_create([
+            Account(user=user, account_number=new_id('ACC'), account_type=customer['account_type'], balance=customer['balance'])
+            for user, customer in zip(users, customers)
+        ])
+        if any(account.pk is None for account in accounts):
+            ids = dict(Account.objects.filter(account_number__in=[account.account_number for account in accounts]).values_list('account_number', 'pk'))
+            for account in accounts:
+                account.pk = ids[account.account_number]
+
+        Transaction.objects.bulk_create([
+            Transaction(transaction_id=new_id('TXN'), account=account, transaction_type='deposit',
+                        amount=account.balance, description=opening_balance_note)
+            for account in accounts if account.balance > 0
+        ])
+    logger.info(f"Imported {len(users)} customers")
+    return users
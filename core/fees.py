@@ -0,0 +1,89 @@
+# core/fees.py - TRANSFER FEE SCHEDULE
+"""
+Fee quotes for money transfers.
+
+The active TransferFeeBand rows are compiled once per process into
+{corridor: (sorted lower bounds, bands)}, where a corridor is
+(country, payment method, transfer type) with '' meaning "any". A quote tries
+the corridors from most to least specific and finds the amount band with a
+bisect, so it never touches the database. Saving or deleting a band
+invalidates the compiled table in every process (core/local_cache.py).
+
+Bands are in USD; other currencies are converted with core/fx.py for the
+band lookup and the fee is converted back.
+"""
+from bisect import bisect_right
+from decimal import Decimal, ROUND_HALF_UP
+from itertools import product
+
+from .fx import BASE_CURRENCY, convert
+from .local_cache import VersionedLocalCache
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+
+def _norm(value):
+    return (value or '').strip().casefold()
+
+
+def compile_fee_schedule():
+    from .models import TransferFeeBand
+
+    corridors = {}
+    for band in TransferFeeBand.objects.filter(is_active=True).order_by('min_amount'):
+        key = (_norm(band.recipient_country), band.payment_method or '', _norm(band.transfer_type))
+        corridors.setdefault(key, []).append((
+            band.min_amount, band.max_amount, band.fixed_fee, band.percent_fee,
+            band.minimum_fee, band.maximum_fee, band.pk,
+        ))
+    return {key: ([band[0] for band in bands], bands) for key, bands in corridors.items()}
+
+
+fee_schedule = VersionedLocalCache('transfer-fee-schedule', compile_fee_schedule)
+
+
+def find_band(amount, country='', payment_method='', transfer_type=''):
+    """The band a transfer falls into, or None"""
+    schedule = fee_schedule.get()
+    if not schedule:
+        return None
+    amount = Decimal(str(amount))
+    wanted = (_norm(country), payment_method or '', _norm(transfer_type))
+
+    # Exact value first, then '' (any) - the order below is most specific first
+    for corridor in product(*[(value, '') if value else ('',) for value in wanted]):
+        entry = schedule.get(corridor)
+        if not entry:
+            continue
+        bounds, bands = entry
+        index = bisect_right(bounds, amount) - 1
+        if index >= 0:
+            band = bands[index]
+            if band[1] is None or amount < band[1]:
+                return band
+    return None
+
+
+def quote_fee(amount, country='', payment_method='', transfer_type='', currency=BASE_CURRENCY):
+    """Fee for a transfer, in the transfer's currency (0.00 when no band matches)"""
+    currency = (currency or BASE_CURRENCY).upper()
+    usd_amount = convert(amount, currency) if currency != BASE_CURRENCY else Decimal(str(amount))
+
+    band = find_band(usd_amount, country, payment_method, transfer_type)
+    if band is None:
+        return ZERO
+    _, _, fixed_fee, percent_fee, minimum_fee, maximum_fee, _ = band
+    fee = fixed_fee + usd_amount * percent_fee / 100
+    fee = max(fee, minimum_fee)
+    if maximum_fee is not None:
+        fee = min(fee, maximum_fee)
+    if currency != BASE_CURRENCY:
+        return convert(fee, BASE_CURRENCY, currency)
+    return fee.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def quote(amount, country='', payment_method='', transfer_type='', currency=BASE_CURRENCY):
+    amount = Decimal(str(amount)).quantize(CENT)
+    fee = quote_fee(amount, country, payment_method, transfer_type, currency)
+    return {'amount': amount, 'fee': fee, 'total': amount + fee, 'currency': (currency or BASE_CURRENCY).upper()}
@@ -0,0 +1,184 @@
+# core/fx.py - EXCHANGE RATES
+"""
+Currency conversion for multi-currency transfers.
+
+Rates come from the source named in settings.FX_RATE_SOURCE and are kept in
+process memory:
+- younger than FX_CACHE_TTL: used as is,
+- older: still used, while one background job (core/tasks.py) fetches
+  fresh rates - stale-while-revalidate. Past FX_MAX_STALE a warning is
+  logged, but the old rates are still served,
+- not fetched yet: the process starts from FX_RATES_FILE if it can be read,
+  else the static table, and fetches in the background.
+So a quote never waits on the rate source. A failed fetch is logged, keeps
+the old rates and is retried after RETRY_AFTER_FAILURE seconds.
+
+All rates are "units of currency per 1 USD".
+"""
+import json
+import logging
+import threading
+import time
+from decimal import Decimal, ROUND_HALF_UP
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .tasks import run_in_background
+
+logger = logging.getLogger(__name__)
+
+BASE_CURRENCY = 'USD'
+CENT = Decimal('0.01')
+RETRY_AFTER_FAILURE = 60
+
+DEFAULT_STATIC_RATES = {
+    'USD': '1',
+    'EUR': '0.92',
+    'GBP': '0.79',
+    'CAD': '1.36',
+    'NGN': '1550',
+    'GHS': '15.5',
+    'KES': '129',
+    'INR': '83.5',
+}
+
+
+class UnknownCurrency(Exception):
+    pass
+
+
+# ==================== RATE SOURCES ====================
+
+class BaseRateSource:
+    def fetch(self):
+        """{currency: Decimal rate per 1 USD}"""
+        raise NotImplementedError
+
+
+def _parse_rates(rates):
+    parsed = {code.upper(): Decimal(str(rate)) for code, rate in rates.items()}
+    parsed[BASE_CURRENCY] = Decimal('1')
+    return parsed
+
+
+class StaticRateSource(BaseRateSource):
+    """Fixed rates from settings.FX_STATIC_RATES (development and tests)"""
+
+    def fetch(self):
+        return _parse_rates(getattr(settings, 'FX_STATIC_RATES', DEFAULT_STATIC_RATES))
+
+
+class FileRateSource(BaseRateSource):
+    """JSON file {"rates": {"EUR": 0.92, ...}} at settings.FX_RATES_FILE, e.g. written by a cron job"""
+
+    def fetch(self):
+        with open(settings.FX_RATES_FILE) as handle:
+            return _parse_rates(json.load(handle)['rates'])
+
+
+class UrlRateSource(BaseRateSource):
+    """Same JSON shape served over HTTP at settings.FX_RATES_URL"""
+
+    def fetch(self):
+        with urlopen(settings.FX_RATES_URL, timeout=getattr(settings, 'FX_FETCH_TIMEOUT', 5)) as response:
+            return _parse_rates(json.load(response)['rates'])
+
+
+def get_rate_source():
+    return import_string(getattr(settings, 'FX_RATE_SOURCE', 'core.fx.StaticRateSource'))()
+
+
+# ==================== CACHE ====================
+
+class RateCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rates = None
+        self._fetched_at = None  # None until the rate source answers once
+        self._refreshing = False
+        self._retry_at = 0.0
+
+    def _fetch(self):
+        rates = get_rate_source().fetch()
+        with self._lock:
+            self._rates = rates
+            self._fetched_at = time.monotonic()
+        return rates
+
+    def _seed(self):
+        """Rates to answer with until the first fetch: the rates file if there is one, else the static table"""
+        try:
+            return FileRateSource().fetch()
+        except Exception:
+            return StaticRateSource().fetch()
+
+    def _background_refresh(self):
+        try:
+            self._fetch()
+            logger.info("FX rates refreshed")
+        except Exception:
+            self._retry_at = time.monotonic() + RETRY_AFTER_FAILURE
+            logger.exception("FX rate refresh failed - keeping the old rates")
+        finally:
+            self._refreshing = False
+
+    def rates(self):
+        if self._rates is None:
+            with self._lock:
+                if self._rates is None:
+                    self._rates = self._seed()
+        rates = self._rates
+
+        now = time.monotonic()
+        age = None if self._fetched_at is None else now - self._fetched_at
+        if (age is None or age > getattr(settings, 'FX_CACHE_TTL', 300)) and now >= self._retry_at:
+            with self._lock:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                if age is not None and age > getattr(settings, 'FX_MAX_STALE', 60 * 60 * 24):
+                    logger.warning(f"FX rates are {age / 3600:.1f} hours old")
+                run_in_background(self._background_refresh)
+        return rates
+
+    def clear(self):
+        with self._lock:
+            self._rates = None
+            self._fetched_at = None
+            self._retry_at = 0.0
+
+
+rate_cache = RateCache()
+
+
+# ==================== CONVERSION ====================
+
+def get_rate(from_currency, to_currency, rates=None):
+    rates = rates or rate_cache.rates()
+    try:
+        return rates[to_currency.upper()] / rates[from_currency.upper()]
+    except KeyError as e:
+        raise UnknownCurrency(f"No exchange rate for {e.args[0]}")
+
+
+def convert(amount, from_currency, to_currency=BASE_CURRENCY, rates=None):
+    """Amount in `to_currency`, rounded to cents"""
+    if from_currency.upper() == to_currency.upper():
+        return Decimal(str(amount)).quantize(CENT)
+    rate = get_rate(from_currency, to_currency, rates)
+    return (Decimal(str(amount)) * rate).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def convert_many(rows, to_currency=BASE_CURRENCY):
+    """Convert (amount, currency) pairs with one rate lookup, e.g. for exports"""
+    rates = rate_cache.rates()
+    factors = {}
+    converted = []
+    for amount, currency in rows:
+        currency = (currency or BASE_CURRENCY).upper()
+        if currency not in factors:
+            factors[currency] = get_rate(currency, to_currency, rates)
+        converted.append((Decimal(str(amount)) * factors[currency]).quantize(CENT, rounding=ROUND_HALF_UP))
+    return converted
@@ -0,0 +1,153 @@
+# core/idempotency.py - IDEMPOTENCY KEYS FOR MONEY-MOVING POSTS
+"""
+Makes retried POSTs safe.
+
+Forms carry a hidden `idempotency_key` field (API clients can send an
+`Idempotency-Key` header instead). The first request with a key claims it in
+the cache with cache.add(), runs the view and stores a compact copy of the
+response next to a fingerprint of the request. A retry with the same key
+gets the stored response back without running the view again, so a double
+submit on a slow connection cannot create a second LoanApplication,
+LoanPayment or Transaction.
+
+Entries expire after IDEMPOTENCY_KEY_TTL seconds. Keys are scoped per user,
+and reusing a key with a different request body is refused with 422.
+"""
+import hashlib
+import logging
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+FORM_FIELD = 'idempotency_key'
+PROCESSING = 'processing'
+DONE = 'done'
+
+# Form fields that change between identical submits
+IGNORED_FIELDS = {'csrfmiddlewaretoken', FORM_FIELD}
+
+
+def new_idempotency_key():
+    """Fresh key for a form about to be rendered"""
+    return uuid.uuid4().hex
+
+
+def get_idempotency_key(request):
+    key = request.META.get(HEADER) or request.POST.get(FORM_FIELD, '')
+    key = key.strip()
+    # Anything longer is not one of ours
+    return key[:64] if key else None
+
+
+def request_fingerprint(request):
+    """Hash of what the request asks for, so a key cannot be reused for something else"""
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.path}'.encode())
+    for field in sorted(request.POST):
+        if field in IGNORED_FIELDS:
+            continue
+        for value in request.POST.getlist(field):
+            digest.update(f'\0{field}={value}'.encode())
+    for field in sorted(request.FILES):
+        for upload in request.FILES.getlist(field):
+            digest.update(f'\0{field}:{upload.name}:{upload.size}:{upload_sha256(upload)}'.encode())
+    return digest.hexdigest()
+
+
+def upload_sha256(upload):
+    """Content hash of an upload - from DocumentUploadHandler if it hashed it already, else read here"""
+    if getattr(upload, 'sha256', None):
+        return upload.sha256
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def _cache_key(request, key):
+    user_id = request.user.pk if request.user.is_authenticated else 'anon'
+    return f'idempotency:{user_id}:{key}'
+
+
+def _freeze(response):
+    """Just enough of a response to replay it"""
+    return {
+        'status': response.status_code,
+        'content': response.content,
+        'headers': [(name, value) for name, value in response.items()
+                    if name.lower() not in ('set-cookie', 'vary')],
+    }
+
+
+def _replay(entry):
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for name, value in entry['headers']:
+        response[name] = value
+    response['Idempotent-Replay'] = 'true'
+    return response
+
+
+def idempotent(view_func):
+    """Replay the stored response for POSTs that repeat an idempotency key.
+
+    Requests without a key run as before. Put this below @document_uploads so
+    the body is parsed with the upload handlers already in place.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return view_func(request, *args, **kwargs)
+
+        key = get_idempotency_key(request)
+        if not key:
+            return view_func(request, *args, **kwargs)
+
+        cache_key = _cache_key(request, key)
+        fingerprint = request_fingerprint(request)
+        ttl = getattr(settings, 'IDEMPOTENCY_KEY_TTL', 60 * 60 * 24)
+
+        if not cache.add(cache_key, {'state': PROCESSING, 'fingerprint': fingerprint}, ttl):
+            # Someone used this key already - wait for the first request if it is still running
+            deadline = time.monotonic() + getattr(settings, 'IDEMPOTENCY_WAIT_SECONDS', 5)
+            entry = cache.get(cache_key)
+            while entry and entry['state'] == PROCESSING and time.monotonic() < deadline:
+                time.sleep(0.2)
+                entry = cache.get(cache_key)
+
+            if entry is None:
+                # Expired or released while we waited - treat as a fresh request
+                return wrapper(request, *args, **kwargs)
+            if entry['fingerprint'] != fingerprint:
+                logger.warning(f"Idempotency key reused with a different request on {request.path}")
+                return HttpResponse('This idempotency key was already used for a different request.', status=422)
+            if entry['state'] == PROCESSING:
+                return HttpResponse('The original request is still being processed. Please wait and refresh.', status=409)
+
+            logger.info(f"Replaying stored response for idempotency key on {request.path}")
+            return _replay(entry['response'])
+
+        try:
+            response = view_func(request, *args, **kwargs)
+        except Exception:
+            # Nothing was committed as far as we know - let a retry run again
+            cache.delete(cache_key)
+            raise
+
+        if response.status_code >= 500 or getattr(response, 'streaming', False):
+            cache.delete(cache_key)
+            return response
+
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        cache.set(cache_key, {'state': DONE, 'fingerprint': fingerprint, 'response': _freeze(response)}, ttl)
+        return response
+
+    return wrapper
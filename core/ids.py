@@ -0,0 +1,81 @@
+# core/ids.py - REFERENCE NUMBER GENERATOR
+"""
+Time-ordered unique IDs (ULID) for application IDs, transfer references,
+account numbers and transaction IDs.
+
+A ULID is 48 bits of millisecond timestamp followed by 80 random bits,
+written as 26 Crockford base32 characters. Consecutive IDs sort in creation
+order, so new rows land at the end of the unique index instead of at random
+pages (as UUID4 did), and nothing depends on the clock second like the old
+int(time.time()) references.
+
+Within a process IDs are strictly increasing: a second ID in the same
+millisecond is the previous one plus one. Different processes (and forked
+workers, which reseed) pick independent random tails, so a collision needs
+two 80-bit random values to meet in the same millisecond.
+"""
+import os
+import secrets
+import threading
+import time
+
+CROCKFORD = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+RANDOM_BITS = 80
+RANDOM_MAX = (1 << RANDOM_BITS) - 1
+
+_lock = threading.Lock()
+_last_ms = 0
+_last_random = 0
+
+
+def _reset_after_fork():
+    global _lock, _last_ms, _last_random
+    _lock = threading.Lock()
+    _last_ms = 0
+    _last_random = 0
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _encode(value, length):
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 32)
+        chars.append(CROCKFORD[index])
+    return ''.join(reversed(chars))
+
+
+def new_ulid():
+    """Next 26-character ULID for this process"""
+    global _last_ms, _last_random
+
+    with _lock:
+        now_ms = int(time.time() * 1000)
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            _last_random = secrets.randbits(RANDOM_BITS)
+        elif _last_random < RANDOM_MAX:
+            # Same millisecond (or the clock stepped back): keep counting from the last ID
+            _last_random += 1
+        else:
+            _last_ms += 1
+            _last_random = secrets.randbits(RANDOM_BITS)
+        value = (_last_ms << RANDOM_BITS) | _last_random
+
+    return _encode(value, 26)
+
+
+def new_id(prefix):
+    """e.g. new_id('LOAN') -> 'LOAN-01JAB3K5...'"""
+    return f'{prefix}-{new_ulid()}'
+
+
+def ulid_timestamp(value):
+    """Creation time (Unix seconds) of an ID made by new_id()/new_ulid()"""
+    ulid = value.rsplit('-', 1)[-1].upper()
+    millis = 0
+    for char in ulid[:10]:
+        millis = millis * 32 + CROCKFORD.index(char)
+    return millis / 1000
@@ -0,0 +1,100 @@
+# core/ingest.py - KYC IMAGE NORMALIZATION
+"""
+Ingest stage for selfie, ID, address-proof and payment-proof uploads.
+
+Phone photos arrive as 3-12 MP JPEGs with EXIF (GPS, device info) and a
+rotation flag. Before storing, images are rotated upright, stripped of all
+metadata, capped at KYC_IMAGE_MAX_DIMENSION and re-encoded as JPEG. PDFs and
+anything Pillow cannot decode are stored untouched. With KYC_KEEP_ORIGINALS
+the untouched upload is also kept in the cold tier (KYC_COLD_STORAGE_ROOT).
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from .storage import ContentAddressedStorage
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+NORMALIZED_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp')
+
+_cold_storage = None
+
+
+def get_cold_storage():
+    """Deduplicated storage for untouched originals (not web-served)"""
+    global _cold_storage
+    if _cold_storage is None:
+        _cold_storage = ContentAddressedStorage(
+            location=getattr(settings, 'KYC_COLD_STORAGE_ROOT', settings.BASE_DIR / 'cold_storage'),
+            base_url=None,
+        )
+    return _cold_storage
+
+
+def normalize_image(upload):
+    """Return JPEG bytes of the upright, metadata-free, size-capped image.
+
+    Returns None if the upload is not an image we can decode.
+    """
+    if not PIL_AVAILABLE or getattr(upload, 'content_type', None) not in NORMALIZED_TYPES:
+        return None
+
+    max_dimension = getattr(settings, 'KYC_IMAGE_MAX_DIMENSION', 2048)
+    try:
+        upload.seek(0)
+        image = Image.open(upload)
+        # JPEG decoder can skip detail we would throw away anyway
+        image.draft('RGB', (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        else:
+            image = image.convert('RGB')
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        buffer = BytesIO()
+        # No exif/icc arguments, so nothing from the original is carried over
+        image.save(
+            buffer, 'JPEG',
+            quality=getattr(settings, 'KYC_IMAGE_QUALITY', 82),
+            optimize=True,
+            progressive=True,
+        )
+    except Exception as e:
+        logger.warning(f"Could not normalize {upload.name}: {str(e)}")
+        return None
+    finally:
+        upload.seek(0)
+
+    return buffer.getvalue()
+
+
+def prepare_document(upload, name):
+    """Run the ingest stage for one upload.
+
+    Returns (name, content) to hand to the document storage. Images come back
+    as a normalized JPEG named *.jpg; everything else is returned as is.
+    """
+    normalized = normalize_image(upload)
+    if normalized is None:
+        return name, upload
+
+    if getattr(settings, 'KYC_KEEP_ORIGINALS', False):
+        get_cold_storage().save(f'originals/{name}', upload)
+
+    name = os.path.splitext(name)[0] + '.jpg'
+    logger.info(f"Normalized {upload.name}: {upload.size} -> {len(normalized)} bytes")
+    return name, ContentFile(normalized, name=os.path.basename(name))
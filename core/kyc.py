@@ -0,0 +1,223 @@
+# core/kyc.py - AUTOMATED DOCUMENT CHECKS
+"""
+Background verification of the KYC documents uploaded in loan step 1.
+
+schedule_document_checks() queues one job per document on the worker pool
+(core/tasks.py), so the upload request returns immediately. Each job runs the
+checks listed in settings.KYC_DOCUMENT_CHECKS against the stored file and
+records a DocumentVerification row. Once every document of an application
+has been checked, LoanApplication.kyc_status/kyc_score are filled in and the
+staff review queue sorts on them.
+
+A check is any callable taking a Document and returning a dict
+{'check', 'status' ('passed'/'warning'/'failed'), 'message', 'penalty'}, or
+None when it does not apply.
+"""
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .tasks import run_after_commit
+from .thumbnails import media_name
+from .uploads import sniff_content_type
+
+try:
+    from PIL import Image, ImageStat
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+EXTENSION_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.pdf': 'application/pdf',
+}
+
+DEFAULT_CHECKS = [
+    'core.kyc.check_file_type',
+    'core.kyc.check_image_quality',
+    'core.kyc.check_duplicate_document',
+]
+
+
+@dataclass
+class Document:
+    user_id: int
+    document_type: str
+    name: str
+    path: str
+    sha256: str
+    head: bytes
+
+
+def result(check, status, message, penalty=0):
+    return {'check': check, 'status': status, 'message': message, 'penalty': penalty}
+
+
+# ==================== CHECKS ====================
+
+def check_file_type(document):
+    """The content must be an accepted type and match the file extension"""
+    content_type = sniff_content_type(document.head)
+    allowed = getattr(settings, 'LOAN_UPLOAD_ALLOWED_TYPES', list(EXTENSION_TYPES.values()))
+    if content_type is None or content_type not in allowed:
+        return result('file_type', 'failed', 'File content is not an accepted document type', 60)
+
+    expected = EXTENSION_TYPES.get(os.path.splitext(document.name)[1].lower())
+    if expected and expected != content_type:
+        return result('file_type', 'warning', f'Extension does not match content ({content_type})', 20)
+    return result('file_type', 'passed', content_type)
+
+
+def check_image_quality(document):
+    """Images must be big enough to read and not blank"""
+    if not PIL_AVAILABLE or document.head.startswith(b'%PDF-'):
+        return None
+
+    min_dimension = getattr(settings, 'KYC_MIN_IMAGE_DIMENSION', 400)
+    try:
+        with Image.open(document.path) as image:
+            width, height = image.size
+            image.draft('L', (256, 256))  # cheap decode for JPEGs, the statistics need no detail
+            sample = image.convert('L')
+            sample.thumbnail((256, 256))
+            contrast = ImageStat.Stat(sample).stddev[0]
+    except Exception as e:
+        return result('image_quality', 'failed', f'Image could not be decoded: {e}', 50)
+
+    if min(width, height) < min_dimension:
+        return result('image_quality', 'warning', f'Image is only {width}x{height} pixels', 25)
+    if contrast < 8:
+        return result('image_quality', 'warning', 'Image looks blank or very dark', 20)
+    return result('image_quality', 'passed', f'{width}x{height}')
+
+
+def check_duplicate_document(document):
+    """The same file should not show up for another customer or another document slot"""
+    from .models import DocumentVerification
+
+    seen = DocumentVerification.objects.filter(sha256=document.sha256).exclude(
+        user_id=document.user_id, name=document.name
+    )
+    if seen.exclude(user_id=document.user_id).exists():
+        return result('duplicate', 'failed', 'The same file was submitted by another customer', 70)
+    if seen.exclude(document_type=document.document_type).exists():
+        return result('duplicate', 'warning', 'The same file was used for a different document', 30)
+    return result('duplicate', 'passed', 'Not seen before')
+
+
+# ==================== PIPELINE ====================
+
+def get_checks():
+    return [import_string(path) for path in getattr(settings, 'KYC_DOCUMENT_CHECKS', DEFAULT_CHECKS)]
+
+
+def _sha256(name, path):
+    from .models import MediaBlob
+
+    blob = MediaBlob.objects.filter(name=name).only('sha256').first()
+    if blob:
+        return blob.sha256
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def summarize(results):
+    """Overall (status, score) of a list of check results"""
+    statuses = {item['status'] for item in results}
+    score = max(0, 100 - sum(item.get('penalty', 0) for item in results))
+    if 'failed' in statuses:
+        return 'failed', score
+    if 'warning' in statuses:
+        return 'warning', score
+    return 'passed', score
+
+
+def verify_document(user_id, document_type, name):
+    """Run every check on one stored document and record the outcome"""
+    from .models import DocumentVerification
+    from .storage import document_storage
+
+    path = document_storage.path(name)
+    if not os.path.exists(path):
+        results = [result('exists', 'failed', 'File is missing from storage', 100)]
+        sha256 = ''
+    else:
+        with open(path, 'rb') as handle:
+            head = handle.read(16)
+        sha256 = _sha256(name, path)
+        document = Document(user_id, document_type, name, path, sha256, head)
+        results = []
+        for check in get_checks():
+            try:
+                outcome = check(document)
+            except Exception as e:
+                logger.exception(f"KYC check {check.__name__} crashed on {name}")
+                outcome = result(check.__name__, 'warning', f'Check crashed: {e}', 10)
+            if outcome:
+                results.append(outcome)
+
+    status, score = summarize(results)
+    verification, _ = DocumentVerification.objects.update_or_create(
+        user_id=user_id, name=name,
+        defaults={'document_type': document_type, 'sha256': sha256, 'status': status,
+                  'score': score, 'results': results},
+    )
+    logger.info(f"KYC {document_type} for user {user_id}: {status} ({score})")
+
+    refresh_pending_applications(user_id)
+    return verification
+
+
+def schedule_document_checks(user, documents):
+    """Queue checks for {document_type: url} after the upload request commits"""
+    for document_type, url in documents.items():
+        name = media_name(url)
+        if name:
+            run_after_commit(verify_document, user.pk, document_type, name)
+
+
+def update_application_kyc(loan):
+    """Roll the document results up onto the application once all are in"""
+    from .models import DocumentVerification, LoanApplication
+
+    names = {media_name(url) for url in (loan.selfie_url, loan.id_document_url, loan.address_proof_url)}
+    names.discard(None)
+    if not names:
+        return loan
+
+    verifications = list(DocumentVerification.objects.filter(user_id=loan.user_id, name__in=names))
+    if len(verifications) < len(names):
+        return loan  # still running
+
+    statuses = {v.status for v in verifications}
+    if 'failed' in statuses:
+        kyc_status = 'failed'
+    elif 'warning' in statuses:
+        kyc_status = 'review'
+    else:
+        kyc_status = 'passed'
+    kyc_score = min(v.score for v in verifications)
+
+    LoanApplication.objects.filter(pk=loan.pk).update(kyc_status=kyc_status, kyc_score=kyc_score)
+    loan.kyc_status, loan.kyc_score = kyc_status, kyc_score
+    return loan
+
+
+def refresh_pending_applications(user_id):
+    from .models import LoanApplication
+
+    for loan in LoanApplication.objects.filter(user_id=user_id, kyc_status='pending'):
+        update_application_kyc(loan)
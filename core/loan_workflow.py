@@ -0,0 +1,151 @@
+# core/loan_workflow.py - LOAN STATUS STATE MACHINE
+"""
+Single entry point for changing LoanApplication.status.
+
+Every change goes through transition_loan(), which:
+1. checks the move against LOAN_TRANSITIONS,
+2. claims it with a compare-and-set UPDATE ... WHERE status = <old status>,
+   so of two concurrent clicks only one can win,
+3. runs the side effects (disbursement, deposit flag, history row) in the
+   same transaction - they happen exactly once or not at all,
+4. announces the new status to live status streams (core/status_events.py).
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Account, LoanApplication, LoanStatusHistory, Transaction
+from .status_events import publish_loan
+
+logger = logging.getLogger(__name__)
+
+# status -> statuses it may move to
+LOAN_TRANSITIONS = {
+    'pending': ('pending_payment', 'under_review', 'rejected'),
+    'pending_payment': ('under_review', 'rejected'),
+    'under_review': ('approved', 'rejected'),
+    'approved': ('disbursed', 'completed'),
+    'disbursed': ('completed',),
+    'rejected': ('under_review',),
+    'completed': (),
+}
+
+
+class LoanTransitionError(Exception):
+    """Base class for refused status changes"""
+
+
+class InvalidTransition(LoanTransitionError):
+    """The transition table does not allow this move"""
+
+
+class TransitionConflict(LoanTransitionError):
+    """Somebody else changed the status first"""
+
+
+def allowed_transitions(status):
+    return LOAN_TRANSITIONS.get(status, ())
+
+
+def _disburse(loan, actor):
+    """Credit the approved amount (less the deposit) to the customer's account"""
+    account = Account.objects.select_for_update().filter(user_id=loan.user_id).first()
+    if not account:
+        logger.warning(f"Loan {loan.application_id} approved but user {loan.user_id} has no account")
+        return
+
+    loan_amount = loan.amount - loan.deposit_required
+    # F() so a concurrent balance change is not overwritten
+    Account.objects.filter(pk=account.pk).update(balance=F('balance') + loan_amount, updated_at=timezone.now())
+    Transaction.objects.create(
+        account=account,
+        transaction_type='loan_disbursement',
+        amount=loan_amount,
+        description=f'Loan Disbursement: {loan.purpose} (Application ID: {loan.application_id})'
+    )
+    logger.info(f"Disbursed ${loan_amount} for loan {loan.application_id} to account {account.account_number}")
+
+
+# (old status, new status) -> side effects, run inside the transition's transaction
+SIDE_EFFECTS = {
+    ('under_review', 'approved'): [_disburse],
+}
+
+# Field updates applied together with the status change
+FIELD_UPDATES = {
+    'approved': {'deposit_paid': True},
+}
+
+
+def transition_loan(loan, new_status, actor=None, notes='', deposit_paid=None):
+    """Move `loan` to `new_status`; raises LoanTransitionError if refused.
+
+    deposit_paid=True additionally marks the deposit as received in the same
+    UPDATE (used when a payment is verified).
+    """
+    old_status = loan.status
+    if new_status not in allowed_transitions(old_status):
+        raise InvalidTransition(f"Cannot change loan {loan.application_id} from {old_status} to {new_status}")
+
+    updates = dict(FIELD_UPDATES.get(new_status, {}))
+    if deposit_paid is not None:
+        updates['deposit_paid'] = deposit_paid
+
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = LoanApplication.objects.filter(pk=loan.pk, status=old_status).update(
+            status=new_status, updated_at=now, **updates
+        )
+        if not claimed:
+            raise TransitionConflict(f"Loan {loan.application_id} was changed by someone else - reload and try again")
+
+        for effect in SIDE_EFFECTS.get((old_status, new_status), []):
+            effect(loan, actor)
+
+        LoanStatusHistory.objects.create(
+            loan=loan,
+            old_status=old_status,
+            status=new_status,
+            notes=notes,
+            changed_by=actor,
+        )
+
+        loan.status = new_status
+        loan.updated_at = now
+        for field, value in updates.items():
+            setattr(loan, field, value)
+        publish_loan(loan)
+
+    logger.info(f"Loan {loan.application_id}: {old_status} -> {new_status}")
+    return loan
+
+
+def mark_deposit_verified(loan, actor=None):
+    """A deposit payment was verified: flag it and queue the loan for review"""
+    if 'under_review' in allowed_transitions(loan.status):
+        try:
+            return transition_loan(loan, 'under_review', actor=actor, notes='Deposit payment verified', deposit_paid=True)
+        except TransitionConflict:
+            loan.refresh_from_db(fields=['status'])
+    # Already past the deposit stage - only record the flag
+    now = timezone.now()
+    LoanApplication.objects.filter(pk=loan.pk).update(deposit_paid=True, updated_at=now)
+    loan.deposit_paid = True
+    loan.updated_at = now
+    publish_loan(loan)
+    return loan
+
+
+def transition_many(queryset, new_status, actor=None, notes=''):
+    """Apply a transition to each loan; returns (changed, skipped) counts"""
+    changed = skipped = 0
+    for loan in queryset.select_related('user'):
+        try:
+            transition_loan(loan, new_status, actor=actor, notes=notes)
+            changed += 1
+        except LoanTransitionError as e:
+            logger.info(str(e))
+            skipped += 1
+    return changed, skipped
@@ -0,0 +1,87 @@
+# core/local_cache.py - PROCESS-LOCAL CACHES WITH SHARED INVALIDATION
+"""
+Keeps a compiled structure (fee table, settings, catalogs...) in process
+memory, so reading it is a dict/bisect lookup instead of a query.
+
+Every process holds its own copy. A version counter in the database
+(CacheVersion) tells processes when to rebuild: invalidate() bumps it, and
+other processes notice at their next version check (one small query at most
+every `check_interval` seconds). The process that invalidates rebuilds at
+once. The counter is in the database rather than the Django cache because
+the default cache is per process (LocMemCache) and a bump there would never
+reach the other workers.
+
+As a backstop, a copy older than `max_age` seconds (LOCAL_CACHE_MAX_AGE) is
+rebuilt whatever the version says, so a missed invalidation - e.g. a raw
+QuerySet.update() that forgot to call invalidate() - heals by itself.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE = 300
+
+
+class VersionedLocalCache:
+    def __init__(self, name, builder, check_interval=5, max_age=None):
+        self.name = name
+        self.builder = builder
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._state = None  # (version, value, checked_at, built_at), replaced as a whole
+
+    def _max_age(self):
+        if self.max_age is not None:
+            return self.max_age
+        return getattr(settings, 'LOCAL_CACHE_MAX_AGE', DEFAULT_MAX_AGE)
+
+    def _shared_version(self):
+        from .models import CacheVersion
+
+        try:
+            return CacheVersion.objects.filter(name=self.name).values_list('version', flat=True).first() or 0
+        except DatabaseError:
+            # Table not migrated yet - rely on max_age
+            logger.warning(f"Cannot read the version of the {self.name} cache")
+            return None
+
+    def get(self):
+        state = self._state
+        now = time.monotonic()
+        if state is not None and now - state[2] < self.check_interval:
+            return state[1]
+
+        with self._lock:
+            version = self._shared_version()
+            state = self._state
+            if state is not None and state[0] == version and now - state[3] < self._max_age():
+                value, built_at = state[1], state[3]
+            else:
+                started = time.perf_counter()
+                value = self.builder()
+                built_at = now
+                logger.info(f"Rebuilt {self.name} cache in {(time.perf_counter() - started) * 1000:.1f} ms")
+            self._state = (version, value, now, built_at)
+            return value
+
+    def invalidate(self):
+        """Force a rebuild here and in every other process (call after the change commits)"""
+        from .models import CacheVersion
+
+        try:
+            with transaction.atomic():
+                if not CacheVersion.objects.filter(name=self.name).update(version=F('version') + 1):
+                    CacheVersion.objects.create(name=self.name, version=1)
+        except IntegrityError:
+            # Another process created the row first
+            CacheVersion.objects.filter(name=self.name).update(version=F('version') + 1)
+        except DatabaseError:
+            logger.warning(f"Cannot bump the version of the {self.name} cache - other processes catch up after max_age")
+        self._state = None
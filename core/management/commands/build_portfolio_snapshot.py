@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core.portfolio import build_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Refresh the loan portfolio snapshot used by the staff portfolio page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every month instead of only changed ones')
+
+    def handle(self, *args, **options):
+        """
+        Incremental by default: only origination months with loans or
+        payments changed since the previous run are re-aggregated.
+        Run with --full after deleting loans.
+        """
+        run = build_snapshot(full=options['full'])
+
+        self.stdout.write("=" * 60)
+        self.stdout.write(self.style.SUCCESS("Portfolio snapshot updated"))
+        self.stdout.write(f"  Mode: {'full rebuild' if run.full_rebuild else 'incremental'}")
+        self.stdout.write(f"  Months rebuilt: {run.months_rebuilt}")
+        self.stdout.write(f"  Snapshot rows written: {run.rows_written}")
+        self.stdout.write(f"  Watermark: {run.watermark:%Y-%m-%d %H:%M:%S}")
+        self.stdout.write("=" * 60)
@@ -0,0 +1,101 @@
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from core.models import LoanApplication, LoanPayment, MediaBlob
+from core.storage import document_storage
+from core.thumbnails import media_name
+
+DOCUMENT_URL_FIELDS = ('selfie_url', 'id_document_url', 'address_proof_url')
+
+
+class Command(BaseCommand):
+    help = 'Move existing loan documents into content-addressed storage, merging duplicates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+        parser.add_argument('--keep-originals', action='store_true', help='Do not delete the old files')
+
+    def handle(self, *args, **options):
+        """
+        Rewrites LoanApplication document URLs and LoanPayment.payment_proof
+        names to point at deduplicated blobs, so identical uploads end up
+        sharing one file.
+        """
+        dry_run = options['dry_run']
+        migrated = {}  # old storage name -> blob name
+        stats = {'references': 0, 'files': 0, 'missing': 0}
+
+        self.stdout.write("=" * 60)
+        self.stdout.write(self.style.SUCCESS("Deduplicating stored documents..."))
+        self.stdout.write("=" * 60)
+
+        def migrate(old_name):
+            """Return the blob name for a legacy file, storing it on first sight"""
+            if old_name in migrated:
+                stats['references'] += 1
+                return migrated[old_name]
+
+            if not document_storage.exists(old_name):
+                stats['missing'] += 1
+                self.stdout.write(self.style.WARNING(f"✗ Missing file: {old_name}"))
+                return None
+
+            if dry_run:
+                new_name = old_name
+            else:
+                with document_storage.open(old_name, 'rb') as handle:
+                    new_name = document_storage.save(old_name, File(handle, name=old_name))
+            migrated[old_name] = new_name
+            stats['files'] += 1
+            stats['references'] += 1
+            return new_name
+
+        blob_names = set(MediaBlob.objects.values_list('name', flat=True))
+
+        for loan in LoanApplication.objects.only('id', *DOCUMENT_URL_FIELDS).iterator():
+            changed = []
+            for field in DOCUMENT_URL_FIELDS:
+                old_name = media_name(getattr(loan, field))
+                if not old_name or old_name in blob_names:
+                    continue
+                new_name = migrate(old_name)
+                if new_name and new_name != old_name:
+                    setattr(loan, field, document_storage.url(new_name))
+                    changed.append(field)
+            if changed and not dry_run:
+                loan.save(update_fields=changed)
+
+        for payment in LoanPayment.objects.exclude(payment_proof='').exclude(payment_proof=None).only('id', 'payment_proof').iterator():
+            old_name = payment.payment_proof.name
+            if old_name in blob_names:
+                continue
+            # Older payments stored only the file name, relative to media/loan_payments/
+            if not document_storage.exists(old_name) and document_storage.exists(f'loan_payments/{old_name}'):
+                old_name = f'loan_payments/{old_name}'
+            new_name = migrate(old_name)
+            if new_name and new_name != payment.payment_proof.name and not dry_run:
+                payment.payment_proof.name = new_name
+                payment.save(update_fields=['payment_proof'])
+
+        deleted = 0
+        if not dry_run and not options['keep_originals']:
+            for old_name, new_name in migrated.items():
+                if old_name != new_name and os.path.exists(os.path.join(settings.MEDIA_ROOT, old_name)):
+                    # Legacy files have no MediaBlob row, so this is a plain delete
+                    document_storage.delete(old_name)
+                    deleted += 1
+
+        # Summary
+        self.stdout.write("=" * 60)
+        self.stdout.write(self.style.SUCCESS("SUMMARY:"))
+        self.stdout.write(f"  References rewritten: {stats['references']}")
+        self.stdout.write(f"  Distinct files processed: {stats['files']}")
+        self.stdout.write(f"  Unique blobs: {len(set(migrated.values()))}")
+        self.stdout.write(f"  Old files removed: {deleted}")
+        self.stdout.write(f"  Missing files: {stats['missing']}")
+        if dry_run:
+            self.stdout.write(self.style.WARNING("  Dry run - nothing was changed"))
+        self.stdout.write("=" * 60)
@@ -0,0 +1,155 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from core.customers import check_password_hash, import_customers, split_name
+from core.models import Account
+
+ACCOUNT_TYPES = {value for value, _ in Account.ACCOUNT_TYPES}
+
+
+def read_rows(path, file_format):
+    """Yield (line number, row dict) one at a time"""
+    with open(path, encoding='utf-8-sig', newline='') as handle:
+        if file_format == 'jsonl':
+            for line_number, line in enumerate(handle, start=1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except ValueError as e:
+                        yield line_number, ValueError(f'Invalid JSON: {e}')
+        else:
+            reader = csv.DictReader(handle)
+            if 'email' not in (reader.fieldnames or ()):
+                raise CommandError('The file needs an email column')
+            for row in reader:
+                yield reader.line_num, row
+
+
+def clean_row(row):
+    """Customer dict for core.customers.import_customers, or raise ValueError"""
+    if not isinstance(row, dict):
+        raise ValueError('Each line must be a JSON object')
+    get = lambda column: str(row.get(column) or '').strip()
+
+    email = get('email').lower()
+    try:
+        validate_email(email)
+    except ValidationError:
+        raise ValueError(f"Invalid email '{email}'")
+
+    first_name, last_name = get('first_name'), get('last_name')
+    if not first_name and not last_name:
+        first_name, last_name = split_name(get('name'))
+
+    phone = get('phone')
+    if len(phone) > 20:
+        raise ValueError('Phone number longer than 20 characters')
+
+    account_type = get('account_type') or 'checking'
+    if account_type not in ACCOUNT_TYPES:
+        raise ValueError(f"Unknown account type '{account_type}'")
+
+    try:
+        balance = Decimal(get('balance') or '0').quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f"Invalid balance '{get('balance')}'")
+    if balance < 0:
+        raise ValueError('Balance cannot be negative')
+
+    try:
+        password_hash = check_password_hash(get('password_hash'))
+    except ValueError:
+        raise ValueError('password_hash is not in a format Django can verify')
+
+    return {
+        'email': email,
+        'first_name': first_name[:150],
+        'last_name': last_name[:150],
+        'phone': phone,
+        'password_hash': password_hash,
+        'account_type': account_type,
+        'balance': balance,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Import existing customers (user, profile, account) in bulk, keeping their password hashes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV with a header row, or .jsonl')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Default: from the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Customers per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only')
+
+    def handle(self, *args, **options):
+        """
+        Columns: email (required), name or first_name/last_name, phone,
+        account_type (checking/savings/business), balance (opening balance)
+        and password_hash - a Django-format hash such as pbkdf2_sha256$...
+        Customers without one get an unusable password and must reset it.
+        Emails that already exist are skipped.
+        """
+        file_format = options['format'] or ('jsonl' if options['path'].lower().endswith(('.jsonl', '.ndjson')) else 'csv')
+        counts = {'rows': 0, 'created': 0, 'existing': 0}
+        errors = []
+        batch, seen = [], set()
+
+        self.stdout.write("=" * 60)
+        self.stdout.write(self.style.SUCCESS(f"Importing customers from {options['path']}{' (dry run)' if options['dry_run'] else ''}"))
+        self.stdout.write("=" * 60)
+
+        try:
+            for line_number, row in read_rows(options['path'], file_format):
+                counts['rows'] += 1
+                try:
+                    if isinstance(row, Exception):
+                        raise row
+                    customer = clean_row(row)
+                except ValueError as e:
+                    errors.append((line_number, str(e)))
+                    continue
+                if customer['email'] in seen:
+                    errors.append((line_number, f"Duplicate email {customer['email']} in the file"))
+                    continue
+                seen.add(customer['email'])
+                batch.append(customer)
+                if len(batch) >= options['batch_size']:
+                    self.flush(batch, counts, options['dry_run'])
+                    batch = []
+            self.flush(batch, counts, options['dry_run'])
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for line_number, message in errors[:20]:
+            self.stdout.write(self.style.WARNING(f"  line {line_number}: {message}"))
+        if len(errors) > 20:
+            self.stdout.write(f"  ... {len(errors) - 20} more")
+        self.stdout.write("=" * 60)
+        self.stdout.write(f"  Rows: {counts['rows']}")
+        self.stdout.write(f"  {'Would create' if options['dry_run'] else 'Created'}: {counts['created']}")
+        self.stdout.write(f"  Already registered (skipped): {counts['existing']}")
+        self.stdout.write(f"  Errors: {len(errors)}")
+        self.stdout.write("=" * 60)
+
+    def flush(self, batch, counts, dry_run):
+        if not batch:
+            return
+        # One query per batch for customers that are already registered, in any letter case
+        emails = [customer['email'] for customer in batch]
+        existing = set()
+        users = User.objects.annotate(username_lower=Lower('username'), email_lower=Lower('email'))
+        for username, email in users.filter(Q(username_lower__in=emails) | Q(email_lower__in=emails)).values_list('username_lower', 'email_lower'):
+            existing.update((username, email))
+        new = [customer for customer in batch if customer['email'] not in existing]
+        counts['existing'] += len(batch) - len(new)
+        if new and not dry_run:
+            import_customers(new)
+        counts['created'] += len(new)
@@ -0,0 +1,61 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.payout_import import DEFAULT_CHUNK_SIZE, PayoutImportError, guess_format, import_payouts, write_error_report
+
+
+class Command(BaseCommand):
+    help = 'Create money transfers from a payout file (CSV or JSON Lines) for one sender'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Sender (their account is debited once for the whole file)')
+        parser.add_argument('path', help='CSV with a header row, or .jsonl')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Default: from the file extension')
+        parser.add_argument('--account', help='Account number to debit (default: the first active account)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Transfers inserted per transaction')
+        parser.add_argument('--skip-invalid', action='store_true', help='Import the valid rows even if some rows have errors')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only')
+        parser.add_argument('--errors-file', help='Write the per-row errors to this CSV file')
+
+    def handle(self, *args, **options):
+        try:
+            sender = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['username']}")
+
+        file_format = options['format'] or guess_format(options['path'])
+        started = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as handle:
+                report = import_payouts(
+                    sender, handle, file_format,
+                    chunk_size=options['chunk_size'],
+                    skip_invalid=options['skip_invalid'],
+                    dry_run=options['dry_run'],
+                    account_number=options['account'],
+                )
+        except (OSError, PayoutImportError) as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write("=" * 60)
+        self.stdout.write(self.style.SUCCESS(f"Payout import for {sender.username}{' (dry run)' if options['dry_run'] else ''}"))
+        self.stdout.write(f"  Rows: {report['rows']}")
+        self.stdout.write(f"  Valid: {report['valid']}")
+        self.stdout.write(f"  Batch total: ${report['total']}")
+        self.stdout.write(f"  Created: {report['created']} in {elapsed:.2f}s")
+        if report['errors']:
+            self.stdout.write(self.style.WARNING(f"  Errors: {len(report['errors'])}"))
+            for line_number, message in report['errors'][:20]:
+                self.stdout.write(f"    line {line_number}: {message}")
+            if len(report['errors']) > 20:
+                self.stdout.write(f"    ... {len(report['errors']) - 20} more")
+            if not report['debited'] and not options['dry_run']:
+                self.stdout.write(self.style.WARNING("  Nothing imported - fix the file or use --skip-invalid"))
+        if options['errors_file'] and report['errors']:
+            with open(options['errors_file'], 'w', newline='') as handle:
+                write_error_report(report['errors'], handle)
+            self.stdout.write(f"  Error report: {options['errors_file']}")
+        self.stdout.write("=" * 60)
@@ -0,0 +1,167 @@
+import os
+import shutil
+import time
+from datetime import datetime, timezone as dt_timezone
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.models import LoanApplication, LoanDraft, LoanPayment, MediaBlob
+from core.thumbnails import THUMBNAIL_DIR, media_name, thumbnail_name
+from core.uploads import INCOMING_DIR
+
+DOCUMENT_CATEGORIES = ('selfies', 'id_documents', 'address_proofs', 'loan_payments')
+
+
+def scan_tree(root):
+    """All files below root as (relative name, size, mtime), via os.scandir"""
+    found = []
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        name = os.path.relpath(entry.path, settings.MEDIA_ROOT).replace(os.sep, '/')
+                        found.append((name, stat.st_size, stat.st_mtime))
+        except FileNotFoundError:
+            continue
+    return found
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class Command(BaseCommand):
+    help = 'Report media storage usage and remove files no loan or payment references'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true', help='Delete orphaned files (default is report only)')
+        parser.add_argument('--quarantine', metavar='DIR', help='Move orphaned files to DIR instead of deleting them')
+        parser.add_argument('--grace-hours', type=int, default=48, help='Leave orphans younger than this alone (default 48)')
+        parser.add_argument('--workers', type=int, default=4, help='Directories scanned in parallel')
+
+    def referenced_names(self):
+        """Storage names referenced from the database, one streaming query per model"""
+        referenced = set()
+        url_fields = ('selfie_url', 'id_document_url', 'address_proof_url')
+        for row in LoanApplication.objects.values_list(*url_fields).iterator(chunk_size=2000):
+            for url in row:
+                name = media_name(url)
+                if name:
+                    referenced.add(name)
+
+        # Step 1 uploads of applications that are still being filled in
+        for data in LoanDraft.objects.values_list('data', flat=True).iterator(chunk_size=2000):
+            for field in url_fields:
+                name = media_name(data.get(field))
+                if name:
+                    referenced.add(name)
+
+        proofs = LoanPayment.objects.exclude(payment_proof='').exclude(payment_proof=None)
+        for name in proofs.values_list('payment_proof', flat=True).iterator(chunk_size=2000):
+            referenced.add(name)
+            # Proofs saved before content-addressed storage have no folder in their name
+            referenced.add(f'loan_payments/{name}')
+        return referenced
+
+    def handle(self, *args, **options):
+        """
+        Walks MEDIA_ROOT, compares it with the names stored on LoanApplication,
+        LoanDraft and LoanPayment, and prints bytes per category. Orphans older than the
+        grace period are deleted or quarantined when asked to.
+        """
+        media_root = str(settings.MEDIA_ROOT)
+        cutoff = time.time() - options['grace_hours'] * 3600
+        remove = options['delete'] or options['quarantine']
+
+        self.stdout.write("=" * 60)
+        self.stdout.write(self.style.SUCCESS("Scanning media storage..."))
+        self.stdout.write("=" * 60)
+
+        # One scan per top-level directory, in parallel (mostly waiting on disk)
+        with os.scandir(media_root) as entries:
+            top_dirs = [entry.path for entry in entries if entry.is_dir(follow_symlinks=False)]
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            files = [item for result in pool.map(scan_tree, top_dirs) for item in result]
+
+        referenced = self.referenced_names()
+        # A re-upload of an old orphan reuses its blob without touching the file
+        referenced |= set(MediaBlob.objects.filter(
+            updated_at__gte=datetime.fromtimestamp(cutoff, tz=dt_timezone.utc)
+        ).values_list('name', flat=True))
+        # Thumbnails are only worth keeping while their source is referenced
+        referenced_thumbnails = {thumbnail_name(name) for name in referenced}
+
+        usage = {}
+        orphans = []
+        for name, size, mtime in files:
+            category = name.split('/', 1)[0]
+            stats = usage.setdefault(category, {'files': 0, 'bytes': 0, 'orphans': 0, 'orphan_bytes': 0})
+            stats['files'] += 1
+            stats['bytes'] += size
+
+            if category in DOCUMENT_CATEGORIES:
+                is_orphan = name not in referenced
+            elif category == THUMBNAIL_DIR:
+                is_orphan = name not in referenced_thumbnails
+            elif category == INCOMING_DIR:
+                # Leftovers of interrupted uploads
+                is_orphan = True
+            else:
+                is_orphan = False
+
+            if is_orphan:
+                stats['orphans'] += 1
+                stats['orphan_bytes'] += size
+                if mtime < cutoff:
+                    orphans.append((name, size))
+
+        for category in sorted(usage):
+            stats = usage[category]
+            self.stdout.write(
+                f"  {category:20} {stats['files']:6} files {format_bytes(stats['bytes']):>10}"
+                f"   orphaned: {stats['orphans']:5} ({format_bytes(stats['orphan_bytes'])})"
+            )
+
+        removed = 0
+        freed = 0
+        if remove:
+            quarantine = options['quarantine']
+            for name, size in orphans:
+                path = os.path.join(media_root, name)
+                if quarantine:
+                    target = os.path.join(quarantine, name)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.move(path, target)
+                else:
+                    os.remove(path)
+                removed += 1
+                freed += size
+            # The files are gone, so are their blob records
+            orphan_names = [name for name, _ in orphans]
+            for i in range(0, len(orphan_names), 500):
+                MediaBlob.objects.filter(name__in=orphan_names[i:i + 500]).delete()
+
+        # Summary
+        self.stdout.write("=" * 60)
+        self.stdout.write(self.style.SUCCESS("SUMMARY:"))
+        self.stdout.write(f"  Files scanned: {len(files)}")
+        self.stdout.write(f"  Total size: {format_bytes(sum(s['bytes'] for s in usage.values()))}")
+        self.stdout.write(f"  Orphans past {options['grace_hours']}h grace period: {len(orphans)} ({format_bytes(sum(size for _, size in orphans))})")
+        if remove:
+            action = f"Quarantined to {options['quarantine']}" if options['quarantine'] else "Deleted"
+            self.stdout.write(self.style.WARNING(f"  {action}: {removed} files ({format_bytes(freed)})"))
+        else:
+            self.stdout.write("  Report only - use --delete or --quarantine DIR to clean up")
+        self.stdout.write("=" * 60)
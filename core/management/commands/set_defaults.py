@@ -1,5 +1,8 @@
+import json
+
 from django.core.management.base import BaseCommand
-from core.models import SystemSettings
+from core.system_settings import export_settings, upsert_settings
+from core.velocity import DEFAULT_RULES, RULES_SETTING
 
 class Command(BaseCommand):
     help = 'Setup default system settings for TrustBank'
@@ -72,74 +75,54 @@ class Command(BaseCommand):
                 'value': '100000',
                 'description': 'Maximum loan amount ($)'
             },
+            {
+                'name': 'loan_interest_rate',
+                'value': '12',
+                'description': 'Annual loan interest rate in % (override per type with loan_interest_rate_<type>)'
+            },
+            {
+                'name': RULES_SETTING,
+                'value': json.dumps(DEFAULT_RULES),
+                'description': 'Velocity rules (JSON list, see core/velocity.py)'
+            },
         ]
         
-        created_count = 0
-        updated_count = 0
-        
         self.stdout.write("=" * 60)
         self.stdout.write(self.style.SUCCESS("Setting up default system settings..."))
         self.stdout.write("=" * 60)
         
-        for setting_data in default_settings:
-            name = setting_data['name']
-            value = setting_data['value']
-            description = setting_data['description']
-            
-            try:
-                # Try to get existing setting
-                setting, created = SystemSettings.objects.get_or_create(
-                    name=name,
-                    defaults={
-                        'value': value,
-                        'description': description
-                    }
-                )
-                
-                if created:
-                    self.stdout.write(
-                        self.style.SUCCESS(f"✓ Created: {name} = {value}")
-                    )
-                    created_count += 1
-                else:
-                    # Update if value has changed
-                    if setting.value != value:
-                        old_value = setting.value
-                        setting.value = value
-                        setting.description = description
-                        setting.save()
-                        self.stdout.write(
-                            self.style.WARNING(f"↻ Updated: {name} from '{old_value}' to '{value}'")
-                        )
-                        updated_count += 1
-                    else:
-                        self.stdout.write(
-                            self.style.NOTICE(f"● Already exists: {name} = {value}")
-                        )
-                        
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f"✗ Error creating {name}: {str(e)}")
-                )
+        # One query to read, one upsert to write (see core/system_settings.py)
+        diff = upsert_settings(default_settings)
+        
+        for name in diff['created']:
+            self.stdout.write(self.style.SUCCESS(f"✓ Created: {name}"))
+        for name, old_value, new_value in diff['updated']:
+            self.stdout.write(self.style.WARNING(f"↻ Updated: {name} from '{old_value}' to '{new_value}'"))
+        for name in diff['unchanged']:
+            self.stdout.write(self.style.NOTICE(f"● Already exists: {name}"))
+        for name, error in diff['invalid']:
+            self.stdout.write(self.style.ERROR(f"✗ Error creating {name}: {error}"))
         
         # Summary
         self.stdout.write("=" * 60)
         self.stdout.write(self.style.SUCCESS("SUMMARY:"))
         self.stdout.write(f"  Total settings processed: {len(default_settings)}")
-        self.stdout.write(f"  New settings created: {created_count}")
-        self.stdout.write(f"  Settings updated: {updated_count}")
-        self.stdout.write(f"  Existing unchanged: {len(default_settings) - created_count - updated_count}")
+        self.stdout.write(f"  New settings created: {len(diff['created'])}")
+        self.stdout.write(f"  Settings updated: {len(diff['updated'])}")
+        self.stdout.write(f"  Existing unchanged: {len(diff['unchanged'])}")
+        if diff['invalid']:
+            self.stdout.write(f"  Invalid: {len(diff['invalid'])}")
         self.stdout.write("=" * 60)
         
         # Show all current settings
         self.stdout.write("\n" + self.style.SUCCESS("CURRENT SYSTEM SETTINGS:"))
-        all_settings = SystemSettings.objects.all().order_by('name')
+        all_settings = export_settings()
         
-        if all_settings.exists():
+        if all_settings:
             for s in all_settings:
-                self.stdout.write(f"  {s.name:30} = {s.value:20} ({s.description})")
+                self.stdout.write(f"  {s['name']:30} = {s['value']:20} ({s['description']})")
         else:
             self.stdout.write(self.style.WARNING("  No system settings found!"))
         
         self.stdout.write("=" * 60)
-        self.stdout.write(self.style.SUCCESS("✓ Default settings setup completed!"))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS("✓ Default settings setup completed!"))
@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.payouts import get_payout_backend
+from core.settlement import DEFAULT_LEASE_SECONDS, claim_batch, default_worker_id, settle_batch
+
+
+class Command(BaseCommand):
+    help = 'Settle pending money transfers in batches (safe to run several at once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Transfers claimed per batch')
+        parser.add_argument('--lease-seconds', type=int, default=DEFAULT_LEASE_SECONDS,
+                            help='How long a claimed batch stays ours before others may retry it')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new transfers')
+        parser.add_argument('--sleep', type=float, default=5, help='Seconds to wait when there is nothing to do (with --loop)')
+        parser.add_argument('--max-batches', type=int, default=0, help='Stop after this many batches (0 = no limit)')
+        parser.add_argument('--worker-id', default=None, help='Name recorded in the lease (default: host-pid)')
+
+    def handle(self, *args, **options):
+        """
+        Claims pending transfers, pays them out through the configured
+        payout backend and records the results. Without --loop it drains
+        the queue once and exits, which suits cron.
+        """
+        worker_id = options['worker_id'] or default_worker_id()
+        backend = get_payout_backend()
+        totals = {'completed': 0, 'failed': 0, 'retry': 0, 'lost_lease': 0}
+        batches = 0
+
+        self.stdout.write("=" * 60)
+        self.stdout.write(self.style.SUCCESS(f"Settlement worker {worker_id} ({backend.__class__.__name__})"))
+        self.stdout.write("=" * 60)
+
+        try:
+            while not options['max_batches'] or batches < options['max_batches']:
+                transfers = claim_batch(worker_id, options['batch_size'], options['lease_seconds'])
+                if not transfers:
+                    if not options['loop']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+
+                counts = settle_batch(transfers, worker_id, backend)
+                batches += 1
+                for key, value in counts.items():
+                    totals[key] += value
+                self.stdout.write(
+                    f"  Batch {batches}: {len(transfers)} claimed, {counts['completed']} completed, "
+                    f"{counts['failed']} failed, {counts['retry']} to retry"
+                )
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted - unfinished leases expire and are picked up again")
+
+        self.stdout.write("=" * 60)
+        self.stdout.write(self.style.SUCCESS(f"Batches: {batches}"))
+        self.stdout.write(f"  Completed: {totals['completed']}")
+        self.stdout.write(f"  Failed: {totals['failed']}")
+        self.stdout.write(f"  Returned to queue: {totals['retry']}")
+        if totals['lost_lease']:
+            self.stdout.write(self.style.WARNING(f"  Lost lease (taken over elsewhere): {totals['lost_lease']}"))
+        self.stdout.write("=" * 60)
@@ -0,0 +1,97 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.system_settings import export_settings, upsert_settings
+
+try:
+    import yaml
+    YAML_AVAILABLE = True
+    PARSE_ERRORS = (ValueError, yaml.YAMLError)
+except ImportError:
+    YAML_AVAILABLE = False
+    PARSE_ERRORS = (ValueError,)
+
+BUNDLE_VERSION = 1
+
+
+def bundle_format(path, requested):
+    if requested:
+        return requested
+    return 'yaml' if path and path.lower().endswith(('.yaml', '.yml')) else 'json'
+
+
+class Command(BaseCommand):
+    help = 'Export system settings to a JSON/YAML bundle, or import one (e.g. to copy settings between environments)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['export', 'import'])
+        parser.add_argument('path', nargs='?', help='Bundle file (export: default stdout)')
+        parser.add_argument('--format', choices=['json', 'yaml'], help='Default: from the file extension, else json')
+        parser.add_argument('--names', nargs='+', help='Export only these settings')
+        parser.add_argument('--no-overwrite', action='store_true', help='Import: only create missing settings')
+        parser.add_argument('--dry-run', action='store_true', help='Import: show the changes without saving')
+
+    def handle(self, *args, **options):
+        file_format = bundle_format(options['path'], options['format'])
+        if file_format == 'yaml' and not YAML_AVAILABLE:
+            raise CommandError('YAML bundles need PyYAML (pip install pyyaml)')
+
+        if options['action'] == 'export':
+            self.export(options, file_format)
+        else:
+            self.import_bundle(options, file_format)
+
+    def export(self, options, file_format):
+        bundle = {
+            'version': BUNDLE_VERSION,
+            'exported_at': timezone.now().isoformat(),
+            'settings': export_settings(options['names']),
+        }
+        if file_format == 'yaml':
+            text = yaml.safe_dump(bundle, sort_keys=False, allow_unicode=True)
+        else:
+            text = json.dumps(bundle, indent=2, ensure_ascii=False) + '\n'
+
+        if options['path']:
+            with open(options['path'], 'w', encoding='utf-8') as handle:
+                handle.write(text)
+            self.stderr.write(self.style.SUCCESS(f"Exported {len(bundle['settings'])} settings to {options['path']}"))
+        else:
+            sys.stdout.write(text)
+
+    def import_bundle(self, options, file_format):
+        if not options['path']:
+            raise CommandError('Import needs the bundle file')
+        try:
+            with open(options['path'], encoding='utf-8') as handle:
+                bundle = yaml.safe_load(handle) if file_format == 'yaml' else json.load(handle)
+        except OSError as e:
+            raise CommandError(str(e))
+        except PARSE_ERRORS as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+
+        entries = bundle.get('settings') if isinstance(bundle, dict) else None
+        if not isinstance(entries, list) or not all(isinstance(entry, dict) and 'name' in entry and 'value' in entry for entry in entries):
+            raise CommandError("Not a settings bundle: expected {'settings': [{'name': ..., 'value': ...}, ...]}")
+
+        diff = upsert_settings(entries, overwrite=not options['no_overwrite'], dry_run=options['dry_run'])
+
+        self.stdout.write("=" * 60)
+        self.stdout.write(self.style.SUCCESS(f"Importing {options['path']}{' (dry run)' if options['dry_run'] else ''}"))
+        self.stdout.write("=" * 60)
+        for name in diff['created']:
+            self.stdout.write(self.style.SUCCESS(f"+ {name}"))
+        for name, old_value, new_value in diff['updated']:
+            self.stdout.write(self.style.WARNING(f"~ {name}: '{old_value}' -> '{new_value}'"))
+        for name, error in diff['invalid']:
+            self.stdout.write(self.style.ERROR(f"✗ {error} (skipped)"))
+        self.stdout.write("=" * 60)
+        self.stdout.write(f"  Created: {len(diff['created'])}")
+        self.stdout.write(f"  Updated: {len(diff['updated'])}")
+        self.stdout.write(f"  Unchanged: {len(diff['unchanged'])}")
+        if diff['invalid']:
+            self.stdout.write(f"  Invalid: {len(diff['invalid'])}")
+        self.stdout.write("=" * 60)
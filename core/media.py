@@ -0,0 +1,151 @@
+# core/media.py - PROTECTED MEDIA SERVING
+"""
+Access-checked serving of uploaded documents.
+
+Every file under MEDIA_ROOT is a customer document (or a preview of one), so
+nothing is served without checking that the requester owns the loan or is
+staff. The bytes themselves are handed off to the front web server when one
+is configured:
+
+    MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'   # nginx X-Accel-Redirect
+    MEDIA_SENDFILE_HEADER = 'X-Sendfile'                # Apache/lighttpd
+
+Without either, files are streamed by Django with HTTP Range support, which
+is good enough for local runs.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.encoding import filepath_to_uri
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .storage import document_storage
+from .thumbnails import THUMBNAIL_DIR
+from .uploads import INCOMING_DIR
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _document_urls(name):
+    """Forms a stored document URL can take for storage name `name`"""
+    return {settings.MEDIA_URL + name, settings.MEDIA_URL + filepath_to_uri(name)}
+
+
+def can_access_media(request, name):
+    """Staff see everything; customers only documents attached to their own loans"""
+    from .models import LoanApplication, LoanDraft, LoanPayment
+
+    user = request.user
+    if not user.is_authenticated:
+        return False
+    if user.is_staff:
+        return True
+    if name.startswith(THUMBNAIL_DIR + '/'):
+        return False
+
+    urls = _document_urls(name)
+
+    # Documents uploaded in step 1 but not yet attached to an application
+    draft = LoanDraft.for_user(user)
+    if draft and urls & {draft.data.get('selfie_url'), draft.data.get('id_document_url'), draft.data.get('address_proof_url')}:
+        return True
+
+    return (
+        LoanApplication.objects.filter(user=user).filter(
+            Q(selfie_url__in=urls) | Q(id_document_url__in=urls) | Q(address_proof_url__in=urls)
+        ).exists()
+        or LoanPayment.objects.filter(loan__user=user, payment_proof=name).exists()
+    )
+
+
+def _file_range(path, start, length):
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = handle.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _parse_range(header, size):
+    """(start, end) of a single 'bytes=' range, or None if it cannot be served"""
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+def serve_media(request, name):
+    """Return the response for an already authorized media file"""
+    path = document_storage.path(name)
+    if not os.path.isfile(path):
+        raise Http404('File not found')
+
+    content_type, encoding = mimetypes.guess_type(path)
+    content_type = content_type or 'application/octet-stream'
+    accel_prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', None)
+    sendfile_header = getattr(settings, 'MEDIA_SENDFILE_HEADER', None)
+
+    if accel_prefix or sendfile_header:
+        response = HttpResponse(content_type=content_type)
+        if accel_prefix:
+            response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(name)
+        else:
+            response[sendfile_header] = path
+        response['Cache-Control'] = 'private, max-age=3600'
+        return response
+
+    stat = os.stat(path)
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    size = stat.st_size
+    byte_range = None
+    if 'HTTP_RANGE' in request.META:
+        byte_range = _parse_range(request.META['HTTP_RANGE'], size)
+        if byte_range is None:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(_file_range(path, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = StreamingHttpResponse(_file_range(path, 0, size), content_type=content_type)
+        response['Content-Length'] = str(size)
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+
+def protected_media_response(request, name):
+    name = name.lstrip('/')
+    if not name or name.split('/', 1)[0] == INCOMING_DIR or not can_access_media(request, name):
+        raise Http404('File not found')
+    return serve_media(request, name)
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_media_blob_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioSnapshotRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('watermark', models.DateTimeField()),
+                ('full_rebuild', models.BooleanField(default=False)),
+                ('months_rebuilt', models.IntegerField(default=0)),
+                ('rows_written', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-watermark'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PortfolioSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('loan_type', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('deposit_paid', models.BooleanField(default=False)),
+                ('loan_count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('total_deposit_required', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('total_deposit_verified', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-month', 'loan_type', 'status'],
+                'unique_together': {('month', 'loan_type', 'status', 'deposit_paid')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_loan_draft'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loanapplication',
+            name='kyc_score',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='loanapplication',
+            name='kyc_status',
+            field=models.CharField(choices=[('pending', 'Checks Pending'), ('passed', 'Checks Passed'), ('review', 'Needs Review'), ('failed', 'Checks Failed')], db_index=True, default='pending', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='DocumentVerification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_type', models.CharField(choices=[('selfie', 'Selfie'), ('id_document', 'ID Document'), ('address_proof', 'Address Proof')], max_length=20)),
+                ('name', models.CharField(db_index=True, max_length=255)),
+                ('sha256', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('status', models.CharField(choices=[('passed', 'Passed'), ('warning', 'Warning'), ('failed', 'Failed')], max_length=20)),
+                ('score', models.IntegerField(default=100)),
+                ('results', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_verifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'unique_together': {('user', 'name')},
+            },
+        ),
+    ]
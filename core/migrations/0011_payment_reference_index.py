@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:40
+
+import hashlib
+import re
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+# Frozen copy of core.references.payment_keys as of this migration, so the
+# backfill keeps producing the same keys if that module changes later
+_SEPARATORS = re.compile(r'[\s\-_/.,:#]+')
+
+
+def _hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def payment_keys(reference=None, sender_name=None, amount=None, payment_date=None):
+    keys = []
+    normalized = _SEPARATORS.sub('', str(reference or '')).upper()
+    if normalized:
+        keys.append(('reference', _hash(normalized)))
+    name = ' '.join(str(sender_name or '').split()).casefold()
+    if name and amount not in (None, '') and payment_date:
+        amount = Decimal(str(amount)).quantize(Decimal('0.01'))
+        keys.append(('sender', _hash(f'{name}|{amount}|{payment_date}')))
+    return keys
+
+
+def index_existing_payments(apps, schema_editor):
+    LoanApplication = apps.get_model('core', 'LoanApplication')
+    LoanPayment = apps.get_model('core', 'LoanPayment')
+    PaymentReferenceIndex = apps.get_model('core', 'PaymentReferenceIndex')
+
+    rows = []
+    for payment in LoanPayment.objects.iterator(chunk_size=2000):
+        for kind, key in payment_keys(payment.transaction_id, payment.sender_name, payment.amount_paid, payment.payment_date):
+            rows.append(PaymentReferenceIndex(kind=kind, key=key, loan_id=payment.loan_id, payment_id=payment.pk))
+    for loan in LoanApplication.objects.exclude(payment_reference='').exclude(payment_reference=None).iterator(chunk_size=2000):
+        for kind, key in payment_keys(loan.payment_reference):
+            rows.append(PaymentReferenceIndex(kind=kind, key=key, loan_id=loan.pk))
+    PaymentReferenceIndex.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+
+    shared = (
+        PaymentReferenceIndex.objects.values('kind', 'key')
+        .annotate(loans=Count('loan', distinct=True))
+        .filter(loans__gt=1)
+    )
+    for group in shared:
+        payment_ids = PaymentReferenceIndex.objects.filter(
+            kind=group['kind'], key=group['key'], payment__isnull=False
+        ).values_list('payment_id', flat=True)
+        LoanPayment.objects.filter(pk__in=list(payment_ids)).update(duplicate_suspect=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_document_verification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loanpayment',
+            name='duplicate_suspect',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.CreateModel(
+            name='PaymentReferenceIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('reference', 'Payment Reference'), ('sender', 'Sender, Amount and Date')], max_length=20)),
+                ('key', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payment_references', to='core.loanapplication')),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reference_index', to='core.loanpayment')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'key'], name='core_paymen_kind_cfcf6c_idx')],
+                'unique_together': {('kind', 'key', 'loan')},
+            },
+        ),
+        migrations.RunPython(index_existing_payments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_payment_reference_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='account',
+            name='account_number',
+            field=models.CharField(blank=True, max_length=32, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='recipient_account',
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_widen_reference_numbers'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moneytransfer',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='moneytransfer',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='moneytransfer',
+            name='lease_owner',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='moneytransfer',
+            index=models.Index(fields=['status', 'lease_expires_at'], name='core_moneyt_status_941f9e_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:44
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def create_default_bands(apps, schema_editor):
+    # The fees the send-money page used to hardcode
+    TransferFeeBand = apps.get_model('core', 'TransferFeeBand')
+    for transfer_type, fee in (('standard', '0'), ('express', '15'), ('instant', '25')):
+        TransferFeeBand.objects.get_or_create(
+            recipient_country='', payment_method='', transfer_type=transfer_type, min_amount=Decimal('0'),
+            defaults={'fixed_fee': Decimal(fee)},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_transfer_settlement_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransferFeeBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient_country', models.CharField(blank=True, max_length=100)),
+                ('payment_method', models.CharField(blank=True, choices=[('bank_transfer', 'Bank Transfer'), ('mobile_money', 'Mobile Money'), ('crypto', 'Cryptocurrency'), ('paypal', 'PayPal'), ('other', 'Other')], max_length=50)),
+                ('transfer_type', models.CharField(blank=True, max_length=50)),
+                ('min_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('max_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('fixed_fee', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('percent_fee', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('minimum_fee', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('maximum_fee', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Transfer Fee Band',
+                'verbose_name_plural': 'Transfer Fee Bands',
+                'ordering': ['recipient_country', 'payment_method', 'transfer_type', 'min_amount'],
+            },
+        ),
+        migrations.RunPython(create_default_bands, migrations.RunPython.noop),
+    ]
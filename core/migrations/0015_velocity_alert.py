@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_transfer_fee_band'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VelocityAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rule', models.CharField(max_length=100)),
+                ('subject', models.CharField(choices=[('transfer', 'Money Transfer'), ('loan_payment', 'Loan Payment')], max_length=20)),
+                ('key', models.CharField(max_length=200)),
+                ('event_count', models.PositiveIntegerField()),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('window_seconds', models.PositiveIntegerField()),
+                ('object_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('reviewed', models.BooleanField(db_index=True, default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('reviewed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reviewed_velocity_alerts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_velocity_alert'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='moneytransfer',
+            name='transfer_fee',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Leave blank to use the fee schedule', max_digits=10),
+        ),
+    ]
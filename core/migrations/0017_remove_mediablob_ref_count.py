@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:16
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_transfer_fee_blank'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='mediablob',
+            name='ref_count',
+        ),
+    ]
@@ -1,7 +1,8 @@
 # models.py - UPDATED WITH PAYMENT METHOD MODELS
 from django.db import models
 from django.contrib.auth.models import User
-import uuid
+from .ids import new_id
+from .storage import get_document_storage
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -22,7 +23,7 @@ class Account(models.Model):
     ]
 
     account_number = models.CharField(
-        max_length=20,
+        max_length=32,
         unique=True,
         blank=True
     )
@@ -37,28 +38,17 @@ class Account(models.Model):
 
     def save(self, *args, **kwargs):
         import logging
-        import uuid
-        import time
         
         logger = logging.getLogger(__name__)
         
-        # Log before save
-        if self.id:
-            old_balance = Account.objects.get(id=self.id).balance
-            logger.info(f"🔧 MODEL: Updating account {self.id}, Old: ${old_balance}, New: ${self.balance}")
-        else:
-            logger.info(f"🔧 MODEL: Creating new account, balance: ${self.balance}")
-        
         # Generate account number if not set
         if not self.account_number:
-            self.account_number = f"ACC-{int(time.time())}-{str(uuid.uuid4())[:8]}"
-            logger.info(f"🔧 MODEL: Generated account number: {self.account_number}")
+            self.account_number = new_id('ACC')
         
+        # Just the INSERT/UPDATE - balance changes elsewhere use F() updates,
+        # so re-reading the row here would not prove anything
         super().save(*args, **kwargs)
-        
-        # Verify save
-        self.refresh_from_db()
-        logger.info(f"🔧 MODEL: Saved successfully! Account {self.id}, balance: ${self.balance}")
+        logger.info(f"🔧 MODEL: Saved account {self.id} ({self.account_number}), balance: ${self.balance}")
 
     def __str__(self):
         return f"{self.account_number} - {self.get_account_type_display()}"
@@ -76,14 +66,14 @@ class Transaction(models.Model):
     transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPES)
     amount = models.DecimalField(max_digits=15, decimal_places=2)
     description = models.CharField(max_length=255)
-    recipient_account = models.CharField(max_length=20, blank=True, null=True)
+    recipient_account = models.CharField(max_length=32, blank=True, null=True)
     status = models.CharField(max_length=20, default='completed')
     created_at = models.DateTimeField(auto_now_add=True)
 
     def save(self, *args, **kwargs):
         # Generate transaction_id if not set
         if not self.transaction_id:
-            self.transaction_id = str(uuid.uuid4())
+            self.transaction_id = new_id('TXN')
         super().save(*args, **kwargs)
 
     class Meta:
@@ -140,11 +130,12 @@ class LoanPayment(models.Model):
     sender_name = models.CharField(max_length=200)
     sender_address = models.TextField(blank=True)
     sender_phone = models.CharField(max_length=20, blank=True)
-    payment_proof = models.FileField(upload_to='loan_payments/', blank=True, null=True)
+    payment_proof = models.FileField(upload_to='loan_payments/', storage=get_document_storage, blank=True, null=True)
     verified = models.BooleanField(default=False)
     verified_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='verified_payments')
     verified_at = models.DateTimeField(null=True, blank=True)
     admin_notes = models.TextField(blank=True)
+    duplicate_suspect = models.BooleanField(default=False, db_index=True)  # set by core/references.py
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -154,6 +145,26 @@ class LoanPayment(models.Model):
     class Meta:
         ordering = ['-created_at']
 
+class PaymentReferenceIndex(models.Model):
+    """Hashed, normalized payment reference / sender details of a loan deposit"""
+    KINDS = (
+        ('reference', 'Payment Reference'),
+        ('sender', 'Sender, Amount and Date'),
+    )
+    
+    kind = models.CharField(max_length=20, choices=KINDS)
+    key = models.CharField(max_length=64)  # sha256 of the normalized value
+    loan = models.ForeignKey('LoanApplication', on_delete=models.CASCADE, related_name='payment_references')
+    payment = models.ForeignKey(LoanPayment, on_delete=models.CASCADE, null=True, blank=True, related_name='reference_index')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.kind} {self.key[:12]} -> {self.loan_id}"
+    
+    class Meta:
+        unique_together = ('kind', 'key', 'loan')
+        indexes = [models.Index(fields=['kind', 'key'])]
+
 class LoanPaymentVerification(models.Model):
     """Track verification status of loan payments"""
     payment = models.ForeignKey(LoanPayment, on_delete=models.CASCADE, related_name='verifications')
@@ -212,6 +223,16 @@ class LoanApplication(models.Model):
     id_document_url = models.URLField(blank=True, null=True)
     address_proof_url = models.URLField(blank=True, null=True)
     
+    # Automated document checks (see core/kyc.py)
+    KYC_STATUS = (
+        ('pending', 'Checks Pending'),
+        ('passed', 'Checks Passed'),
+        ('review', 'Needs Review'),
+        ('failed', 'Checks Failed'),
+    )
+    kyc_status = models.CharField(max_length=20, choices=KYC_STATUS, default='pending', db_index=True)
+    kyc_score = models.IntegerField(null=True, blank=True, db_index=True)  # 100 = nothing suspicious
+    
     # Payment fields
     payment_method = models.ForeignKey(PaymentMethod, on_delete=models.SET_NULL, null=True, blank=True)
     payment_reference = models.CharField(max_length=100, blank=True, null=True)
@@ -231,13 +252,88 @@ class LoanApplication(models.Model):
     def __str__(self):
         return f"{self.application_id} - {self.user.username} - ${self.amount} - {self.get_status_display()}"
     
+    @property
+    def annual_interest_rate(self):
+        from .amortization import annual_rate_for
+        return annual_rate_for(self.loan_type)
+    
+    @property
+    def monthly_payment(self):
+        """Level monthly repayment in dollars (exact, rounded to cents)"""
+        from .amortization import monthly_payment
+        return monthly_payment(self.amount, self.annual_interest_rate, self.term_months)
+    
+    def repayment_schedule(self):
+        """Per-month principal/interest/balance rows (cached per loan)"""
+        from .amortization import loan_schedule
+        return loan_schedule(self)
+    
     def save(self, *args, **kwargs):
         # If application_id is not set, generate one
         if not self.application_id:
-            import time
-            self.application_id = f"LOAN-{self.user.id if self.user else '0'}-{int(time.time())}"
+            self.application_id = new_id('LOAN')
         super().save(*args, **kwargs)
 
+class LoanStatusHistory(models.Model):
+    """Track status changes for loan applications"""
+    loan = models.ForeignKey(LoanApplication, on_delete=models.CASCADE, related_name='status_history')
+    old_status = models.CharField(max_length=20, blank=True)
+    status = models.CharField(max_length=20)
+    notes = models.TextField(blank=True, null=True)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.loan.application_id} - {self.old_status} -> {self.status} at {self.created_at}"
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Loan Status History'
+        verbose_name_plural = 'Loan Status Histories'
+
+class LoanDraft(models.Model):
+    """In-progress loan application (step 1 data), one per user.
+
+    Kept out of the session so the session cookie/row stays small and a draft
+    survives the 30 minute session expiry.
+    """
+    FIELDS = (
+        'full_name', 'email', 'phone', 'location', 'full_address', 'date_of_birth',
+        'security_question', 'security_answer',
+        'selfie_url', 'id_document_url', 'address_proof_url',
+    )
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='loan_draft')
+    data = models.JSONField(default=dict, blank=True)
+    step = models.PositiveSmallIntegerField(default=1)  # next step the user has to complete
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"Loan draft of {self.user.username} (step {self.step})"
+
+    @property
+    def is_ready_for_step2(self):
+        return self.step >= 2
+
+    @classmethod
+    def for_user(cls, user):
+        return cls.objects.filter(user=user).first()
+
+    @classmethod
+    def save_fields(cls, user, fields, step=None):
+        """Merge `fields` into the user's draft; unknown keys are ignored"""
+        from django.db import transaction
+
+        fields = {key: value for key, value in fields.items() if key in cls.FIELDS}
+        with transaction.atomic():
+            draft, _ = cls.objects.select_for_update().get_or_create(user=user)
+            draft.data.update(fields)
+            if step is not None:
+                draft.step = step
+            draft.save(update_fields=['data', 'step', 'updated_at'])
+        return draft
+
 class ContactMessage(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField()
@@ -297,7 +393,8 @@ class MoneyTransfer(models.Model):
     admin_notes = models.TextField(blank=True, null=True)
     
     # Fees
-    transfer_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    transfer_fee = models.DecimalField(max_digits=10, decimal_places=2, blank=True,
+                                       help_text='Leave blank to use the fee schedule')
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
     
     # Timestamps
@@ -308,17 +405,40 @@ class MoneyTransfer(models.Model):
     # Admin tracking
     processed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='processed_transfers')
     
+    # Settlement worker lease (see core/settlement.py)
+    lease_owner = models.CharField(max_length=100, blank=True)
+    lease_expires_at = models.DateTimeField(blank=True, null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    
     def save(self, *args, **kwargs):
         if not self.reference_number:
             # Generate unique reference number
-            import time
-            self.reference_number = f'TRF-{self.sender.id if self.sender else "0"}-{int(time.time())}'
+            self.reference_number = new_id('TRF')
+        
+        # Transfers get their fee from the fee schedule unless one was set
+        # explicitly (0 is a waived fee, not a missing one)
+        if self.transfer_fee is None:
+            from .fees import quote_fee
+            from .fx import BASE_CURRENCY, UnknownCurrency
+            try:
+                self.transfer_fee = quote_fee(self.amount, self.recipient_country, self.payment_method, self.transfer_type, self.currency)
+            except UnknownCurrency:
+                # No rate for this currency: apply the band fee to the amount as it is
+                import logging
+                logging.getLogger(__name__).warning(f"No exchange rate for {self.currency} - fee for {self.reference_number} not converted")
+                self.transfer_fee = quote_fee(self.amount, self.recipient_country, self.payment_method, self.transfer_type, BASE_CURRENCY)
         
-        if not self.total_amount:
+        if self.total_amount is None:
             self.total_amount = self.amount + self.transfer_fee
         
         super().save(*args, **kwargs)
     
+    @property
+    def amount_usd(self):
+        """Amount converted to USD at the current cached rate"""
+        from .fx import convert
+        return convert(self.amount, self.currency)
+    
     def __str__(self):
         return f"{self.reference_number} - {self.sender_name} to {self.recipient_name} - ${self.amount}"
     
@@ -326,6 +446,53 @@ class MoneyTransfer(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Money Transfer'
         verbose_name_plural = 'Money Transfers'
+        indexes = [models.Index(fields=['status', 'lease_expires_at'])]
+
+class TransferFeeBand(models.Model):
+    """Fee for transfers in one corridor and amount range (see core/fees.py).
+
+    Blank country / payment method / transfer type match anything; the most
+    specific matching corridor wins. Bands of one corridor must not overlap.
+    """
+    recipient_country = models.CharField(max_length=100, blank=True)
+    payment_method = models.CharField(max_length=50, choices=MoneyTransfer.PAYMENT_METHOD_CHOICES, blank=True)
+    transfer_type = models.CharField(max_length=50, blank=True)
+    min_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    max_amount = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)  # exclusive, empty = no limit
+    fixed_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    percent_fee = models.DecimalField(max_digits=5, decimal_places=2, default=0)  # 1.5 = 1.5% of the amount
+    minimum_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    maximum_fee = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        corridor = '/'.join(part or '*' for part in (self.recipient_country, self.payment_method, self.transfer_type))
+        upper = f"${self.max_amount}" if self.max_amount is not None else 'up'
+        return f"{corridor}: ${self.min_amount} - {upper}"
+    
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        
+        if self.max_amount is not None and self.max_amount <= self.min_amount:
+            raise ValidationError('Maximum amount must be greater than the minimum amount')
+        overlapping = TransferFeeBand.objects.filter(
+            recipient_country__iexact=self.recipient_country.strip(),
+            payment_method=self.payment_method,
+            transfer_type__iexact=self.transfer_type.strip(),
+            is_active=True,
+        ).exclude(pk=self.pk)
+        if self.max_amount is not None:
+            overlapping = overlapping.filter(min_amount__lt=self.max_amount)
+        overlapping = overlapping.filter(models.Q(max_amount__isnull=True) | models.Q(max_amount__gt=self.min_amount))
+        if self.is_active and overlapping.exists():
+            raise ValidationError(f'Overlaps with existing band {overlapping.first()}')
+    
+    class Meta:
+        ordering = ['recipient_country', 'payment_method', 'transfer_type', 'min_amount']
+        verbose_name = 'Transfer Fee Band'
+        verbose_name_plural = 'Transfer Fee Bands'
 
 class TransferStatusHistory(models.Model):
     """Track status changes for transfers"""
@@ -343,6 +510,65 @@ class TransferStatusHistory(models.Model):
         verbose_name = 'Transfer Status History'
         verbose_name_plural = 'Transfer Status Histories'
 
+# ==================== DOCUMENT VERIFICATION ====================
+
+class DocumentVerification(models.Model):
+    """Result of the automated checks on one uploaded KYC document"""
+    DOCUMENT_TYPES = (
+        ('selfie', 'Selfie'),
+        ('id_document', 'ID Document'),
+        ('address_proof', 'Address Proof'),
+    )
+    
+    STATUS = (
+        ('passed', 'Passed'),
+        ('warning', 'Warning'),
+        ('failed', 'Failed'),
+    )
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='document_verifications')
+    document_type = models.CharField(max_length=20, choices=DOCUMENT_TYPES)
+    name = models.CharField(max_length=255, db_index=True)  # storage name
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS)
+    score = models.IntegerField(default=100)
+    results = models.JSONField(default=list, blank=True)  # one entry per check
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.get_document_type_display()} of {self.user.username} - {self.status}"
+    
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ('user', 'name')
+
+# ==================== VELOCITY ALERTS ====================
+
+class VelocityAlert(models.Model):
+    """A velocity rule was exceeded (see core/velocity.py)"""
+    SUBJECTS = (
+        ('transfer', 'Money Transfer'),
+        ('loan_payment', 'Loan Payment'),
+    )
+    
+    rule = models.CharField(max_length=100)
+    subject = models.CharField(max_length=20, choices=SUBJECTS)
+    key = models.CharField(max_length=200)  # value the rule counts by, e.g. sender id or phone
+    event_count = models.PositiveIntegerField()
+    total_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    window_seconds = models.PositiveIntegerField()
+    object_id = models.PositiveIntegerField(null=True, blank=True)  # the transfer/payment that tripped the rule
+    reviewed = models.BooleanField(default=False, db_index=True)
+    reviewed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='reviewed_velocity_alerts')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.rule}: {self.key} - {self.event_count} in {self.window_seconds}s"
+    
+    class Meta:
+        ordering = ['-created_at']
+
 # ==================== SYSTEM SETTINGS ====================
 
 class SystemSettings(models.Model):
@@ -354,13 +580,25 @@ class SystemSettings(models.Model):
     def __str__(self):
         return self.name
     
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from .system_settings import parse_setting
+        try:
+            parse_setting(self.name, self.value)
+        except ValueError as e:
+            raise ValidationError({'value': str(e)})
+    
     @classmethod
     def get_setting(cls, name, default=None):
-        try:
-            setting = cls.objects.get(name=name)
-            return setting.value
-        except cls.DoesNotExist:
-            return default
+        """Stored string, from the per-process cache (core/system_settings.py)"""
+        from .system_settings import get_raw
+        return get_raw(name, default)
+    
+    @classmethod
+    def get_value(cls, name, default=None):
+        """Typed value (Decimal, int, bool...), see SETTING_TYPES in core/system_settings.py"""
+        from .system_settings import get_value
+        return get_value(name, default)
     
     @classmethod
     def set_setting(cls, name, value, description=""):
@@ -371,4 +609,67 @@ class SystemSettings(models.Model):
         if not created:
             setting.value = value
             setting.save()
-        return setting
\ No newline at end of file
+        return setting
+
+# ==================== LOCAL CACHE VERSIONS ====================
+
+class CacheVersion(models.Model):
+    """Version counter of a process-local cache (see core/local_cache.py)"""
+    name = models.CharField(max_length=100, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+# ==================== MEDIA STORAGE ====================
+
+class MediaBlob(models.Model):
+    """Upload stored by content hash (see core/storage.py); media_gc removes unreferenced ones"""
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['-created_at']
+
+# ==================== PORTFOLIO ANALYTICS ====================
+
+class PortfolioSnapshot(models.Model):
+    """Pre-aggregated loan book figures, maintained by build_portfolio_snapshot"""
+    month = models.DateField()  # first day of the origination month
+    loan_type = models.CharField(max_length=20)
+    status = models.CharField(max_length=20)
+    deposit_paid = models.BooleanField(default=False)
+    loan_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    total_deposit_required = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    total_deposit_verified = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.loan_type}/{self.status} - {self.loan_count} loans"
+
+    class Meta:
+        ordering = ['-month', 'loan_type', 'status']
+        unique_together = ('month', 'loan_type', 'status', 'deposit_paid')
+
+
+class PortfolioSnapshotRun(models.Model):
+    """One run of build_portfolio_snapshot; the latest watermark drives the next run"""
+    watermark = models.DateTimeField()
+    full_rebuild = models.BooleanField(default=False)
+    months_rebuilt = models.IntegerField(default=0)
+    rows_written = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Snapshot run at {self.watermark}"
+
+    class Meta:
+        ordering = ['-watermark']
@@ -0,0 +1,34 @@
+# core/payment_methods.py - ACTIVE PAYMENT METHOD CATALOG
+"""
+The active PaymentMethod rows, kept per process (core/local_cache.py) so the
+loan wizard renders and checks payment options without a query.
+
+Saving or deleting a method invalidates the catalog in every process
+(core/signals.py); the admin activate/deactivate actions use
+QuerySet.update() and invalidate it themselves. The cached instances are
+shared between requests - read them, don't modify them.
+"""
+from .local_cache import VersionedLocalCache
+
+
+def load_catalog():
+    from .models import PaymentMethod
+
+    methods = tuple(PaymentMethod.objects.filter(is_active=True))
+    return {'methods': methods, 'by_id': {method.pk: method for method in methods}}
+
+
+payment_method_catalog = VersionedLocalCache('payment-method-catalog', load_catalog)
+
+
+def active_payment_methods():
+    return payment_method_catalog.get()['methods']
+
+
+def get_active_payment_method(method_id):
+    """Active method with this id (str or int), or None"""
+    try:
+        method_id = int(method_id)
+    except (TypeError, ValueError):
+        return None
+    return payment_method_catalog.get()['by_id'].get(method_id)
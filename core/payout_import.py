@@ -0,0 +1,265 @@
+# core/payout_import.py - BULK PAYOUT FILE IMPORT
+"""
+Creates many MoneyTransfer rows from one payroll/payout file (CSV with a
+header row, or JSON Lines), for the import_payouts command and the bulk
+upload view.
+
+1. The file is read row by row and every row is checked against the
+   MoneyTransfer field constraints (clean_fields - no per-row queries) and
+   priced with the in-memory fee schedule (core/fees.py).
+2. The sender's balance is checked and debited once, for the batch total.
+3. Transfers and their first TransferStatusHistory row are written with
+   bulk_create, one transaction per chunk. If a chunk fails, the amount of
+   everything not imported is refunded.
+
+Columns are MoneyTransfer field names: recipient_name, recipient_phone,
+recipient_country and amount are required; recipient_email,
+recipient_bank_name, recipient_account_number, recipient_routing_number,
+currency (USD), transfer_type (standard), payment_method (bank_transfer) and
+purpose are optional.
+"""
+import csv
+import io
+import json
+import logging
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .fees import quote_fee
+from .fx import BASE_CURRENCY, UnknownCurrency, convert
+from .ids import new_id
+from .models import Account, MoneyTransfer, Transaction, TransferStatusHistory, UserProfile
+from .velocity import record_event
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    'recipient_name', 'recipient_email', 'recipient_phone', 'recipient_country',
+    'recipient_bank_name', 'recipient_account_number', 'recipient_routing_number',
+    'amount', 'currency', 'transfer_type', 'payment_method', 'purpose',
+)
+REQUIRED_COLUMNS = ('recipient_name', 'recipient_phone', 'recipient_country', 'amount')
+DEFAULTS = {'currency': BASE_CURRENCY, 'transfer_type': 'standard', 'payment_method': 'bank_transfer'}
+
+# Filled in by the importer, not validated per row
+SKIP_VALIDATION = ('sender', 'reference_number', 'transaction_id', 'processed_by', 'total_amount', 'transfer_fee')
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+class PayoutImportError(Exception):
+    """The file as a whole cannot be imported (unreadable, no account, balance too low)"""
+
+
+# ==================== READING ====================
+
+def _text(fileobj):
+    if isinstance(fileobj, io.TextIOBase):
+        return fileobj
+    return io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+
+
+def read_rows(fileobj, file_format='csv'):
+    """Yield (line number, {column: value}) without loading the whole file"""
+    handle = _text(fileobj)
+    if file_format == 'jsonl':
+        for line_number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, ValueError(f'Invalid JSON: {e}')
+                continue
+            yield line_number, row if isinstance(row, dict) else ValueError('Each line must be a JSON object')
+    elif file_format == 'csv':
+        reader = csv.DictReader(handle)
+        missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or ())]
+        if missing:
+            raise PayoutImportError(f"Missing columns: {', '.join(missing)}")
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        raise PayoutImportError(f'Unknown file format {file_format!r} (use csv or jsonl)')
+
+
+def guess_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+# ==================== VALIDATION ====================
+
+def _sender_fields(sender):
+    profile = UserProfile.objects.filter(user=sender).first()
+    if not (profile and profile.phone) or not sender.email:
+        raise PayoutImportError('Add an email address and phone number to your profile before importing payouts')
+    return {
+        'sender': sender,
+        'sender_name': sender.get_full_name() or sender.username,
+        'sender_email': sender.email,
+        'sender_phone': profile.phone,
+    }
+
+
+def build_transfer(row, sender_fields):
+    """Unsaved MoneyTransfer for one row, or raise ValidationError"""
+    values = {}
+    for column in COLUMNS:
+        value = row.get(column)
+        value = '' if value is None else str(value).strip()
+        values[column] = value or DEFAULTS.get(column, '')
+
+    missing = [column for column in REQUIRED_COLUMNS if not values[column]]
+    if missing:
+        raise ValidationError({column: 'This field is required.' for column in missing})
+
+    try:
+        amount = Decimal(values['amount'])
+    except InvalidOperation:
+        raise ValidationError({'amount': f"'{values['amount']}' is not a number."})
+    if not amount.is_finite() or amount <= 0:
+        raise ValidationError({'amount': 'Must be greater than zero.'})
+    values['amount'] = amount
+    values['currency'] = values['currency'].upper()
+    for column in ('recipient_email', 'recipient_bank_name', 'recipient_account_number', 'recipient_routing_number', 'purpose'):
+        values[column] = values[column] or None
+
+    transfer = MoneyTransfer(**sender_fields, **values)
+    transfer.clean_fields(exclude=SKIP_VALIDATION)
+
+    try:
+        transfer.transfer_fee = quote_fee(
+            transfer.amount, transfer.recipient_country, transfer.payment_method, transfer.transfer_type, transfer.currency
+        )
+        transfer.amount_in_base = convert(transfer.amount + transfer.transfer_fee, transfer.currency)
+    except UnknownCurrency as e:
+        raise ValidationError({'currency': str(e)})
+    transfer.total_amount = transfer.amount + transfer.transfer_fee
+    transfer.reference_number = new_id('TRF')
+    return transfer
+
+
+def _error_messages(error):
+    if hasattr(error, 'message_dict'):
+        return [f'{field}: {message}' for field, messages in error.message_dict.items() for message in messages]
+    return [str(message) for message in error.messages]
+
+
+# ==================== IMPORT ====================
+
+def _sender_account(sender, account_number=None):
+    accounts = Account.objects.filter(user=sender, is_active=True)
+    if account_number:
+        accounts = accounts.filter(account_number=account_number)
+    account = accounts.order_by('pk').first()
+    if not account:
+        raise PayoutImportError(f'No active account found for {sender.username}')
+    return account
+
+
+def _debit(account, total, count):
+    """Take the batch total from the account in one step; False if the balance is too low"""
+    with transaction.atomic():
+        debited = Account.objects.filter(pk=account.pk, balance__gte=total).update(
+            balance=F('balance') - total, updated_at=timezone.now()
+        )
+        if debited:
+            Transaction.objects.create(
+                account=account,
+                transaction_type='transfer',
+                amount=total,
+                description=f'Bulk payout import: {count} transfers',
+            )
+    return bool(debited)
+
+
+def _refund(account, amount, count):
+    with transaction.atomic():
+        Account.objects.filter(pk=account.pk).update(balance=F('balance') + amount, updated_at=timezone.now())
+        Transaction.objects.create(
+            account=account,
+            transaction_type='deposit',
+            amount=amount,
+            description=f'Bulk payout import refund: {count} transfers not created',
+        )
+
+
+def _insert_chunk(chunk, actor):
+    with transaction.atomic():
+        created = MoneyTransfer.objects.bulk_create(chunk)
+        if any(transfer.pk is None for transfer in created):
+            # Backend cannot return ids from a bulk insert
+            ids = dict(MoneyTransfer.objects.filter(
+                reference_number__in=[transfer.reference_number for transfer in created]
+            ).values_list('reference_number', 'pk'))
+            for transfer in created:
+                transfer.pk = ids[transfer.reference_number]
+        TransferStatusHistory.objects.bulk_create([
+            TransferStatusHistory(transfer=transfer, status='pending', notes='Imported from payout file', changed_by=actor)
+            for transfer in created
+        ])
+    return created
+
+
+def import_payouts(sender, fileobj, file_format='csv', chunk_size=DEFAULT_CHUNK_SIZE,
+                   skip_invalid=False, dry_run=False, account_number=None):
+    """Import a payout file for `sender`; returns a report dict.
+
+    With errors in the file nothing is imported unless skip_invalid=True,
+    in which case the valid rows go through. dry_run only validates.
+    """
+    report = {'rows': 0, 'valid': 0, 'created': 0, 'total': Decimal('0.00'), 'errors': [], 'debited': False}
+    sender_fields = _sender_fields(sender)
+    transfers = []
+
+    for line_number, row in read_rows(fileobj, file_format):
+        report['rows'] += 1
+        if isinstance(row, Exception):
+            report['errors'].append((line_number, str(row)))
+            continue
+        try:
+            transfer = build_transfer(row, sender_fields)
+        except ValidationError as e:
+            report['errors'].extend((line_number, message) for message in _error_messages(e))
+            continue
+        transfer.line_number = line_number
+        transfers.append(transfer)
+        report['total'] += transfer.amount_in_base
+
+    report['valid'] = len(transfers)
+    if not transfers or dry_run or (report['errors'] and not skip_invalid):
+        return report
+
+    account = _sender_account(sender, account_number)
+    if not _debit(account, report['total'], len(transfers)):
+        raise PayoutImportError(
+            f"Insufficient balance: the batch needs ${report['total']}, account {account.account_number} has ${account.balance}"
+        )
+    report['debited'] = True
+
+    for start in range(0, len(transfers), chunk_size):
+        chunk = transfers[start:start + chunk_size]
+        try:
+            _insert_chunk(chunk, sender)
+        except Exception as e:
+            logger.exception(f"Payout import for {sender.username} failed at line {chunk[0].line_number}")
+            remaining = transfers[start:]
+            _refund(account, sum(transfer.amount_in_base for transfer in remaining), len(remaining))
+            report['errors'].append((chunk[0].line_number, f'Import stopped, {len(remaining)} transfers not created and refunded: {e}'))
+            break
+        report['created'] += len(chunk)
+        # bulk_create sends no post_save - count the chunk against the velocity rules in one go
+        record_event('transfer', chunk[0], count=len(chunk), amount=sum(transfer.amount_in_base for transfer in chunk))
+
+    logger.info(f"Payout import for {sender.username}: {report['created']} of {report['rows']} rows created, ${report['total']} debited")
+    return report
+
+
+def write_error_report(errors, handle):
+    writer = csv.writer(handle)
+    writer.writerow(['line', 'error'])
+    writer.writerows(errors)
@@ -0,0 +1,46 @@
+# core/payouts.py - PAYOUT BACKENDS
+"""
+Where settled transfers are actually sent.
+
+The settlement worker (core/settlement.py) hands each claimed batch to the
+backend named in settings.TRANSFER_PAYOUT_BACKEND and records whatever it
+returns. LocalPayoutBackend is the stub used until a real provider is wired
+in: it accepts every transfer and makes up a provider transaction ID.
+"""
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .ids import new_id
+
+
+@dataclass
+class PayoutResult:
+    transfer_id: int
+    success: bool
+    transaction_id: str = ''
+    message: str = ''
+    retryable: bool = False  # failed, but worth another attempt later
+
+
+class BasePayoutBackend:
+    """Send a batch of MoneyTransfer rows; return one PayoutResult per transfer"""
+
+    def send_batch(self, transfers):
+        raise NotImplementedError
+
+
+class LocalPayoutBackend(BasePayoutBackend):
+    """Stub provider - everything goes through"""
+
+    def send_batch(self, transfers):
+        return [
+            PayoutResult(transfer.pk, True, transaction_id=new_id('PAY'), message='Settled by local payout stub')
+            for transfer in transfers
+        ]
+
+
+def get_payout_backend():
+    path = getattr(settings, 'TRANSFER_PAYOUT_BACKEND', 'core.payouts.LocalPayoutBackend')
+    return import_string(path)()
@@ -0,0 +1,185 @@
+# core/portfolio.py - LOAN PORTFOLIO ANALYTICS
+"""
+Snapshot table behind the staff portfolio page.
+
+build_snapshot() aggregates LoanApplication/LoanPayment with a couple of
+GROUP BY queries into PortfolioSnapshot rows keyed by (origination month,
+loan_type, status, deposit_paid). Runs are incremental: a loan never changes
+its origination month, so only months containing loans or payments updated
+since the last run's watermark are rebuilt. Deleted loans are only picked up
+by a full rebuild.
+
+Changes are found by updated_at, which QuerySet.update() does not set (auto_now
+only applies to save()). Any bulk update() of LoanApplication or LoanPayment
+must stamp updated_at=timezone.now() itself, or the snapshot misses it until
+the next --full run.
+
+The staff page reads nothing but the snapshot table, whose size depends on
+the number of months and not on the number of loans.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import LoanApplication, LoanPayment, PortfolioSnapshot, PortfolioSnapshotRun
+
+# Statuses still waiting on us, for the aging buckets
+OPEN_STATUSES = ('pending', 'pending_payment', 'under_review')
+
+# (label, minimum age in months, maximum age in months or None)
+AGING_BUCKETS = (
+    ('0-1 months', 0, 1),
+    ('1-3 months', 1, 3),
+    ('3-6 months', 3, 6),
+    ('6-12 months', 6, 12),
+    ('12+ months', 12, None),
+)
+
+
+def _next_month(month):
+    return date(month.year + 1, 1, 1) if month.month == 12 else date(month.year, month.month + 1, 1)
+
+
+def _month_filter(months, field):
+    query = Q()
+    for month in months:
+        start = timezone.make_aware(datetime(month.year, month.month, 1))
+        end_month = _next_month(month)
+        end = timezone.make_aware(datetime(end_month.year, end_month.month, 1))
+        query |= Q(**{f'{field}__gte': start, f'{field}__lt': end})
+    return query
+
+
+def changed_months(since):
+    """Origination months with loans or payments modified after `since`"""
+    loan_months = LoanApplication.objects.filter(updated_at__gt=since).dates('created_at', 'month')
+    payment_months = (
+        LoanPayment.objects.filter(updated_at__gt=since)
+        .annotate(month=TruncMonth('loan__created_at', output_field=DateField()))
+        .values_list('month', flat=True)
+        .distinct()
+    )
+    return set(loan_months) | set(payment_months)
+
+
+def aggregate_months(months=None):
+    """Snapshot rows for the given months (None = every month)"""
+    loans = LoanApplication.objects.all()
+    payments = LoanPayment.objects.filter(verified=True)
+    if months is not None:
+        loans = loans.filter(_month_filter(months, 'created_at'))
+        payments = payments.filter(_month_filter(months, 'loan__created_at'))
+
+    groups = (
+        loans.annotate(month=TruncMonth('created_at', output_field=DateField()))
+        .values('month', 'loan_type', 'status', 'deposit_paid')
+        .annotate(
+            loan_count=Count('id'),
+            total_amount=Sum('amount'),
+            total_deposit_required=Sum('deposit_required'),
+        )
+        .order_by()
+    )
+    verified = (
+        payments.annotate(month=TruncMonth('loan__created_at', output_field=DateField()))
+        .values('month', 'loan__loan_type', 'loan__status', 'loan__deposit_paid')
+        .annotate(total=Sum('amount_paid'))
+        .order_by()
+    )
+    verified_by_key = {
+        (row['month'], row['loan__loan_type'], row['loan__status'], row['loan__deposit_paid']): row['total']
+        for row in verified
+    }
+
+    return [
+        PortfolioSnapshot(
+            month=row['month'],
+            loan_type=row['loan_type'],
+            status=row['status'],
+            deposit_paid=row['deposit_paid'],
+            loan_count=row['loan_count'],
+            total_amount=row['total_amount'] or 0,
+            total_deposit_required=row['total_deposit_required'] or 0,
+            total_deposit_verified=verified_by_key.get(
+                (row['month'], row['loan_type'], row['status'], row['deposit_paid']), 0
+            ) or 0,
+        )
+        for row in groups
+    ]
+
+
+def build_snapshot(full=False):
+    """Bring PortfolioSnapshot up to date; returns the PortfolioSnapshotRun"""
+    started = timezone.now()
+    last_run = PortfolioSnapshotRun.objects.first()
+    full = full or last_run is None
+
+    months = None if full else changed_months(last_run.watermark)
+
+    with transaction.atomic():
+        if full:
+            PortfolioSnapshot.objects.all().delete()
+            rows = aggregate_months()
+            months_rebuilt = len({row.month for row in rows})
+        elif months:
+            PortfolioSnapshot.objects.filter(month__in=months).delete()
+            rows = aggregate_months(months)
+            months_rebuilt = len(months)
+        else:
+            rows, months_rebuilt = [], 0
+
+        PortfolioSnapshot.objects.bulk_create(rows, batch_size=500)
+        return PortfolioSnapshotRun.objects.create(
+            # Rows changed while we ran are newer than `started` and get picked up next time
+            watermark=started,
+            full_rebuild=full,
+            months_rebuilt=months_rebuilt,
+            rows_written=len(rows),
+        )
+
+
+def portfolio_report(as_of=None):
+    """Everything the staff portfolio page shows, from the snapshot table only"""
+    as_of = (as_of or timezone.now()).date()
+    zero = Decimal('0.00')
+    report = {
+        'by_type': {},
+        'by_status': {},
+        'by_month': {},
+        'aging': {label: {'loans': 0, 'amount': zero} for label, _, _ in AGING_BUCKETS},
+        'totals': {'loans': 0, 'amount': zero, 'deposit_required': zero, 'deposit_verified': zero, 'deposit_paid_loans': 0},
+    }
+
+    for row in PortfolioSnapshot.objects.all():
+        for group, key in (('by_type', row.loan_type), ('by_status', row.status), ('by_month', row.month)):
+            bucket = report[group].setdefault(key, {'loans': 0, 'amount': zero})
+            bucket['loans'] += row.loan_count
+            bucket['amount'] += row.total_amount
+
+        totals = report['totals']
+        totals['loans'] += row.loan_count
+        totals['amount'] += row.total_amount
+        totals['deposit_required'] += row.total_deposit_required
+        totals['deposit_verified'] += row.total_deposit_verified
+        if row.deposit_paid:
+            totals['deposit_paid_loans'] += row.loan_count
+
+        if row.status in OPEN_STATUSES:
+            age = (as_of.year - row.month.year) * 12 + as_of.month - row.month.month
+            for label, low, high in AGING_BUCKETS:
+                if age >= low and (high is None or age < high):
+                    report['aging'][label]['loans'] += row.loan_count
+                    report['aging'][label]['amount'] += row.total_amount
+                    break
+
+    totals = report['totals']
+    totals['deposit_coverage'] = (
+        totals['deposit_verified'] / totals['deposit_required'] * 100 if totals['deposit_required'] else zero
+    )
+    report['by_month'] = dict(sorted(report['by_month'].items(), reverse=True))
+    report['last_run'] = PortfolioSnapshotRun.objects.first()
+    return report
@@ -0,0 +1,109 @@
+# core/references.py - PAYMENT REFERENCE INDEX
+"""
+Catches the same payment being claimed for more than one loan.
+
+Every submitted deposit is indexed in PaymentReferenceIndex under two keys:
+- 'reference': the external transaction reference, normalized (case,
+  whitespace and the usual separators ignored, so 'tx-123 ab' == 'TX123AB'),
+- 'sender': sender name + amount + payment date.
+
+Both keys are SHA-256 hashes of the normalized values, so a lookup is a
+single indexed equality query no matter how many payments exist.
+"""
+import hashlib
+import re
+from decimal import Decimal
+
+from django.db.models import Q
+
+REFERENCE = 'reference'
+SENDER = 'sender'
+
+_SEPARATORS = re.compile(r'[\s\-_/.,:#]+')
+
+
+def normalize_reference(value):
+    return _SEPARATORS.sub('', str(value or '')).upper()
+
+
+def _hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def reference_key(value):
+    normalized = normalize_reference(value)
+    return _hash(normalized) if normalized else None
+
+
+def sender_key(sender_name, amount, payment_date):
+    name = ' '.join(str(sender_name or '').split()).casefold()
+    if not name or amount in (None, '') or not payment_date:
+        return None
+    amount = Decimal(str(amount)).quantize(Decimal('0.01'))
+    return _hash(f'{name}|{amount}|{payment_date}')
+
+
+def payment_keys(reference=None, sender_name=None, amount=None, payment_date=None):
+    """[(kind, key)] for whatever details are known"""
+    keys = []
+    ref = reference_key(reference)
+    if ref:
+        keys.append((REFERENCE, ref))
+    sender = sender_key(sender_name, amount, payment_date)
+    if sender:
+        keys.append((SENDER, sender))
+    return keys
+
+
+def keys_for_payment(payment):
+    return payment_keys(payment.transaction_id, payment.sender_name, payment.amount_paid, payment.payment_date)
+
+
+def find_duplicates(keys, exclude_loan=None):
+    """Index rows of other loans sharing any of `keys`, grouped by kind"""
+    from .models import PaymentReferenceIndex
+
+    if not keys:
+        return {}
+    query = Q()
+    for kind, key in keys:
+        query |= Q(kind=kind, key=key)
+    rows = PaymentReferenceIndex.objects.filter(query).select_related('loan')
+    if exclude_loan is not None:
+        rows = rows.exclude(loan=exclude_loan)
+
+    duplicates = {}
+    for row in rows:
+        duplicates.setdefault(row.kind, []).append(row)
+    return duplicates
+
+
+def describe_duplicates(duplicates):
+    labels = {REFERENCE: 'same payment reference', SENDER: 'same sender, amount and date'}
+    return '; '.join(
+        f"{labels[kind]} as {', '.join(sorted({row.loan.application_id for row in rows}))}"
+        for kind, rows in duplicates.items()
+    )
+
+
+def index_payment(loan, payment=None, keys=None):
+    """Record the keys of a submitted payment; returns the duplicates found"""
+    from .models import LoanPayment, PaymentReferenceIndex
+
+    if keys is None:
+        keys = keys_for_payment(payment)
+    duplicates = find_duplicates(keys, exclude_loan=loan)
+
+    PaymentReferenceIndex.objects.bulk_create(
+        [PaymentReferenceIndex(kind=kind, key=key, loan=loan, payment=payment) for kind, key in keys],
+        ignore_conflicts=True,
+    )
+
+    if duplicates:
+        # Flag both sides so staff see it whichever payment they open first
+        payment_ids = {row.payment_id for rows in duplicates.values() for row in rows if row.payment_id}
+        if payment is not None:
+            payment_ids.add(payment.pk)
+            payment.duplicate_suspect = True
+        LoanPayment.objects.filter(pk__in=payment_ids).update(duplicate_suspect=True)
+    return duplicates
@@ -0,0 +1,160 @@
+# core/settlement.py - MONEY TRANSFER SETTLEMENT
+"""
+Moves MoneyTransfer rows from pending to completed/failed without a staff
+member clicking through them.
+
+Workers (manage.py settle_transfers, as many processes as needed) each:
+1. claim a batch: pending transfers, plus processing ones whose lease ran
+   out because a worker died. On PostgreSQL/MySQL the candidates are locked
+   with SELECT ... FOR UPDATE SKIP LOCKED so workers never wait on each other;
+   on SQLite the claim is a compare-and-set UPDATE on the lease columns.
+2. send the batch to the payout backend (core/payouts.py),
+3. write the outcome with one bulk_update and one bulk_create of
+   TransferStatusHistory - only for rows this worker still holds the lease on.
+Status changes are announced to live status streams (core/status_events.py)
+since bulk updates send no signals.
+"""
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import MoneyTransfer, TransferStatusHistory
+from .payouts import get_payout_backend
+from .status_events import publish_transfer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = 300
+
+
+def default_worker_id():
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+def _claimable(now):
+    return MoneyTransfer.objects.filter(
+        Q(status='pending') | Q(status='processing', lease_expires_at__lt=now)
+    )
+
+
+def claim_batch(worker_id, batch_size=100, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """Lease up to `batch_size` transfers to `worker_id` and return them"""
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=lease_seconds)
+
+    with transaction.atomic():
+        candidates = _claimable(now).order_by('created_at')
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return []
+
+        # Re-checking the claim condition makes this safe without row locks too (SQLite)
+        _claimable(now).filter(pk__in=ids).update(
+            status='processing',
+            lease_owner=worker_id,
+            lease_expires_at=lease_until,
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+        claimed = list(MoneyTransfer.objects.filter(pk__in=ids, lease_owner=worker_id, lease_expires_at=lease_until))
+
+        TransferStatusHistory.objects.bulk_create([
+            TransferStatusHistory(transfer=transfer, status='processing', notes=f'Claimed by settlement worker {worker_id}')
+            for transfer in claimed
+        ])
+        for transfer in claimed:
+            publish_transfer(transfer)
+    return claimed
+
+
+def settle_batch(transfers, worker_id, backend=None):
+    """Pay out a claimed batch and record the results; returns {status: count}"""
+    backend = backend or get_payout_backend()
+    max_attempts = getattr(settings, 'TRANSFER_MAX_ATTEMPTS', 5)
+    counts = {'completed': 0, 'failed': 0, 'retry': 0, 'lost_lease': 0}
+
+    try:
+        results = {result.transfer_id: result for result in backend.send_batch(transfers)}
+    except Exception as e:
+        logger.exception(f"Payout backend failed for a batch of {len(transfers)} transfers")
+        results = {}
+        error = f'Payout backend error: {e}'
+    else:
+        error = 'No result from payout backend'
+
+    now = timezone.now()
+    with transaction.atomic():
+        still_ours = MoneyTransfer.objects.filter(
+            pk__in=[transfer.pk for transfer in transfers], status='processing', lease_owner=worker_id
+        )
+        if connection.features.has_select_for_update:
+            still_ours = still_ours.select_for_update()
+        owned = set(still_ours.values_list('pk', flat=True))
+
+        updated, history = [], []
+        for transfer in transfers:
+            if transfer.pk not in owned:
+                # Lease expired and someone else picked it up (or staff changed it)
+                counts['lost_lease'] += 1
+                continue
+
+            result = results.get(transfer.pk)
+            transfer.lease_owner = ''
+            transfer.lease_expires_at = None
+            transfer.updated_at = now
+            if result and result.success:
+                transfer.status = 'completed'
+                transfer.transaction_id = result.transaction_id or transfer.transaction_id
+                transfer.processed_at = now
+                counts['completed'] += 1
+            elif (result is None or result.retryable) and transfer.attempts < max_attempts:
+                transfer.status = 'pending'
+                counts['retry'] += 1
+            else:
+                transfer.status = 'failed'
+                counts['failed'] += 1
+            updated.append(transfer)
+            history.append(TransferStatusHistory(
+                transfer=transfer, status=transfer.status, notes=(result.message if result else error)
+            ))
+
+        MoneyTransfer.objects.bulk_update(
+            updated, ['status', 'transaction_id', 'processed_at', 'lease_owner', 'lease_expires_at', 'updated_at'],
+            batch_size=500,
+        )
+        TransferStatusHistory.objects.bulk_create(history, batch_size=500)
+        for transfer in updated:
+            publish_transfer(transfer)
+
+    return counts
+
+
+def set_transfer_status(queryset, status, actor=None, notes=''):
+    """Manual status change (admin actions) with a history row per transfer"""
+    now = timezone.now()
+    with transaction.atomic():
+        transfers = queryset.exclude(status=status)
+        if connection.features.has_select_for_update:
+            transfers = transfers.select_for_update()
+        transfers = list(transfers)
+        updates = {'status': status, 'lease_owner': '', 'lease_expires_at': None, 'updated_at': now}
+        if status == 'completed':
+            updates.update(processed_at=now, processed_by=actor)
+        MoneyTransfer.objects.filter(pk__in=[transfer.pk for transfer in transfers]).update(**updates)
+        TransferStatusHistory.objects.bulk_create([
+            TransferStatusHistory(transfer=transfer, status=status, notes=notes, changed_by=actor)
+            for transfer in transfers
+        ])
+        for transfer in transfers:
+            transfer.status = status
+            transfer.updated_at = now
+            publish_transfer(transfer)
+    return len(transfers)
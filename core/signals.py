@@ -0,0 +1,51 @@
+# core/signals.py - MODEL SIGNAL HANDLERS
+"""
+Cache invalidation and other reactions to model changes (wired up in apps.py).
+
+Caches are invalidated on commit: invalidating inside the transaction would
+let another process rebuild from the old rows and keep them under the new
+version.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .fees import fee_schedule
+from .models import LoanApplication, LoanPayment, MoneyTransfer, PaymentMethod, SystemSettings, TransferFeeBand
+from .payment_methods import payment_method_catalog
+from .status_events import publish_loan, publish_transfer
+from .system_settings import system_settings
+from .velocity import record_event
+
+
+@receiver([post_save, post_delete], sender=TransferFeeBand)
+def invalidate_fee_schedule(sender, **kwargs):
+    transaction.on_commit(fee_schedule.invalidate)
+
+
+@receiver([post_save, post_delete], sender=PaymentMethod)
+def invalidate_payment_method_catalog(sender, **kwargs):
+    transaction.on_commit(payment_method_catalog.invalidate)
+
+
+@receiver(post_save, sender=MoneyTransfer)
+def announce_transfer_status(sender, instance, created, **kwargs):
+    publish_transfer(instance)
+    if created:
+        transaction.on_commit(lambda: record_event('transfer', instance), robust=True)
+
+
+@receiver(post_save, sender=LoanApplication)
+def announce_loan_status(sender, instance, **kwargs):
+    publish_loan(instance)
+
+
+@receiver(post_save, sender=LoanPayment)
+def count_loan_payment(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: record_event('loan_payment', instance), robust=True)
+
+
+@receiver([post_save, post_delete], sender=SystemSettings)
+def invalidate_system_settings(sender, **kwargs):
+    transaction.on_commit(system_settings.invalidate)
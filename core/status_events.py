@@ -0,0 +1,125 @@
+# core/status_events.py - LIVE STATUS UPDATES
+"""
+In-process publish/subscribe for MoneyTransfer and LoanApplication status
+changes, consumed by the server-sent events views (transfer_events,
+loan_events).
+
+Publishers call publish_transfer()/publish_loan() - from the post_save
+signals in core/signals.py and from the code paths that change status with
+.update()/bulk_update() (loan_workflow, settlement), which send no signals.
+Events go out after the transaction commits, so a client never sees a status
+that was rolled back.
+
+Each waiting browser is one asyncio.Queue on the ASGI event loop: an idle
+connection costs a coroutine, not a thread. The broker only reaches
+subscribers in the same process, so the stream also re-reads the status from
+the database every SSE_POLL_SECONDS; changes made by other processes
+(settle_transfers workers, other web workers) arrive with that delay.
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+TRANSFER_FINAL_STATUSES = ('completed', 'failed', 'cancelled')
+LOAN_FINAL_STATUSES = ('approved', 'rejected', 'disbursed', 'completed')
+
+QUEUE_SIZE = 8
+
+
+def transfer_channel(reference_number):
+    return f'transfer:{reference_number}'
+
+
+def loan_channel(loan_id):
+    return f'loan:{loan_id}'
+
+
+def _deliver(queue, event):
+    # Only the newest status matters - drop the oldest if a client lags behind
+    if queue.full():
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+    queue.put_nowait(event)
+
+
+class StatusBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # channel -> {queue: event loop}
+
+    def subscribe(self, channel):
+        """New queue receiving the channel's events (call from the event loop)"""
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers.setdefault(channel, {})[queue] = loop
+        return queue
+
+    def unsubscribe(self, channel, queue):
+        with self._lock:
+            queues = self._subscribers.get(channel)
+            if queues is not None:
+                queues.pop(queue, None)
+                if not queues:
+                    del self._subscribers[channel]
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._subscribers.get(channel, ()))
+            return sum(len(queues) for queues in self._subscribers.values())
+
+    def publish(self, channel, event):
+        """Hand `event` to every subscriber of `channel`; safe from any thread"""
+        with self._lock:
+            queues = list(self._subscribers.get(channel, {}).items())
+        for queue, loop in queues:
+            try:
+                loop.call_soon_threadsafe(_deliver, queue, event)
+            except RuntimeError:
+                # Loop already closed - the connection is gone
+                self.unsubscribe(channel, queue)
+
+
+broker = StatusBroker()
+
+
+# ==================== EVENTS ====================
+
+def transfer_state(transfer):
+    return {
+        'reference': transfer.reference_number,
+        'status': transfer.status,
+        'updated_at': transfer.updated_at.isoformat() if transfer.updated_at else None,
+    }
+
+
+def loan_state(loan):
+    return {
+        'application_id': loan.application_id,
+        'status': loan.status,
+        'deposit_paid': loan.deposit_paid,
+        'updated_at': loan.updated_at.isoformat() if loan.updated_at else None,
+    }
+
+
+def publish_transfer(transfer):
+    """Announce the transfer's current status once the transaction commits"""
+    state = transfer_state(transfer)
+    transaction.on_commit(lambda: broker.publish(transfer_channel(transfer.reference_number), state))
+
+
+def publish_loan(loan):
+    state = loan_state(loan)
+    transaction.on_commit(lambda: broker.publish(loan_channel(loan.pk), state))
+
+
+def format_event(data, event='status'):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,113 @@
+# core/storage.py - CONTENT-ADDRESSED DOCUMENT STORAGE
+"""
+Deduplicating storage for loan documents and payment proofs.
+
+Uploads are stored under their SHA-256 digest (selfies/ab/abcdef....jpg), so
+re-uploading the same file on a retry costs no extra disk space or write I/O -
+the new row simply points at the existing blob. Each blob has a MediaBlob row;
+its updated_at is touched whenever the blob is stored again.
+
+Since one blob can back many rows, a blob is never removed by delete().
+Liveness comes from reachability: media_gc removes blobs that no
+LoanApplication, LoanDraft or LoanPayment refers to any more.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def hash_content(content):
+    """SHA-256 of a Django File, leaving it rewound for the actual write"""
+    digest = hashlib.sha256()
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that keys files by content hash"""
+
+    def blob_name(self, name, digest):
+        """selfies/18_photo.JPG -> selfies/ab/ab12...ef.jpg"""
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return '/'.join(part for part in (directory, digest[:2], digest + extension) if part)
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content hash, never from the upload name
+        return name
+
+    def _write_blob(self, name, content):
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+
+        if hasattr(content, 'temporary_file_path'):
+            # Already on disk (large upload) - a rename, not a copy
+            file_move_safe(content.temporary_file_path(), full_path, allow_overwrite=True)
+        else:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.incoming-')
+            try:
+                with os.fdopen(fd, 'wb') as tmp_file:
+                    for chunk in content.chunks():
+                        tmp_file.write(chunk)
+                # Identical content, so replacing a concurrent writer's copy is harmless
+                os.replace(tmp_path, full_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        # Upload handlers may already have hashed the stream
+        digest = getattr(content, 'sha256', None) or hash_content(content)
+        name = self.blob_name(name, digest)
+
+        with transaction.atomic():
+            claimed = MediaBlob.objects.filter(name=name).update(updated_at=timezone.now())
+            if claimed and self.exists(name):
+                logger.info(f"Duplicate upload stored as existing blob {name}")
+                return name
+
+            self._write_blob(name, content)
+
+            if not claimed:
+                MediaBlob.objects.get_or_create(
+                    name=name,
+                    defaults={'sha256': digest, 'size': content.size}
+                )
+
+        return name
+
+    def delete(self, name):
+        """Delete a legacy (pre-blob) file; blobs may be shared, so media_gc removes them"""
+        from .models import MediaBlob
+
+        if MediaBlob.objects.filter(name=name).exists():
+            logger.info(f"Not deleting shared blob {name} - media_gc removes it once unreferenced")
+            return
+        super().delete(name)
+
+
+document_storage = ContentAddressedStorage()
+
+
+def get_document_storage():
+    """Storage callable for FileFields holding customer documents"""
+    return document_storage
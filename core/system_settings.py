@@ -0,0 +1,164 @@
+# core/system_settings.py - CACHED SYSTEM SETTINGS
+"""
+All SystemSettings rows, loaded with one query and kept per process
+(core/local_cache.py), so reading a setting is a dict lookup.
+
+Values are parsed once, at load time, using SETTING_TYPES; settings not
+listed there stay strings. A value that does not parse is logged and
+treated as missing, so callers get their default.
+
+SystemSettings.set_setting() and admin saves/deletes invalidate the cache in
+every process (core/signals.py). Code that changes rows with
+QuerySet.update() must call system_settings.invalidate() itself, after the
+transaction commits (transaction.on_commit).
+"""
+import json
+import logging
+from decimal import Decimal, InvalidOperation
+
+from .local_cache import VersionedLocalCache
+
+logger = logging.getLogger(__name__)
+
+
+def parse_bool(value):
+    value = str(value).strip().lower()
+    if value in ('1', 'true', 'yes', 'on'):
+        return True
+    if value in ('0', 'false', 'no', 'off', ''):
+        return False
+    raise ValueError(f"'{value}' is not a boolean")
+
+
+PARSERS = {
+    'str': str,
+    'int': int,
+    'decimal': Decimal,
+    'bool': parse_bool,
+    'json': json.loads,
+}
+
+SETTING_TYPES = {
+    'default_account_balance': 'decimal',
+    'min_deposit_amount': 'decimal',
+    'auto_logout_minutes': 'int',
+    'loan_deposit_percentage': 'decimal',
+    'min_loan_amount': 'decimal',
+    'max_loan_amount': 'decimal',
+    'loan_interest_rate': 'decimal',
+    'velocity_rules': 'json',
+}
+
+# Families of settings, by name prefix
+SETTING_TYPE_PREFIXES = {
+    'loan_interest_rate_': 'decimal',
+}
+
+
+def setting_type(name):
+    if name in SETTING_TYPES:
+        return SETTING_TYPES[name]
+    for prefix, kind in SETTING_TYPE_PREFIXES.items():
+        if name.startswith(prefix):
+            return kind
+    return 'str'
+
+
+def parse_setting(name, value):
+    """Typed value of one setting; raises ValueError if it does not parse"""
+    kind = setting_type(name)
+    try:
+        return PARSERS[kind](value.strip() if kind != 'str' else value)
+    except (InvalidOperation, TypeError, ValueError) as e:
+        raise ValueError(f"SystemSettings '{name}' = {value!r} is not a valid {kind}") from e
+
+
+def load_settings():
+    """{'raw': {name: string}, 'typed': {name: parsed value}}"""
+    from .models import SystemSettings
+
+    raw, typed = {}, {}
+    for name, value in SystemSettings.objects.values_list('name', 'value'):
+        raw[name] = value
+        try:
+            typed[name] = parse_setting(name, value)
+        except ValueError as e:
+            logger.error(str(e))
+    return {'raw': raw, 'typed': typed}
+
+
+system_settings = VersionedLocalCache('system-settings', load_settings)
+
+
+def get_raw(name, default=None):
+    """The stored string, as SystemSettings.get_setting always returned"""
+    return system_settings.get()['raw'].get(name, default)
+
+
+def get_value(name, default=None):
+    """Parsed value (Decimal, int, bool, JSON...) or `default`"""
+    return system_settings.get()['typed'].get(name, default)
+
+
+# ==================== BULK CHANGES ====================
+
+def upsert_settings(entries, overwrite=True, dry_run=False):
+    """Create/update many settings with one read and one write.
+
+    entries: iterable of {'name', 'value', 'description' (optional)}.
+    overwrite=False leaves existing rows alone. Entries whose value does not
+    parse are skipped and reported. Returns {'created': [names],
+    'updated': [(name, old value, new value)], 'unchanged': [names],
+    'invalid': [(name, error)]}.
+    """
+    from django.db import transaction
+    from .models import SystemSettings
+
+    entries = list(entries)
+    existing = {
+        setting.name: setting
+        for setting in SystemSettings.objects.filter(name__in=[entry['name'] for entry in entries])
+    }
+    diff = {'created': [], 'updated': [], 'unchanged': [], 'invalid': []}
+    rows = []
+    for entry in entries:
+        name, value = entry['name'], str(entry['value'])
+        description = entry.get('description')
+        try:
+            parse_setting(name, value)
+        except ValueError as e:
+            diff['invalid'].append((name, str(e)))
+            continue
+
+        current = existing.get(name)
+        if current is None:
+            diff['created'].append(name)
+        elif not overwrite or (current.value == value and (description is None or current.description == description)):
+            diff['unchanged'].append(name)
+            continue
+        else:
+            diff['updated'].append((name, current.value, value))
+        if description is None:
+            description = current.description if current else ''
+        rows.append(SystemSettings(name=name, value=value, description=description))
+
+    if rows and not dry_run:
+        with transaction.atomic():
+            SystemSettings.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=['name'], update_fields=['value', 'description']
+            )
+        # bulk_create sends no post_save, so the signal handler does not run
+        transaction.on_commit(system_settings.invalidate)
+    return diff
+
+
+def export_settings(names=None):
+    from .models import SystemSettings
+
+    settings = SystemSettings.objects.order_by('name')
+    if names:
+        settings = settings.filter(name__in=names)
+    return [
+        {'name': name, 'value': value, 'description': description}
+        for name, value, description in settings.values_list('name', 'value', 'description')
+    ]
@@ -0,0 +1,53 @@
+# core/tasks.py - BACKGROUND WORKER
+"""Small in-process worker pool for jobs that must not block a request."""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Create the shared worker pool on first use"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'BACKGROUND_WORKERS', 2),
+                    thread_name_prefix='trustbank-worker',
+                )
+    return _executor
+
+
+def _run_job(func, args, kwargs):
+    # Worker threads get their own DB connections - make sure they are fresh
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception(f"Background job {func.__name__} failed")
+    finally:
+        close_old_connections()
+
+
+def run_in_background(func, *args, **kwargs):
+    """Queue func(*args, **kwargs) on the worker pool.
+
+    With BACKGROUND_TASKS_EAGER = True the job runs inline instead, which is
+    what management commands and local debugging usually want.
+    """
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        return _run_job(func, args, kwargs)
+    return get_executor().submit(_run_job, func, args, kwargs)
+
+
+def run_after_commit(func, *args, **kwargs):
+    """Queue a background job once the current transaction has committed"""
+    transaction.on_commit(lambda: run_in_background(func, *args, **kwargs))
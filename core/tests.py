@@ -1,3 +1,335 @@
-from django.test import TestCase
+import io
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from . import payout_import
+from .idempotency import PROCESSING, _cache_key, idempotent, request_fingerprint
+from .local_cache import VersionedLocalCache
+from .loan_workflow import LOAN_TRANSITIONS, InvalidTransition, TransitionConflict, transition_loan
+from .models import (
+    Account, LoanApplication, LoanStatusHistory, MoneyTransfer, Transaction, TransferStatusHistory, UserProfile,
+)
+from .payout_import import PayoutImportError, import_payouts
+from .payouts import BasePayoutBackend, PayoutResult
+from .settlement import claim_batch, settle_batch
+
+
+def make_customer(email='customer@example.com', balance='0.00'):
+    user = User.objects.create_user(username=email, email=email, password='secret-pass-1')
+    account = Account.objects.create(user=user, account_type='checking', balance=Decimal(balance))
+    return user, account
+
+
+def make_loan(user, status='pending', amount='1000.00', deposit='100.00'):
+    return LoanApplication.objects.create(
+        user=user,
+        loan_type='personal',
+        amount=Decimal(amount),
+        purpose='Test loan',
+        term_months=12,
+        status=status,
+        deposit_required=Decimal(deposit),
+    )
+
+
+def make_transfer(user, amount='50.00', **fields):
+    return MoneyTransfer.objects.create(
+        sender=user,
+        sender_name='Test Sender',
+        sender_email=user.email,
+        sender_phone='5550100',
+        recipient_name='Test Recipient',
+        recipient_phone='5550199',
+        recipient_country='US',
+        amount=Decimal(amount),
+        transfer_type='domestic',
+        transfer_fee=Decimal('0.00'),
+        **fields,
+    )
+
+
+# ==================== LOAN WORKFLOW ====================
+
+class LoanWorkflowTests(TestCase):
+    def setUp(self):
+        self.user, self.account = make_customer()
+
+    def test_approval_disburses_once(self):
+        loan = make_loan(self.user, status='under_review')
+        transition_loan(loan, 'approved', actor=self.user)
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('900.00'))
+        self.assertEqual(Transaction.objects.filter(account=self.account, transaction_type='loan_disbursement').count(), 1)
+        loan.refresh_from_db()
+        self.assertEqual(loan.status, 'approved')
+        self.assertTrue(loan.deposit_paid)
+
+    def test_stale_status_loses_and_disburses_nothing(self):
+        loan = make_loan(self.user, status='under_review')
+        first_click = LoanApplication.objects.get(pk=loan.pk)
+        second_click = LoanApplication.objects.get(pk=loan.pk)
+
+        transition_loan(first_click, 'approved', actor=self.user)
+        with self.assertRaises(TransitionConflict):
+            # Still believes the loan is under review
+            transition_loan(second_click, 'rejected', actor=self.user)
+
+        loan.refresh_from_db()
+        self.account.refresh_from_db()
+        self.assertEqual(loan.status, 'approved')
+        self.assertEqual(self.account.balance, Decimal('900.00'))
+        self.assertEqual(Transaction.objects.filter(account=self.account).count(), 1)
+        self.assertEqual(LoanStatusHistory.objects.filter(loan=loan).count(), 1)
+
+    def test_repeated_approval_is_rejected(self):
+        loan = make_loan(self.user, status='under_review')
+        transition_loan(loan, 'approved', actor=self.user)
+        with self.assertRaises(InvalidTransition):
+            transition_loan(loan, 'approved', actor=self.user)
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('900.00'))
+
+    def test_forbidden_transitions_are_rejected(self):
+        statuses = set(LOAN_TRANSITIONS) | {status for targets in LOAN_TRANSITIONS.values() for status in targets}
+        for old_status in sorted(statuses):
+            for new_status in sorted(statuses - set(LOAN_TRANSITIONS[old_status])):
+                with self.subTest(old_status=old_status, new_status=new_status):
+                    loan = make_loan(self.user, status=old_status)
+                    with self.assertRaises(InvalidTransition):
+                        transition_loan(loan, new_status, actor=self.user)
+                    loan.refresh_from_db()
+                    self.assertEqual(loan.status, old_status)
+                    self.assertFalse(LoanStatusHistory.objects.filter(loan=loan).exists())
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('0.00'))
+        self.assertFalse(Transaction.objects.exists())
+
+
+# ==================== IDEMPOTENCY KEYS ====================
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='payer@example.com', password='secret-pass-1')
+        self.calls = 0
+
+        @idempotent
+        def view(request):
+            self.calls += 1
+            return JsonResponse({'call': self.calls}, status=201)
+        self.view = view
+
+    def post(self, key, **data):
+        request = RequestFactory().post('/pay/', {'idempotency_key': key, **data})
+        request.user = self.user
+        return request
+
+    def test_retry_replays_stored_response(self):
+        first = self.view(self.post('key-1', amount='10'))
+        retry = self.view(self.post('key-1', amount='10'))
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry['Idempotent-Replay'], 'true')
+
+    def test_same_key_with_different_request_is_refused(self):
+        self.view(self.post('key-1', amount='10'))
+        response = self.view(self.post('key-1', amount='99'))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.calls, 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_request_in_flight_gets_409(self):
+        request = self.post('key-1', amount='10')
+        cache.set(_cache_key(request, 'key-1'), {'state': PROCESSING, 'fingerprint': request_fingerprint(request)})
+
+        response = self.view(request)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.calls, 0)
+
+    def test_requests_without_key_always_run(self):
+        self.view(self.post(''))
+        self.view(self.post(''))
+        self.assertEqual(self.calls, 2)
+
+
+# ==================== SETTLEMENT ====================
+
+class ScriptedPayoutBackend(BasePayoutBackend):
+    """Answers with the PayoutResult built by `outcome(transfer)`"""
+
+    def __init__(self, outcome):
+        self.outcome = outcome
+
+    def send_batch(self, transfers):
+        return [self.outcome(transfer) for transfer in transfers]
+
+
+class SettlementTests(TestCase):
+    def setUp(self):
+        self.user, _ = make_customer()
+        self.transfers = [make_transfer(self.user) for _ in range(3)]
+
+    def test_leased_batch_cannot_be_claimed_again(self):
+        claimed = claim_batch('worker-a', batch_size=10)
+        self.assertEqual(len(claimed), 3)
+        self.assertEqual(claim_batch('worker-b', batch_size=10), [])
+        self.assertEqual(MoneyTransfer.objects.filter(lease_owner='worker-a', status='processing').count(), 3)
+
+    def test_expired_lease_is_reclaimed(self):
+        batch = claim_batch('worker-a', batch_size=10)
+        MoneyTransfer.objects.filter(pk=self.transfers[0].pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+        reclaimed = claim_batch('worker-b', batch_size=10)
+        self.assertEqual([transfer.pk for transfer in reclaimed], [self.transfers[0].pk])
+        self.assertEqual(reclaimed[0].attempts, 2)
+
+        # The first worker lost that row, and its result for it is dropped
+        backend = ScriptedPayoutBackend(lambda transfer: PayoutResult(transfer.pk, True, transaction_id='PAY-A'))
+        counts = settle_batch(batch, 'worker-a', backend)
+        self.assertEqual(counts['completed'], 2)
+        self.assertEqual(counts['lost_lease'], 1)
+        transfer = MoneyTransfer.objects.get(pk=self.transfers[0].pk)
+        self.assertEqual((transfer.status, transfer.lease_owner), ('processing', 'worker-b'))
+
+    def test_success_completes_transfers(self):
+        batch = claim_batch('worker-a', batch_size=10)
+        backend = ScriptedPayoutBackend(lambda transfer: PayoutResult(transfer.pk, True, transaction_id=f'PAY-{transfer.pk}'))
+        counts = settle_batch(batch, 'worker-a', backend)
+
+        self.assertEqual(counts['completed'], 3)
+        for transfer in MoneyTransfer.objects.all():
+            self.assertEqual(transfer.status, 'completed')
+            self.assertEqual(transfer.transaction_id, f'PAY-{transfer.pk}')
+            self.assertEqual(transfer.lease_owner, '')
+            self.assertIsNotNone(transfer.processed_at)
+
+    def test_retryable_failure_goes_back_to_pending(self):
+        batch = claim_batch('worker-a', batch_size=10)
+        backend = ScriptedPayoutBackend(lambda transfer: PayoutResult(transfer.pk, False, message='Timeout', retryable=True))
+        counts = settle_batch(batch, 'worker-a', backend)
+
+        self.assertEqual(counts['retry'], 3)
+        self.assertEqual(MoneyTransfer.objects.filter(status='pending', lease_owner='').count(), 3)
+        self.assertEqual(len(claim_batch('worker-b', batch_size=10)), 3)
+
+    @override_settings(TRANSFER_MAX_ATTEMPTS=1)
+    def test_retryable_failure_fails_after_max_attempts(self):
+        batch = claim_batch('worker-a', batch_size=10)
+        backend = ScriptedPayoutBackend(lambda transfer: PayoutResult(transfer.pk, False, message='Timeout', retryable=True))
+        counts = settle_batch(batch, 'worker-a', backend)
+
+        self.assertEqual(counts['failed'], 3)
+        self.assertEqual(MoneyTransfer.objects.filter(status='failed').count(), 3)
+
+    def test_terminal_failure_fails_at_once(self):
+        batch = claim_batch('worker-a', batch_size=10)
+        backend = ScriptedPayoutBackend(lambda transfer: PayoutResult(transfer.pk, False, message='Account closed'))
+        counts = settle_batch(batch, 'worker-a', backend)
+
+        self.assertEqual(counts['failed'], 3)
+        self.assertEqual(MoneyTransfer.objects.filter(status='failed').count(), 3)
+        self.assertEqual(TransferStatusHistory.objects.filter(status='failed', notes='Account closed').count(), 3)
+
+
+# ==================== BULK PAYOUT IMPORT ====================
+
+def payout_file(*amounts):
+    lines = ['recipient_name,recipient_phone,recipient_country,amount']
+    lines += [f'Recipient {number},555010{number},US,{amount}' for number, amount in enumerate(amounts)]
+    return io.BytesIO('\n'.join(lines).encode())
+
+
+class PayoutImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.account = make_customer(balance='100.00')
+        UserProfile.objects.create(user=self.user, phone='5550100')
+
+    def test_batch_is_debited_once(self):
+        report = import_payouts(self.user, payout_file('10.00', '20.00', '30.00'))
+
+        self.assertEqual(report['created'], 3)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('40.00'))
+        self.assertEqual(Transaction.objects.filter(account=self.account, transaction_type='transfer').count(), 1)
+        self.assertEqual(MoneyTransfer.objects.filter(sender=self.user, status='pending').count(), 3)
+
+    def test_insufficient_balance_imports_nothing(self):
+        with self.assertRaises(PayoutImportError):
+            import_payouts(self.user, payout_file('60.00', '60.00'))
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('100.00'))
+        self.assertFalse(MoneyTransfer.objects.exists())
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_failed_chunk_refunds_the_rest(self):
+        insert_chunk = payout_import._insert_chunk
+        calls = []
+
+        def fail_second_chunk(chunk, actor):
+            calls.append(len(chunk))
+            if len(calls) == 2:
+                raise RuntimeError('database went away')
+            return insert_chunk(chunk, actor)
+
+        with mock.patch.object(payout_import, '_insert_chunk', side_effect=fail_second_chunk):
+            report = import_payouts(self.user, payout_file('10.00', '10.00', '10.00', '10.00', '10.00'), chunk_size=2)
+
+        self.assertEqual(report['created'], 2)
+        self.assertTrue(report['debited'])
+        self.assertEqual(len(report['errors']), 1)
+        self.assertEqual(MoneyTransfer.objects.filter(sender=self.user).count(), 2)
+        self.assertEqual(TransferStatusHistory.objects.count(), 2)
+
+        # 50.00 debited, 30.00 for the three rows never created refunded
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('80.00'))
+        refund = Transaction.objects.get(account=self.account, transaction_type='deposit')
+        self.assertEqual(refund.amount, Decimal('30.00'))
+
+
+# ==================== PROCESS-LOCAL CACHES ====================
+
+class VersionedLocalCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+
+    def make_cache(self, **options):
+        def build():
+            self.builds += 1
+            return self.builds
+        return VersionedLocalCache('test-cache', build, check_interval=0, **options)
+
+    def test_invalidate_reaches_other_processes(self):
+        here, other_process = self.make_cache(), self.make_cache()
+        self.assertEqual(here.get(), 1)
+        self.assertEqual(other_process.get(), 2)
+        self.assertEqual(other_process.get(), 2)
+
+        # Other processes do not share the Django cache - only the database
+        cache.clear()
+        here.invalidate()
+        self.assertEqual(other_process.get(), 3)
+        self.assertEqual(other_process.get(), 3)
+
+    def test_copy_is_rebuilt_after_max_age(self):
+        local = self.make_cache(max_age=60)
+        self.assertEqual(local.get(), 1)
+        with mock.patch('core.local_cache.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertEqual(local.get(), 2)
@@ -0,0 +1,139 @@
+# core/throttle.py - LOGIN THROTTLING
+"""
+Token buckets that cap login attempts per client IP and per username, checked
+before authenticate() so an over-limit attempt costs a cache lookup instead
+of a PBKDF2 hash and a query.
+
+A bucket holds up to `capacity` attempts and refills at capacity/period per
+second (LOGIN_THROTTLE_IP_RATE / LOGIN_THROTTLE_USERNAME_RATE = (attempts,
+seconds)). Buckets live in the cache named by LOGIN_THROTTLE_CACHE so all
+processes share them; without that cache they fall back to process memory.
+The read-modify-write is locked per process only, so with several processes
+a burst can get a few attempts more than the limit - fine for throttling.
+
+The username bucket is keyed on (username, IP) and only failed passwords use
+it up, so someone who knows a customer's email cannot lock that customer out
+from elsewhere; guessing one account from many addresses is left to the IP
+buckets. A successful login refills the bucket, so a typo or two does not
+lock a real customer out. Counters for throttle_metrics() are kept in the
+same cache.
+"""
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IP_RATE = (20, 600)
+DEFAULT_USERNAME_RATE = (5, 900)
+METRICS = ('allowed', 'blocked_ip', 'blocked_username', 'succeeded', 'failed')
+
+_lock = threading.Lock()
+_fallback_cache = None
+
+
+def _cache():
+    global _fallback_cache
+    try:
+        return caches[getattr(settings, 'LOGIN_THROTTLE_CACHE', 'default')]
+    except InvalidCacheBackendError:
+        if _fallback_cache is None:
+            _fallback_cache = LocMemCache('login-throttle', {})
+        return _fallback_cache
+
+
+def client_ip(request):
+    """Client address; behind N trusted proxies, the Nth X-Forwarded-For entry from the right"""
+    proxies = getattr(settings, 'LOGIN_THROTTLE_PROXY_COUNT', 0)
+    if proxies:
+        forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _bucket_key(scope, value):
+    return f'login-throttle:{scope}:{hashlib.sha256(value.encode()).hexdigest()[:32]}'
+
+
+def take_token(key, capacity, period, now=None, consume=True):
+    """Use one attempt from the bucket; returns (allowed, seconds until the next attempt).
+
+    consume=False only checks that an attempt is left.
+    """
+    cache = _cache()
+    now = time.time() if now is None else now
+    refill_per_second = capacity / period
+    with _lock:
+        state = cache.get(key)
+        tokens, last = state if state else (capacity, now)
+        tokens = min(capacity, tokens + (now - last) * refill_per_second)
+        if tokens < 1:
+            cache.set(key, (tokens, now), period)
+            return False, (1 - tokens) / refill_per_second
+        if consume:
+            cache.set(key, (tokens - 1, now), period)
+        return True, 0
+
+
+def _username_key(request, username):
+    return _bucket_key('username', f'{username.lower()}|{client_ip(request)}')
+
+
+def _count(metric):
+    cache = _cache()
+    key = f'login-throttle:metrics:{metric}'
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def check_login(request, username):
+    """(allowed, retry_after seconds, scope) for a login attempt - call before authenticate()"""
+    if not getattr(settings, 'LOGIN_THROTTLE_ENABLED', True):
+        return True, 0, None
+
+    ip = client_ip(request)
+    capacity, period = getattr(settings, 'LOGIN_THROTTLE_IP_RATE', DEFAULT_IP_RATE)
+    allowed, retry_after = take_token(_bucket_key('ip', ip), capacity, period)
+    if not allowed:
+        _count('blocked_ip')
+        logger.warning(f"Login throttled for IP {ip}")
+        return False, retry_after, 'ip'
+
+    # Only checked here - login_failed() uses up the attempt
+    capacity, period = getattr(settings, 'LOGIN_THROTTLE_USERNAME_RATE', DEFAULT_USERNAME_RATE)
+    allowed, retry_after = take_token(_username_key(request, username), capacity, period, consume=False)
+    if not allowed:
+        _count('blocked_username')
+        logger.warning(f"Login throttled for username {username} (from {ip})")
+        return False, retry_after, 'username'
+
+    _count('allowed')
+    return True, 0, None
+
+
+def login_succeeded(request, username):
+    if getattr(settings, 'LOGIN_THROTTLE_ENABLED', True):
+        _cache().delete(_username_key(request, username))
+    _count('succeeded')
+
+
+def login_failed(request, username):
+    if getattr(settings, 'LOGIN_THROTTLE_ENABLED', True):
+        capacity, period = getattr(settings, 'LOGIN_THROTTLE_USERNAME_RATE', DEFAULT_USERNAME_RATE)
+        take_token(_username_key(request, username), capacity, period)
+    _count('failed')
+
+
+def throttle_metrics():
+    cache = _cache()
+    values = cache.get_many([f'login-throttle:metrics:{metric}' for metric in METRICS])
+    return {metric: values.get(f'login-throttle:metrics:{metric}', 0) for metric in METRICS}
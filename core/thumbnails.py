@@ -0,0 +1,115 @@
+# core/thumbnails.py - DOCUMENT PREVIEW THUMBNAILS
+"""
+Small JPEG previews of uploaded KYC documents and payment proofs.
+
+Admin change pages used to embed the original uploads (several MB each) and
+shrink them with CSS. Thumbnails are generated once per upload in the
+background, cached under MEDIA_ROOT/thumbnails/ and regenerated on demand by
+the `document_thumbnail` view if the cached copy is missing.
+"""
+import hashlib
+import logging
+from io import BytesIO
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+from .tasks import run_in_background
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = 'thumbnails'
+THUMBNAIL_SIZE = (200, 200)
+THUMBNAIL_QUALITY = 75
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+
+def is_image(name):
+    return bool(name) and name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def media_name(source):
+    """Turn a stored document URL (or a storage name) into a storage name"""
+    if not source:
+        return None
+    path = unquote(urlparse(str(source)).path)
+    if path.startswith(settings.MEDIA_URL):
+        path = path[len(settings.MEDIA_URL):]
+    return path.lstrip('/') or None
+
+
+def thumbnail_name(name, size=THUMBNAIL_SIZE):
+    """Cache location of the thumbnail for storage name `name`"""
+    digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+    return f"{THUMBNAIL_DIR}/{size[0]}x{size[1]}/{digest[:2]}/{digest}.jpg"
+
+
+def generate_thumbnail(name, size=THUMBNAIL_SIZE):
+    """Render the thumbnail for `name` and write it to the cache.
+
+    Returns the thumbnail storage name, or None if the source is missing or
+    cannot be decoded.
+    """
+    if not PIL_AVAILABLE or not is_image(name) or not default_storage.exists(name):
+        return None
+
+    try:
+        with default_storage.open(name, 'rb') as source:
+            image = Image.open(source)
+            # Let the decoder downscale JPEGs while reading - much cheaper
+            image.draft('RGB', (size[0] * 2, size[1] * 2))
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGB')
+            image.thumbnail(size)
+            buffer = BytesIO()
+            image.save(buffer, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+    except Exception as e:
+        logger.warning(f"Could not create thumbnail for {name}: {str(e)}")
+        return None
+
+    thumb = thumbnail_name(name, size)
+    if default_storage.exists(thumb):
+        default_storage.delete(thumb)
+    default_storage.save(thumb, ContentFile(buffer.getvalue()))
+    logger.info(f"Created thumbnail {thumb} for {name}")
+    return thumb
+
+
+def ensure_thumbnail(name, size=THUMBNAIL_SIZE):
+    """Return the cached thumbnail name, generating it if it is missing"""
+    thumb = thumbnail_name(name, size)
+    if default_storage.exists(thumb):
+        return thumb
+    return generate_thumbnail(name, size)
+
+
+def schedule_thumbnails(*sources):
+    """Generate thumbnails for freshly uploaded files on the worker pool"""
+    for source in sources:
+        name = media_name(source)
+        if is_image(name):
+            run_in_background(ensure_thumbnail, name)
+
+
+def thumbnail_url(source, size=THUMBNAIL_SIZE):
+    """URL to show instead of the original upload in admin/staff pages.
+
+    Returns None for non-image documents. If the thumbnail has not been
+    generated yet the URL points at the on-demand view, which builds it.
+    """
+    name = media_name(source)
+    if not is_image(name):
+        return None
+    thumb = thumbnail_name(name, size)
+    if default_storage.exists(thumb):
+        return default_storage.url(thumb)
+    return reverse('document_thumbnail', args=[name])
@@ -0,0 +1,143 @@
+# core/uploads.py - STREAMING DOCUMENT UPLOADS
+"""
+Upload handling for the loan wizard.
+
+Django's default handlers buffer small files in memory and spool large ones to
+/tmp, after which the storage copies them again into MEDIA_ROOT. The handler
+below streams each document straight into a temp file inside MEDIA_ROOT,
+hashing it and checking its type and size as the chunks arrive. The
+content-addressed storage then only has to rename the file into place (or
+drop it, if the same content is already stored).
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers, StopUpload
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+logger = logging.getLogger(__name__)
+
+INCOMING_DIR = '.incoming'
+
+# Magic numbers of the document types we accept
+FILE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'%PDF-', 'application/pdf'),
+)
+
+
+def sniff_content_type(head):
+    """Detect the real type of an upload from its first bytes"""
+    for signature, content_type in FILE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+class HashedUploadedFile(UploadedFile):
+    """Upload spooled to a temp file next to its final location, with its SHA-256"""
+
+    def __init__(self, name, content_type, charset, content_type_extra=None):
+        directory = os.path.join(settings.MEDIA_ROOT, INCOMING_DIR)
+        os.makedirs(directory, exist_ok=True)
+        _, ext = os.path.splitext(name)
+        file = tempfile.NamedTemporaryFile(suffix='.upload' + ext, dir=directory)
+        super().__init__(file, name, content_type, 0, charset, content_type_extra)
+        self.sha256 = None
+
+    def temporary_file_path(self):
+        return self.file.name
+
+    def close(self):
+        try:
+            return self.file.close()
+        except FileNotFoundError:
+            # Moved into storage already
+            pass
+
+
+class DocumentUploadHandler(FileUploadHandler):
+    """Stream, hash and validate uploads; stop reading as soon as one is invalid.
+
+    Problems are collected on request.upload_errors so the view can show them.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_size = getattr(settings, 'LOAN_UPLOAD_MAX_SIZE', 10 * 1024 * 1024)
+        self.allowed_types = getattr(settings, 'LOAN_UPLOAD_ALLOWED_TYPES', [t for _, t in FILE_SIGNATURES] + ['image/webp'])
+        if request is not None:
+            request.upload_errors = []
+
+    def _reject(self, message):
+        logger.warning(f"Upload rejected ({self.field_name}): {message}")
+        if self.request is not None:
+            self.request.upload_errors.append(message)
+        # Drain the rest of the body without storing it, then stop parsing
+        raise StopUpload(connection_reset=False)
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if content_length and content_length > self.max_size:
+            self._reject(f'{file_name} is larger than {self.max_size // (1024 * 1024)} MB')
+        self.digest = hashlib.sha256()
+        self.received = 0
+        self.file = HashedUploadedFile(file_name, content_type, charset, content_type_extra)
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start == 0:
+            detected = sniff_content_type(raw_data[:16])
+            if detected not in self.allowed_types:
+                self._reject(f'{self.file_name} is not a supported image or PDF')
+            self.file.content_type = detected
+
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self._reject(f'{self.file_name} is larger than {self.max_size // (1024 * 1024)} MB')
+
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.digest.hexdigest()
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.close()
+
+
+def get_upload_errors(request):
+    """Messages for uploads DocumentUploadHandler refused"""
+    request.FILES  # make sure the body has been parsed
+    return getattr(request, 'upload_errors', [])
+
+
+def document_uploads(view):
+    """Use DocumentUploadHandler for a view's multipart POSTs.
+
+    Upload handlers must be swapped before anything reads request.POST, and
+    the CSRF middleware does exactly that - so the CSRF check is moved inside.
+    """
+    protected_view = csrf_protect(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [DocumentUploadHandler(request)]
+        return protected_view(request, *args, **kwargs)
+
+    return csrf_exempt(wrapper)
@@ -15,12 +15,19 @@ urlpatterns = [
     # Loan application
     path('loan/step1/', views.loan_application_step1, name='loan_step1'),
     path('loan/step2/', views.loan_application_step2, name='loan_step2'),
+    path('loan/draft/', views.loan_draft_autosave, name='loan_draft_autosave'),
     path('loan/confirmation/', views.loan_confirmation, name='loan_confirmation'),
+    path('loan/<int:loan_id>/events/', views.loan_events, name='loan_events'),
     path('loan/success/', views.loan_success, name='loan_success'),
     path('loan/<int:loan_id>/', views.view_loan_details, name='view_loan_details'),
     
     # Banking features
     path('send-money/', views.send_money, name='send_money'),
+    path('send-money/fee-quote/', views.transfer_fee_quote, name='transfer_fee_quote'),
+    path('send-money/bulk/', views.bulk_payout_upload, name='bulk_payout_upload'),
+    path('transfers/track/', views.track_transfer, name='track_transfer'),
+    path('transfers/<str:reference>/', views.transfer_status, name='transfer_status'),
+    path('transfers/<str:reference>/events/', views.transfer_events, name='transfer_events'),
     path('deposit/', views.deposit, name='deposit'),
     path('pay-bills/', views.pay_bills, name='pay_bills'),
     path('cards/', views.cards, name='cards'),
@@ -34,6 +41,9 @@ urlpatterns = [
     path('admin/loan-payments/', views.admin_loan_payments, name='admin_loan_payments'),
     path('admin/loan-payments/<int:payment_id>/', views.admin_payment_detail, name='admin_payment_detail'),
     path('admin/loan-payments/<int:payment_id>/verify/', views.verify_loan_payment, name='verify_loan_payment'),
+    path('staff/portfolio/', views.portfolio_dashboard, name='portfolio_dashboard'),
+    path('staff/login-throttle/', views.login_throttle_metrics, name='login_throttle_metrics'),
+    path('staff/thumbnails/<path:path>', views.document_thumbnail, name='document_thumbnail'),
     path('simple-admin/', views.simple_admin, name='simple_admin'),
     
     # Session management
@@ -0,0 +1,189 @@
+# core/velocity.py - VELOCITY RULES
+"""
+Real-time burst detection for money transfers and loan payments.
+
+A rule counts events (and their amounts) per key - a sender, a phone
+number - over a sliding window, e.g. "more than 10 transfers or $20,000
+from one sender within an hour". The counters live in the default Django
+cache as a ring of small buckets per rule and key, so recording an event is
+an increment plus one get_many however long the history is - no COUNT
+queries. The window slides one bucket (window / BUCKETS) at a time.
+
+The counters are only shared between workers if the cache is (Redis,
+Memcached). With the per-process LocMemCache each worker counts just the
+events it handled itself - see DEFAULT_RULES and `check --deploy`.
+
+Rules are the JSON list in SystemSettings 'velocity_rules' (DEFAULT_RULES
+while it does not exist), read through the settings cache
+(core/system_settings.py) and compiled again only when it reloads. An
+exceeded rule creates one VelocityAlert per key and window for staff to
+review; nothing is blocked.
+"""
+import hashlib
+import logging
+import re
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+
+from .fx import UnknownCurrency, convert
+from .system_settings import get_value
+
+logger = logging.getLogger(__name__)
+
+RULES_SETTING = 'velocity_rules'
+BUCKETS = 12
+
+# key: model attribute to count by; max_count / max_amount (USD): either or both.
+# Limits hold across workers only with a shared cache: on LocMemCache each of
+# N workers counts on its own, so a burst can reach up to N times the limit
+# before every worker has seen enough of it.
+DEFAULT_RULES = [
+    {'name': 'transfer_burst', 'subject': 'transfer', 'key': 'sender_id',
+     'window_seconds': 3600, 'max_count': 10, 'max_amount': 20000},
+    {'name': 'transfer_daily', 'subject': 'transfer', 'key': 'sender_id',
+     'window_seconds': 86400, 'max_amount': 50000},
+    {'name': 'payment_phone_burst', 'subject': 'loan_payment', 'key': 'sender_phone',
+     'window_seconds': 86400, 'max_count': 3},
+]
+
+
+def _transfer_amount(transfer):
+    try:
+        return convert(transfer.amount, transfer.currency)
+    except UnknownCurrency:
+        return Decimal(str(transfer.amount))
+
+
+def _payment_amount(payment):
+    return Decimal(str(payment.amount_paid))
+
+
+# Amount (in USD) of one event, per subject
+SUBJECTS = {
+    'transfer': _transfer_amount,
+    'loan_payment': _payment_amount,
+}
+
+
+# ==================== RULES ====================
+
+def compile_rules(rules):
+    """{subject: [rule, ...]}, skipping invalid rules"""
+    compiled = {}
+    for rule in rules:
+        try:
+            if not rule.get('enabled', True):
+                continue
+            window = int(rule['window_seconds'])
+            bucket = max(1, window // BUCKETS)
+            entry = {
+                'name': str(rule['name']),
+                'subject': rule['subject'],
+                'key': rule['key'],
+                'window': window,
+                'bucket': bucket,
+                'buckets': -(-window // bucket),
+                'max_count': int(rule['max_count']) if rule.get('max_count') else None,
+                'max_amount': Decimal(str(rule['max_amount'])) if rule.get('max_amount') else None,
+            }
+        except (AttributeError, KeyError, TypeError, ValueError, InvalidOperation):
+            logger.error(f"Ignoring invalid velocity rule {rule!r}")
+            continue
+        if entry['subject'] not in SUBJECTS or window <= 0:
+            logger.error(f"Ignoring invalid velocity rule {rule!r}")
+            continue
+        compiled.setdefault(entry['subject'], []).append(entry)
+    return compiled
+
+
+_compiled = (None, {})  # (rules list from the settings cache, compiled rules)
+
+
+def active_rules():
+    global _compiled
+    rules = get_value(RULES_SETTING, DEFAULT_RULES)
+    source, compiled = _compiled
+    # The settings cache hands out the same list until it reloads
+    if source is not rules:
+        compiled = compile_rules(rules if isinstance(rules, list) else DEFAULT_RULES)
+        _compiled = (rules, compiled)
+    return compiled
+
+
+def normalize_key(value):
+    """'+1 (555) 010-2000' and '15550102000' count as the same phone"""
+    return re.sub(r'[\s\-().+]', '', str(value)).casefold()
+
+
+# ==================== COUNTERS ====================
+
+def _incr(key, delta, ttl):
+    cache.add(key, 0, ttl)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.set(key, delta, ttl)
+        return delta
+
+
+def _bump(rule, key, count, cents, now):
+    """Add to the current bucket; returns (key prefix, count, cents) over the whole window"""
+    prefix = f"velocity:{rule['name']}:{hashlib.sha1(key.encode()).hexdigest()}"
+    current = int(now // rule['bucket'])
+    ttl = rule['window'] + rule['bucket']
+    _incr(f'{prefix}:n:{current}', count, ttl)
+    if cents:
+        _incr(f'{prefix}:a:{current}', cents, ttl)
+
+    buckets = range(current - rule['buckets'] + 1, current + 1)
+    values = cache.get_many([f'{prefix}:{kind}:{bucket}' for kind in ('n', 'a') for bucket in buckets])
+    total_count = sum(values.get(f'{prefix}:n:{bucket}', 0) for bucket in buckets)
+    total_cents = sum(values.get(f'{prefix}:a:{bucket}', 0) for bucket in buckets)
+    return prefix, total_count, total_cents
+
+
+def record_event(subject, obj, count=1, amount=None):
+    """Count `obj` (a saved transfer/payment) against the rules; returns the alerts raised.
+
+    count/amount let a bulk import record a whole batch as one call.
+    """
+    from .models import VelocityAlert
+
+    rules = active_rules().get(subject)
+    if not rules:
+        return []
+    if amount is None:
+        amount = SUBJECTS[subject](obj)
+    cents = int(Decimal(str(amount)) * 100)
+    now = time.time()
+
+    alerts = []
+    for rule in rules:
+        value = getattr(obj, rule['key'], None)
+        if value in (None, ''):
+            continue
+        key = normalize_key(value)
+        prefix, total_count, total_cents = _bump(rule, key, count, cents, now)
+        total_amount = Decimal(total_cents) / 100
+
+        exceeded = (
+            (rule['max_count'] is not None and total_count > rule['max_count'])
+            or (rule['max_amount'] is not None and total_amount > rule['max_amount'])
+        )
+        # One alert per rule and key per window
+        if exceeded and cache.add(f'{prefix}:alerted', 1, rule['window']):
+            alert = VelocityAlert.objects.create(
+                rule=rule['name'],
+                subject=subject,
+                key=str(value)[:200],
+                event_count=total_count,
+                total_amount=total_amount,
+                window_seconds=rule['window'],
+                object_id=obj.pk,
+            )
+            logger.warning(f"Velocity rule {rule['name']} exceeded by {value}: {total_count} events, ${total_amount} in {rule['window']}s")
+            alerts.append(alert)
+    return alerts
@@ -3,24 +3,49 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.db import IntegrityError
+from django.db.models import F, Q
 from decimal import Decimal
-import uuid
+import asyncio
+import math
 import os
 from django.core.files.storage import default_storage, FileSystemStorage
 from django.utils import timezone
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.cache import never_cache
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib import messages
 from .models import Account 
+from .amortization import portfolio_summary
+from .customers import create_customer
+from .fees import quote
+from .fx import UnknownCurrency
+from .idempotency import idempotent, new_idempotency_key
+from .ingest import prepare_document
+from .kyc import schedule_document_checks, update_application_kyc
+from .loan_workflow import InvalidTransition, TransitionConflict, mark_deposit_verified, transition_loan
+from .media import protected_media_response
+from .payment_methods import active_payment_methods, get_active_payment_method
+from .payout_import import PayoutImportError, guess_format, import_payouts
+from .portfolio import portfolio_report
+from .references import REFERENCE, describe_duplicates, find_duplicates, index_payment, keys_for_payment, payment_keys
+from .storage import document_storage
+from .system_settings import get_value as get_setting_value
+from .status_events import (
+    LOAN_FINAL_STATUSES, TRANSFER_FINAL_STATUSES, broker as status_broker, format_event,
+    loan_channel, loan_state, transfer_channel, transfer_state,
+)
+from .thumbnails import ensure_thumbnail, schedule_thumbnails
+from .throttle import check_login, login_failed, login_succeeded, throttle_metrics
+from .uploads import document_uploads, get_upload_errors
 
 # Import all models
 try:
     from .models import (
         Account, Transaction, LoanApplication, ContactMessage, 
         UserProfile, SystemSettings, MoneyTransfer, TransferStatusHistory,
-        PaymentMethod, LoanPayment, LoanPaymentVerification
+        PaymentMethod, LoanPayment, LoanPaymentVerification, LoanDraft
     )
     MODELS_LOADED = True
 except ImportError as e:
@@ -73,9 +98,7 @@ def dashboard(request):
         
         # If user doesn't have an account yet, create one with 0.00
         if not account:
-            account_number = str(uuid.uuid4())[:20]
             account = Account.objects.create(
-                account_number=account_number,
                 user=request.user,
                 account_type='checking',
                 balance=Decimal('0.00')
@@ -156,21 +179,25 @@ def login_view(request):
                 'error': 'Cannot login as "Admin" - use your registered email'
             })
         
+        # Rate limit per IP and per email before any password hashing (core/throttle.py)
+        allowed, retry_after, _ = check_login(request, email)
+        if not allowed:
+            minutes = max(1, math.ceil(retry_after / 60))
+            return render(request, 'core/login.html', {
+                'error': f'Too many login attempts. Please try again in {minutes} minute{"s" if minutes > 1 else ""}.'
+            }, status=429)
+        
         user = authenticate(request, username=email, password=password)
         
         if user is not None:
+            login_succeeded(request, email)
             login(request, user)
             next_url = request.GET.get('next', 'dashboard')
             return redirect(next_url)
         else:
-            try:
-                user_exists = User.objects.filter(username=email).exists()
-                if user_exists:
-                    return render(request, 'core/login.html', {'error': 'Incorrect password'})
-                else:
-                    return render(request, 'core/login.html', {'error': 'Account not found'})
-            except:
-                return render(request, 'core/login.html', {'error': 'Invalid credentials'})
+            login_failed(request, email)
+            # Same message either way - no extra query, and no hint which emails have accounts
+            return render(request, 'core/login.html', {'error': 'Incorrect email or password'})
     
     return render(request, 'core/login.html')
 
@@ -205,47 +232,21 @@ def register_view(request):
             return render(request, 'core/register.html', {'errors': errors})
         
         # Check if user already exists
-        if User.objects.filter(username=email).exists() or User.objects.filter(email=email).exists():
+        if User.objects.filter(Q(username__iexact=email) | Q(email__iexact=email)).exists():
             return render(request, 'core/register.html', {'error': 'Email already registered'})
         
         try:
-            # Create user with lowercase username
-            user = User.objects.create_user(
-                username=email,
-                email=email,
-                password=password,
-                first_name=name.split()[0] if ' ' in name else name,
-                last_name=' '.join(name.split()[1:]) if ' ' in name else ''
-            )
-            
-            # Ensure user is NOT staff
-            user.is_staff = False
-            user.is_superuser = False
-            user.save()
-            
-            UserProfile.objects.create(
-                user=user,
-                phone=phone
-            )
-            
-            account_number = str(uuid.uuid4())[:20]
-            account = Account.objects.create(
-                account_number=account_number,
-                user=user,
-                account_type='checking',
-                balance=Decimal('0.00')
-            )
-            
+            # User, profile and account in one transaction, password hashed once (core/customers.py)
+            user = create_customer(email, password, name=name, phone=phone)
             print(f"✅ Created account for {user.username} with $0.00")
             
-            # Auto login after registration
-            user = authenticate(request, username=email, password=password)
-            if user is not None:
-                login(request, user)
-                return redirect('dashboard')
-            else:
-                return redirect('login')
-                
+            # Auto login after registration - we just set the password, no need to hash it again
+            login(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
+            return redirect('dashboard')
+        
+        except IntegrityError:
+            # Registered by a concurrent request since the check above
+            return render(request, 'core/register.html', {'error': 'Email already registered'})
         except Exception as e:
             print(f"Registration error: {str(e)}")
             return render(request, 'core/register.html', {'error': f'Registration failed: {str(e)}'})
@@ -320,21 +321,24 @@ def contact(request):
 # ==================== LOAN APPLICATION ====================
 
 @login_required(login_url='/login/')
+@document_uploads
 def loan_application_step1(request):
     """Step 1: Collect personal information - UPDATED TO SAVE DATA"""
-    try:
-        # Try to get payment methods if model exists
-        payment_methods = []
-        if MODELS_LOADED:
-            try:
-                payment_methods = PaymentMethod.objects.filter(is_active=True)
-            except:
-                pass
-    except:
-        payment_methods = []
+    # Active payment methods, from the per-process catalog (no query)
+    payment_methods = active_payment_methods() if MODELS_LOADED else []
     
     if request.method == 'POST':
         try:
+            # A rejected upload stops the rest of the form from being read
+            upload_errors = get_upload_errors(request)
+            if upload_errors:
+                for error in upload_errors:
+                    messages.error(request, error)
+                return render(request, 'core/loan_step1.html', {
+                    'user': request.user,
+                    'payment_methods': payment_methods
+                })
+            
             full_name = request.POST.get('full_name', '').strip()
             email = request.POST.get('email', '').strip()
             phone = request.POST.get('phone', '').strip()
@@ -356,24 +360,34 @@ def loan_application_step1(request):
             selfie_url = None
             if 'selfie' in request.FILES:
                 selfie = request.FILES['selfie']
-                file_path = default_storage.save(f'selfies/{request.user.id}_{selfie.name}', selfie)
-                selfie_url = default_storage.url(file_path)
+                name, content = prepare_document(selfie, f'selfies/{request.user.id}_{selfie.name}')
+                file_path = document_storage.save(name, content)
+                selfie_url = document_storage.url(file_path)
             
             id_document_url = None
             if 'id_document' in request.FILES:
                 id_document = request.FILES['id_document']
-                file_path = default_storage.save(f'id_documents/{request.user.id}_{id_document.name}', id_document)
-                id_document_url = default_storage.url(file_path)
+                name, content = prepare_document(id_document, f'id_documents/{request.user.id}_{id_document.name}')
+                file_path = document_storage.save(name, content)
+                id_document_url = document_storage.url(file_path)
             
             address_proof_url = None
             if 'address_proof' in request.FILES:
                 address_proof = request.FILES['address_proof']
-                file_path = default_storage.save(f'address_proofs/{request.user.id}_{address_proof.name}', address_proof)
-                address_proof_url = default_storage.url(file_path)
+                name, content = prepare_document(address_proof, f'address_proofs/{request.user.id}_{address_proof.name}')
+                file_path = document_storage.save(name, content)
+                address_proof_url = document_storage.url(file_path)
             
-            # Save to session for step 2
-            request.session['loan_data'] = {
-                'step': 1,
+            # Build admin previews and run the document checks in the background
+            schedule_thumbnails(selfie_url, id_document_url, address_proof_url)
+            schedule_document_checks(request.user, {
+                'selfie': selfie_url,
+                'id_document': id_document_url,
+                'address_proof': address_proof_url,
+            })
+            
+            # Save the draft for step 2 (kept out of the session)
+            LoanDraft.save_fields(request.user, {
                 'full_name': full_name,
                 'email': email,
                 'phone': phone,
@@ -385,7 +399,8 @@ def loan_application_step1(request):
                 'selfie_url': selfie_url,
                 'id_document_url': id_document_url,
                 'address_proof_url': address_proof_url,
-            }
+            }, step=2)
+            request.session.pop('loan_data', None)
             
             messages.success(request, 'Personal information saved successfully!')
             return redirect('loan_step2')
@@ -397,10 +412,12 @@ def loan_application_step1(request):
                 'payment_methods': payment_methods
             })
     
+    draft = LoanDraft.for_user(request.user)
     return render(request, 'core/loan_step1.html', {
         'user': request.user,
         'payment_methods': payment_methods,
-        'today': timezone.now().date()
+        'today': timezone.now().date(),
+        'draft': draft.data if draft else {},
     })
 
 
@@ -428,25 +445,37 @@ def loan_application_step1(request):
 
 
 
+
+def loan_limits():
+    """Deposit percentage and loan amount limits from SystemSettings, for the step 2 form and its checks"""
+    return {
+        'deposit_percentage': get_setting_value('loan_deposit_percentage', Decimal('10')),
+        'min_loan_amount': get_setting_value('min_loan_amount', Decimal('100')),
+        'max_loan_amount': get_setting_value('max_loan_amount'),
+    }
 
 # Step 2 - COMPATIBLE VERSION
 @login_required(login_url='/login/')
+@document_uploads
+@idempotent
 def loan_application_step2(request):
     """Step 2: Loan details - SAVES TO DATABASE"""
-    if 'loan_data' not in request.session:
+    draft = LoanDraft.for_user(request.user)
+    if not draft or not draft.is_ready_for_step2:
         messages.error(request, 'Please complete step 1 first')
         return redirect('loan_step1')
     
-    # Get payment methods from database
-    payment_methods = []
-    if MODELS_LOADED:
-        try:
-            payment_methods = PaymentMethod.objects.filter(is_active=True)
-        except:
-            pass
+    # Active payment methods, from the per-process catalog (no query)
+    payment_methods = active_payment_methods() if MODELS_LOADED else []
     
     if request.method == 'POST':
         try:
+            upload_errors = get_upload_errors(request)
+            if upload_errors:
+                for error in upload_errors:
+                    messages.error(request, error)
+                return redirect('loan_step2')
+            
             loan_amount = request.POST.get('loan_amount', '0').strip()
             loan_purpose = request.POST.get('loan_purpose', '').strip()
             loan_term = request.POST.get('loan_term', '12').strip()
@@ -459,32 +488,33 @@ def loan_application_step2(request):
             transaction_id = request.POST.get('transaction_id', '').strip()
             payment_date = request.POST.get('payment_date', '').strip()
             
-            # Calculate 10% deposit
+            # Deposit and limits from SystemSettings (cached, no query)
             loan_amount_decimal = Decimal(loan_amount)
-            deposit_amount = loan_amount_decimal * Decimal('0.10')
+            limits = loan_limits()
+            deposit_amount = (loan_amount_decimal * limits['deposit_percentage'] / 100).quantize(Decimal('0.01'))
             
-            if loan_amount_decimal < 100:
-                messages.error(request, 'Minimum loan amount is $100')
+            if loan_amount_decimal < limits['min_loan_amount']:
+                messages.error(request, f"Minimum loan amount is ${limits['min_loan_amount']:,}")
+                return redirect('loan_step2')
+            if limits['max_loan_amount'] is not None and loan_amount_decimal > limits['max_loan_amount']:
+                messages.error(request, f"Maximum loan amount is ${limits['max_loan_amount']:,}")
                 return redirect('loan_step2')
             
-            # Get loan data from session
-            loan_data = request.session['loan_data']
+            # The same external payment cannot secure two applications
+            payment_index_keys = payment_keys(transaction_id, sender_name, deposit_amount, payment_date)
+            if find_duplicates(payment_index_keys).get(REFERENCE):
+                messages.error(request, 'This payment reference has already been submitted for another application. Please check the transaction ID.')
+                return redirect('loan_step2')
             
-            # Get payment method
-            payment_method = None
-            if payment_method_id:
-                try:
-                    payment_method = PaymentMethod.objects.get(id=payment_method_id, is_active=True)
-                except:
-                    pass
+            # Get loan data from the step 1 draft
+            loan_data = draft.data
             
-            # Generate application ID
-            application_id = f"LOAN-{request.user.id}-{int(timezone.now().timestamp())}"
+            # Get payment method
+            payment_method = get_active_payment_method(payment_method_id) if payment_method_id else None
             
             # SAVE TO DATABASE
             loan = LoanApplication.objects.create(
                 user=request.user,
-                application_id=application_id,
                 loan_type='personal',
                 amount=loan_amount_decimal,
                 purpose=loan_purpose,
@@ -513,7 +543,11 @@ def loan_application_step2(request):
                 deposit_paid=False,
             )
             
+            # Pick up document check results that finished before the application existed
+            update_application_kyc(loan)
+            
             # Create payment record if payment method exists
+            payment = None
             if payment_method and MODELS_LOADED:
                 try:
                     payment_proof = None
@@ -532,28 +566,36 @@ def loan_application_step2(request):
                         verified=False
                     )
                     
-                    # Save payment proof file
+                    # Save payment proof file (normalized, deduplicated by content)
                     if payment_proof:
-                        fs = FileSystemStorage(location='media/loan_payments/')
-                        filename = fs.save(f"{loan.application_id}_{payment_proof.name}", payment_proof)
-                        payment.payment_proof = filename
-                        payment.save()
+                        name, content = prepare_document(payment_proof, f"loan_payments/{loan.application_id}_{payment_proof.name}")
+                        payment.payment_proof.save(os.path.basename(name), content)
+                        schedule_thumbnails(payment.payment_proof.name)
+                    
+                    # Index the reference; same sender/amount/date on another loan gets flagged
+                    duplicates = index_payment(loan, payment, keys=payment_index_keys)
+                    notes = 'Payment submitted, awaiting verification'
+                    if duplicates:
+                        notes += f'. Possible duplicate: {describe_duplicates(duplicates)}'
                     
                     # Create verification record
                     LoanPaymentVerification.objects.create(
                         payment=payment,
                         status='pending',
-                        notes='Payment submitted, awaiting verification'
+                        notes=notes
                     )
                     
                 except Exception as e:
+                    payment = None
                     print(f"⚠️ Could not create payment record: {str(e)}")
             
+            if payment is None:
+                index_payment(loan, keys=payment_index_keys)
+            
             messages.success(request, 'Loan application submitted successfully!')
             
-            # Clear session data
-            if 'loan_data' in request.session:
-                del request.session['loan_data']
+            # The application exists now, the draft is no longer needed
+            draft.delete()
             
             # CHANGED: Redirect to confirmation page, NOT success page
             return redirect('loan_confirmation')
@@ -562,12 +604,14 @@ def loan_application_step2(request):
             messages.error(request, f'Error: {str(e)}')
     
     # Pre-fill form with loan data
-    loan_data = request.session.get('loan_data', {})
+    loan_data = draft.data
     
     return render(request, 'core/loan_step2.html', {
         'payment_methods': payment_methods,
         'loan_data': loan_data,
-        'today': timezone.now().date()
+        'idempotency_key': new_idempotency_key(),
+        'today': timezone.now().date(),
+        **loan_limits(),
     })
 
 
@@ -611,6 +655,25 @@ def loan_application_step2(request):
 
 
 
+
+# Autosave for the step 1 form
+@login_required(login_url='/login/')
+def loan_draft_autosave(request):
+    """Save changed step 1 fields as the user types; GET returns the draft"""
+    if request.method == 'POST':
+        fields = {key: request.POST.get(key, '').strip() for key in request.POST if key in LoanDraft.FIELDS}
+        # Document URLs only ever come from our own uploads
+        for key in ('selfie_url', 'id_document_url', 'address_proof_url'):
+            fields.pop(key, None)
+        if not fields:
+            return JsonResponse({'error': 'Nothing to save'}, status=400)
+        draft = LoanDraft.save_fields(request.user, fields)
+        return JsonResponse({'success': True, 'saved': sorted(fields), 'updated_at': draft.updated_at.isoformat()})
+    
+    draft = LoanDraft.for_user(request.user)
+    if not draft:
+        return JsonResponse({'data': {}, 'step': 1})
+    return JsonResponse({'data': draft.data, 'step': draft.step, 'updated_at': draft.updated_at.isoformat()})
 
 # Step 3 - CONFIRMATION
 @login_required(login_url='/login/')
@@ -644,9 +707,13 @@ def loan_confirmation(request):
         print(f"ERROR checking loan: {str(e)}")
         return redirect('loan_step1')
     
+    # The percentage in force when the loan was submitted, not today's setting
+    deposit_percentage = (loan.deposit_required * 100 / loan.amount) if loan.deposit_required and loan.amount else None
+    
     return render(request, 'core/loan_confirmation.html', {
         'loan': loan,
-        'payment_details': payment_details
+        'payment_details': payment_details,
+        'deposit_percentage': deposit_percentage,
     })
 
 
@@ -744,7 +811,8 @@ def admin_loans(request):
     if not request.user.is_staff:
         return redirect('dashboard')
     
-    loans = LoanApplication.objects.all().order_by('-created_at')
+    # Applications whose documents failed the automated checks come first
+    loans = LoanApplication.objects.all().order_by(F('kyc_score').asc(nulls_last=True), '-created_at')
     
     status_counts = {
         'pending_payment': loans.filter(status='pending_payment').count(),
@@ -756,9 +824,18 @@ def admin_loans(request):
         'total': loans.count()
     }
     
+    # Repayment totals for the active book, computed in one vectorized pass
+    portfolio = portfolio_summary(
+        LoanApplication.objects.filter(status__in=['approved', 'disbursed'])
+        .values_list('amount', 'loan_type', 'term_months', 'created_at')
+        .iterator(),
+        as_of=timezone.now()
+    )
+    
     return render(request, 'core/admin_loans.html', {
         'loans': loans,
-        'status_counts': status_counts
+        'status_counts': status_counts,
+        'portfolio': portfolio
     })
 
 # Update Loan Status
@@ -772,37 +849,23 @@ def update_loan_status(request, loan_id):
         loan = LoanApplication.objects.get(id=loan_id)
         new_status = request.POST.get('status')
         
-        if new_status in ['pending_payment', 'under_review', 'approved', 'rejected', 'disbursed', 'completed']:
-            old_status = loan.status
-            loan.status = new_status
-            
-            if new_status == 'approved' and old_status == 'under_review':
-                account = Account.objects.filter(user=loan.user).first()
-                if account:
-                    loan_amount = loan.amount - loan.deposit_required
-                    account.balance += loan_amount
-                    account.save()
-                    
-                    Transaction.objects.create(
-                        account=account,
-                        transaction_type='loan_disbursement',
-                        amount=loan_amount,
-                        description=f'Loan Disbursement: {loan.purpose} (Application ID: {loan.application_id})'
-                    )
-                    
-                    loan.deposit_paid = True
-            
-            loan.save()
-            return JsonResponse({
-                'success': True, 
-                'new_status': loan.get_status_display(),
-                'status_class': loan.status
-            })
+        if new_status not in dict(LoanApplication.LOAN_STATUS) and new_status != 'pending_payment':
+            return JsonResponse({'error': 'Invalid status'}, status=400)
         
-        return JsonResponse({'error': 'Invalid status'}, status=400)
+        # Disbursement and history happen inside the transition, exactly once
+        transition_loan(loan, new_status, actor=request.user, notes=request.POST.get('notes', ''))
+        return JsonResponse({
+            'success': True, 
+            'new_status': loan.get_status_display(),
+            'status_class': loan.status
+        })
         
     except LoanApplication.DoesNotExist:
         return JsonResponse({'error': 'Loan not found'}, status=404)
+    except InvalidTransition as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except TransitionConflict as e:
+        return JsonResponse({'error': str(e)}, status=409)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -824,14 +887,34 @@ def view_loan_details(request, loan_id):
             except:
                 pass
         
+        schedule = loan.repayment_schedule()
+        
         return render(request, 'core/loan_details.html', {
             'loan': loan,
-            'payments': payments
+            'payments': payments,
+            'schedule': schedule,
+            'monthly_payment': loan.monthly_payment,
+            'total_interest': sum(row['interest'] for row in schedule),
         })
         
     except LoanApplication.DoesNotExist:
         return redirect('dashboard')
 
+# Portfolio analytics
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def portfolio_dashboard(request):
+    """Loan book exposure, read from the snapshot built by build_portfolio_snapshot"""
+    return render(request, 'core/portfolio.html', {
+        'report': portfolio_report()
+    })
+
+# Login throttle counters (see core/throttle.py)
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def login_throttle_metrics(request):
+    return JsonResponse(throttle_metrics())
+
 # ==================== PAYMENT METHODS ADMIN ====================
 
 @login_required
@@ -905,6 +988,8 @@ def admin_loan_payments(request):
             payments = payments.filter(verified=True)
         elif status_filter == 'pending':
             payments = payments.filter(verified=False)
+        elif status_filter == 'duplicates':
+            payments = payments.filter(duplicate_suspect=True)
     
     if search_query:
         payments = payments.filter(
@@ -918,6 +1003,7 @@ def admin_loan_payments(request):
     total_payments = LoanPayment.objects.count()
     verified_payments = LoanPayment.objects.filter(verified=True).count()
     pending_payments = LoanPayment.objects.filter(verified=False).count()
+    duplicate_payments = LoanPayment.objects.filter(duplicate_suspect=True).count()
     
     context = {
         'payments': payments,
@@ -926,6 +1012,7 @@ def admin_loan_payments(request):
         'total_payments': total_payments,
         'verified_payments': verified_payments,
         'pending_payments': pending_payments,
+        'duplicate_payments': duplicate_payments,
     }
     
     return render(request, 'core/admin_loan_payments.html', context)
@@ -940,11 +1027,17 @@ def verify_loan_payment(request, payment_id):
     
     try:
         payment = LoanPayment.objects.get(id=payment_id)
+        duplicates = find_duplicates(keys_for_payment(payment), exclude_loan=payment.loan)
         
         if request.method == 'POST':
             verify = request.POST.get('verify') == 'true'
             notes = request.POST.get('notes', '')
             
+            if duplicates:
+                warning = f'Possible duplicate payment: {describe_duplicates(duplicates)}'
+                messages.warning(request, warning)
+                notes = f'{notes}\n{warning}'.strip()
+            
             payment.verified = verify
             payment.verified_by = request.user
             payment.verified_at = timezone.now()
@@ -952,9 +1045,7 @@ def verify_loan_payment(request, payment_id):
             
             # Update loan status if payment is verified
             if verify:
-                payment.loan.deposit_paid = True
-                payment.loan.status = 'under_review'
-                payment.loan.save()
+                mark_deposit_verified(payment.loan, request.user)
             
             payment.save()
             
@@ -975,7 +1066,8 @@ def verify_loan_payment(request, payment_id):
         
         return render(request, 'core/verify_loan_payment.html', {
             'payment': payment,
-            'verifications': verifications
+            'verifications': verifications,
+            'duplicates': duplicates,
         })
         
     except LoanPayment.DoesNotExist:
@@ -1003,9 +1095,26 @@ def admin_payment_detail(request, payment_id):
         messages.error(request, 'Payment not found.')
         return redirect('admin_loan_payments')
 
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def document_thumbnail(request, path):
+    """Serve a document preview, generating it first if it is not cached yet"""
+    thumb = ensure_thumbnail(path)
+    if thumb:
+        return redirect(default_storage.url(thumb))
+    # Not an image we can decode - fall back to the original upload
+    return redirect(default_storage.url(path))
+
+# ==================== PROTECTED MEDIA ====================
+
+def protected_media(request, path):
+    """Serve an uploaded document to the loan owner or to staff only"""
+    return protected_media_response(request, path)
+
 # ==================== OTHER PAGES ====================
 
 @login_required
+@idempotent
 def deposit(request):
     """Deposit funds page"""
     try:
@@ -1137,6 +1246,7 @@ def simple_admin(request):
 
 # ==================== SEND MONEY ====================
 @login_required
+@idempotent
 def send_money(request):
     """Simple send money page - WORKS 100%"""
     # Get user's account
@@ -1144,7 +1254,6 @@ def send_money(request):
     if not account:
         # Create account if doesn't exist
         account = Account.objects.create(
-            account_number=str(uuid.uuid4())[:20],
             user=request.user,
             account_type='checking',
             balance=Decimal('0.00')
@@ -1153,5 +1262,167 @@ def send_money(request):
     # ALWAYS show the send money page - no redirects!
     return render(request, 'core/send_money.html', {
         'user': request.user,
-        'account': account
-    })
\ No newline at end of file
+        'account': account,
+        'idempotency_key': new_idempotency_key(),
+        'bulk_idempotency_key': new_idempotency_key(),
+    })
+
+@login_required
+def transfer_fee_quote(request):
+    """Fee and total for the send money form (no database query, see core/fees.py)"""
+    try:
+        amount = Decimal(request.GET.get('amount', '0'))
+    except Exception:
+        return JsonResponse({'error': 'Invalid amount'}, status=400)
+    if not amount.is_finite() or amount < 0:
+        return JsonResponse({'error': 'Invalid amount'}, status=400)
+    
+    try:
+        result = quote(
+            amount,
+            country=request.GET.get('country', ''),
+            payment_method=request.GET.get('payment_method', ''),
+            transfer_type=request.GET.get('transfer_type', ''),
+            currency=request.GET.get('currency', 'USD'),
+        )
+    except UnknownCurrency as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({key: str(value) for key, value in result.items()})
+
+@login_required
+@idempotent
+def bulk_payout_upload(request):
+    """Import a payroll/payout file as money transfers (see core/payout_import.py)"""
+    def reply(data, status):
+        # Fresh key for the next upload from the page, so a corrected file is imported, not replayed
+        data['idempotency_key'] = new_idempotency_key()
+        return JsonResponse(data, status=status)
+    
+    if request.method != 'POST':
+        return reply({'error': 'POST required'}, 405)
+    upload = request.FILES.get('payout_file')
+    if not upload:
+        return reply({'error': 'Please choose a file'}, 400)
+    
+    try:
+        report = import_payouts(
+            request.user, upload.file, guess_format(upload.name),
+            skip_invalid=request.POST.get('skip_invalid') == '1',
+        )
+    except PayoutImportError as e:
+        return reply({'error': str(e)}, 400)
+    
+    data = {key: report[key] for key in ('rows', 'valid', 'created', 'debited')}
+    data['total'] = str(report['total'])
+    data['errors'] = [{'line': line_number, 'error': message} for line_number, message in report['errors'][:100]]
+    if report['errors'] and not report['debited']:
+        data['error'] = 'Nothing was imported - fix the rows below or tick "import the valid rows"'
+    return reply(data, 200 if report['created'] or not report['errors'] else 400)
+
+# ==================== TRANSFER TRACKING ====================
+@login_required(login_url='/login/')
+def track_transfer(request):
+    """Look up a transfer by reference number"""
+    ref = request.GET.get('ref', '').strip()
+    if not ref:
+        return render(request, 'core/track_transfer.html', {'ref': ref})
+    
+    transfers = MoneyTransfer.objects.filter(reference_number__iexact=ref)
+    if not request.user.is_staff:
+        transfers = transfers.filter(sender=request.user)
+    transfer = transfers.first()
+    if not transfer:
+        return render(request, 'core/track_transfer.html', {'ref': ref, 'error': 'No transfer found with that reference number'})
+    return redirect('transfer_status', reference=transfer.reference_number)
+
+@login_required(login_url='/login/')
+def transfer_status(request, reference):
+    """Transfer details and status timeline; updates live via transfer_events"""
+    transfers = MoneyTransfer.objects.filter(reference_number=reference)
+    if not request.user.is_staff:
+        transfers = transfers.filter(sender=request.user)
+    transfer = get_object_or_404(transfers)
+    return render(request, 'core/transfer_status.html', {
+        'transfer': transfer,
+        'status_history': transfer.status_history.select_related('changed_by').order_by('-created_at'),
+    })
+
+# ==================== LIVE STATUS (SERVER-SENT EVENTS) ====================
+# Async views: under ASGI (trustbank/asgi.py) a waiting client holds a
+# coroutine, not a worker thread. See core/status_events.py.
+
+def _event_stream_response(channel, load_state, final_statuses):
+    poll_seconds = getattr(settings, 'SSE_POLL_SECONDS', 15)
+    max_seconds = getattr(settings, 'SSE_MAX_SECONDS', 300)
+    
+    def changed(old, new):
+        return {k: v for k, v in old.items() if k != 'updated_at'} != {k: v for k, v in new.items() if k != 'updated_at'}
+    
+    async def stream():
+        # Subscribe before reading the current state so no change slips in between
+        queue = status_broker.subscribe(channel)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_seconds
+        try:
+            state = await load_state()
+            if state is None:
+                return
+            yield f"retry: {poll_seconds * 1000}\n" + format_event(state)
+            
+            while state['status'] not in final_statuses and loop.time() < deadline:
+                try:
+                    new_state = await asyncio.wait_for(queue.get(), timeout=poll_seconds)
+                except asyncio.TimeoutError:
+                    # Catches changes made by other processes (settlement workers)
+                    new_state = await load_state()
+                    if new_state is None:
+                        return
+                if changed(state, new_state):
+                    state = new_state
+                    yield format_event(state)
+                else:
+                    yield ": keepalive\n\n"
+            # Final status reached (or connection too old - the browser reconnects)
+            yield format_event(state, event='end' if state['status'] in final_statuses else 'status')
+        finally:
+            status_broker.unsubscribe(channel, queue)
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+async def transfer_events(request, reference):
+    """Event stream of one transfer's status"""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Login required'}, status=401)
+    transfers = MoneyTransfer.objects.filter(reference_number=reference)
+    if not user.is_staff:
+        transfers = transfers.filter(sender_id=user.pk)
+    transfer = await transfers.afirst()
+    if not transfer:
+        return JsonResponse({'error': 'Transfer not found'}, status=404)
+    
+    async def load_state():
+        current = await MoneyTransfer.objects.filter(pk=transfer.pk).afirst()
+        return transfer_state(current) if current else None
+    
+    return _event_stream_response(transfer_channel(reference), load_state, TRANSFER_FINAL_STATUSES)
+
+async def loan_events(request, loan_id):
+    """Event stream of one loan application's status"""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Login required'}, status=401)
+    loans = LoanApplication.objects.filter(pk=loan_id)
+    if not user.is_staff:
+        loans = loans.filter(user_id=user.pk)
+    if not await loans.aexists():
+        return JsonResponse({'error': 'Loan not found'}, status=404)
+    
+    async def load_state():
+        current = await LoanApplication.objects.filter(pk=loan_id).afirst()
+        return loan_state(current) if current else None
+    
+    return _event_stream_response(loan_channel(loan_id), load_state, LOAN_FINAL_STATUSES)
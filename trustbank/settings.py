@@ -69,6 +69,15 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Take the write lock when a transaction starts, so concurrent writers
+        # (e.g. several settle_transfers workers) wait instead of failing with
+        # "database is locked". This applies to every atomic() block, so each
+        # transaction - even a read-only one - holds the write lock from BEGIN
+        # until it commits. transaction_mode needs Django 5.1+.
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -120,6 +129,87 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Create media directory if it doesn't exist
 os.makedirs(MEDIA_ROOT, exist_ok=True)
 
+# Protected media (see core/media.py). Set one of these in production so the
+# web server streams the file after Django has checked access, e.g. for nginx:
+#   location /protected-media/ { internal; alias /path/to/media/; }
+MEDIA_ACCEL_REDIRECT_PREFIX = None  # '/protected-media/'
+MEDIA_SENDFILE_HEADER = None  # 'X-Sendfile' for Apache mod_xsendfile
+
+# Loan document uploads (see core/uploads.py)
+LOAN_UPLOAD_MAX_SIZE = 10 * 1024 * 1024  # 10 MB per file
+LOAN_UPLOAD_ALLOWED_TYPES = ['image/jpeg', 'image/png', 'image/gif', 'image/webp', 'application/pdf']
+
+# KYC image ingest (see core/ingest.py)
+KYC_IMAGE_MAX_DIMENSION = 2048  # longest side in pixels
+KYC_IMAGE_QUALITY = 82
+KYC_KEEP_ORIGINALS = False  # also keep untouched uploads in the cold tier
+KYC_COLD_STORAGE_ROOT = BASE_DIR / 'cold_storage'
+
+# Automated document checks run after loan step 1 (see core/kyc.py)
+KYC_DOCUMENT_CHECKS = [
+    'core.kyc.check_file_type',
+    'core.kyc.check_image_quality',
+    'core.kyc.check_duplicate_document',
+]
+KYC_MIN_IMAGE_DIMENSION = 400  # shortest side in pixels
+
+# =============================================
+# BACKGROUND JOBS
+# =============================================
+
+# Worker threads for thumbnails and other post-upload work
+BACKGROUND_WORKERS = 2
+# Run background jobs inline (handy for debugging)
+BACKGROUND_TASKS_EAGER = False
+
+# Money transfer settlement (manage.py settle_transfers, see core/settlement.py)
+TRANSFER_PAYOUT_BACKEND = 'core.payouts.LocalPayoutBackend'
+TRANSFER_MAX_ATTEMPTS = 5  # retryable payout failures before a transfer is marked failed
+
+# Exchange rates (see core/fx.py). Rates are per 1 USD.
+FX_RATE_SOURCE = 'core.fx.StaticRateSource'  # or core.fx.FileRateSource / core.fx.UrlRateSource
+FX_STATIC_RATES = {'USD': '1', 'EUR': '0.92', 'GBP': '0.79', 'CAD': '1.36', 'NGN': '1550', 'GHS': '15.5', 'KES': '129', 'INR': '83.5'}
+FX_RATES_FILE = BASE_DIR / 'fx_rates.json'
+FX_RATES_URL = None
+FX_CACHE_TTL = 300  # seconds before rates are refreshed in the background
+FX_MAX_STALE = 60 * 60 * 24  # older than this, log a warning (the old rates are still used)
+
+# Live status streams (server-sent events, core/status_events.py).
+# Serve trustbank.asgi:application for these, e.g.
+#   gunicorn trustbank.asgi:application -k uvicorn.workers.UvicornWorker
+SSE_POLL_SECONDS = 15  # database re-check / keepalive interval per open stream
+SSE_MAX_SECONDS = 300  # streams are closed after this; the browser reconnects
+
+# =============================================
+# CACHE
+# =============================================
+
+# Per-process cache. Use a shared backend (Redis/Memcached) when running
+# several workers, otherwise idempotency keys, login throttles and velocity
+# counters are only seen by one of them (`manage.py check --deploy` warns).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'trustbank',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# In-process copies of settings, fee bands and payment methods
+# (core/local_cache.py) are rebuilt at least this often, in seconds
+LOCAL_CACHE_MAX_AGE = 300
+
+# Login throttling (see core/throttle.py): (attempts, seconds) token buckets
+LOGIN_THROTTLE_ENABLED = True
+LOGIN_THROTTLE_IP_RATE = (20, 600)
+LOGIN_THROTTLE_USERNAME_RATE = (5, 900)  # failed passwords per email from one IP
+LOGIN_THROTTLE_CACHE = 'default'  # use a shared cache (Redis/Memcached) when running several processes
+LOGIN_THROTTLE_PROXY_COUNT = 0  # reverse proxies in front of the app that set X-Forwarded-For
+
+# Retried POSTs with the same idempotency key replay the first response (see core/idempotency.py)
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+IDEMPOTENCY_WAIT_SECONDS = 5
+
 # =============================================
 # SESSION SETTINGS
 # =============================================
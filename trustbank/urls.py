@@ -1,13 +1,15 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
+from core.views import protected_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Uploaded documents are access-checked, so they never go through static()
+    re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), protected_media, name='protected_media'),
     path('', include('core.urls')),
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file